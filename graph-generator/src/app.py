@@ -2,10 +2,17 @@ from __future__ import annotations
 
 from fastapi import FastAPI
 
+from src.cache import GraphCache
 from src.routers import router
+from src.settings import configure_logging, graph_settings
 
 
 def get_app() -> FastAPI:
+    configure_logging()
+
     app = FastAPI()
     app.include_router(router)
+    app.state.graph_cache = GraphCache(
+        graph_settings.cache_dir, int(graph_settings.cache_max_size_MiB * 1024**2)
+    )
     return app
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import zlib
+from typing import Any, Dict, List
+
+import orjson
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_CACHE", "INFO"))
+
+
+def get_graph_key(graph_code_lines: List[str], seed: int, domain: str) -> str:
+    return hashlib.sha256(orjson.dumps([graph_code_lines, seed, domain])).hexdigest()
+
+
+class GraphCache:
+    """Generated graphs stored on disk as compressed json.
+
+    Once the files exceed max_size bytes, the least recently used ones are removed.
+    The cache only speeds up the generation, so its errors are logged and treated as misses.
+    """
+
+    def __init__(self, directory: str, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.zlib")
+
+    def get(self, key: str) -> List[Dict[str, Any]] | None:
+        if not self.enabled:
+            return None
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # the modification time orders the graphs for eviction
+            os.utime(path)
+            return orjson.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, orjson.JSONDecodeError) as e:
+            logger.warning(f"Failed to read graph {key} from cache: {e}")
+            return None
+
+    def set(self, key: str, graph: List[Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        data = zlib.compress(orjson.dumps(graph))
+        if len(data) > self.max_size:
+            return
+        path = self.get_path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, "wb") as f:
+                f.write(data)
+            # readers never see partially written graphs
+            os.replace(temporary_path, path)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Failed to write graph {key} to cache: {e}")
+
+    def evict(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json.zlib"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            logger.debug(f"Evicted {path} from cache")
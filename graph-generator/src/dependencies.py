@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Callable, Type
 
+from starlette.requests import Request
+
+from src.cache import GraphCache
 from src.services import GraphRunnerService
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -18,3 +21,13 @@ def _get_service(service_type: Type[BaseService]) -> Callable[[], BaseService]:
 graph_runner_service: Callable[[], GraphRunnerService] = _get_service(
     GraphRunnerService
 )
+
+
+def create_get_graph_cache() -> Callable[[Request], GraphCache]:
+    def get_graph_cache(request: Request) -> GraphCache:
+        return request.app.state.graph_cache
+
+    return get_graph_cache
+
+
+graph_cache: Callable[[Request], GraphCache] = create_get_graph_cache()
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class PythonCode(BaseModel):
     graph_code_lines: List[str]
+    # the same code and seed always generate the same graph, which is cached
+    seed: int = Field(None, ge=0, lt=2**32)
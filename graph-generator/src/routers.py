@@ -1,24 +1,55 @@
 from __future__ import annotations
 
+import uuid
+from typing import Any, Dict, List
+
 from fastapi import APIRouter
 from fastapi.exceptions import HTTPException
 from fastapi.params import Depends
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-from src.dependencies import graph_runner_service
+from src.cache import GraphCache, get_graph_key
+from src.dependencies import graph_cache, graph_runner_service
 from src.models import PythonCode
-from src.services import GraphRunnerService
+from src.services import GraphRunnerService, iterate_graph_chunks, rename_agents
+from src.settings import communication_server_settings, graph_settings
 
 router = APIRouter()
 
 
+def get_graph(
+    python_code: PythonCode,
+    graph_runner_service: GraphRunnerService,
+    graph_cache: GraphCache,
+) -> List[Dict[str, Any]]:
+    # graphs generated without a seed cannot be reproduced, so they are not cached
+    if python_code.seed is None:
+        return graph_runner_service.run_algorithm(python_code.graph_code_lines)
+
+    key = get_graph_key(
+        python_code.graph_code_lines,
+        python_code.seed,
+        communication_server_settings.domain,
+    )
+    graph = graph_cache.get(key)
+    if graph is None:
+        graph = graph_runner_service.run_algorithm(
+            python_code.graph_code_lines, python_code.seed
+        )
+        graph_cache.set(key, graph)
+        return graph
+    # the cached agents are renamed, otherwise simulations of the same graph would share xmpp accounts
+    return rename_agents(graph, uuid.uuid4().hex[:8])
+
+
 @router.post("/python")
 async def generate_graph(
     python_code: PythonCode,
     graph_runner_service: GraphRunnerService = Depends(graph_runner_service),
+    graph_cache: GraphCache = Depends(graph_cache),
 ):
     try:
-        graph = graph_runner_service.run_algorithm(python_code.graph_code_lines)
+        graph = get_graph(python_code, graph_runner_service, graph_cache)
     except Exception as e:
         raise HTTPException(500, f"Could not generate graph ({e}).")
     return ORJSONResponse(
@@ -26,3 +57,21 @@ async def generate_graph(
         status_code=200,
         headers={"Content-Type": "application/json"},
     )
+
+
+# the graph is sent while it is being serialized, so that it can be processed as it arrives
+@router.post("/python/stream")
+async def generate_graph_stream(
+    python_code: PythonCode,
+    graph_runner_service: GraphRunnerService = Depends(graph_runner_service),
+    graph_cache: GraphCache = Depends(graph_cache),
+):
+    try:
+        graph = get_graph(python_code, graph_runner_service, graph_cache)
+    except Exception as e:
+        raise HTTPException(500, f"Could not generate graph ({e}).")
+    return StreamingResponse(
+        iterate_graph_chunks(graph, graph_settings.stream_chunk_size),
+        status_code=200,
+        media_type="application/x-ndjson",
+    )
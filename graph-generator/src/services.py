@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import random
 import uuid
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Iterator, List
 
 import numpy
+import orjson
 
 from src.settings import communication_server_settings
 
@@ -13,19 +14,65 @@ class BaseService:
     ...
 
 
+class SeededNumpy:
+    """numpy whose random functions draw from their own seeded generator."""
+
+    def __init__(self, seed: int) -> None:
+        self.random = numpy.random.RandomState(seed)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(numpy, name)
+
+
 class GraphRunnerService(BaseService):
-    def run_algorithm(self, graph_code_lines: List[str]) -> List[Dict[str, Any]]:
+    def run_algorithm(
+        self, graph_code_lines: List[str], seed: int | None = None
+    ) -> List[Dict[str, Any]]:
         code_without_imports = self.remove_imports(graph_code_lines)
-        exec("\n".join(code_without_imports))
+        namespace = self.create_namespace(seed)
+        exec("\n".join(code_without_imports), namespace)
         try:
-            algorithm: Callable[[str], List[Dict[str, Any]]] = locals()[
+            algorithm: Callable[[str], List[Dict[str, Any]]] = namespace[
                 "generate_graph_structure"
             ]
         except KeyError:
             return []
         return algorithm(communication_server_settings.domain)
 
+    def create_namespace(self, seed: int | None) -> Dict[str, Any]:
+        # the code gets the modules it would have imported, the topology is drawn from its own seeded state,
+        # but uuid is left unseeded, so that the jids are still unique to every generated graph
+        if seed is None:
+            return {"random": random, "uuid": uuid, "numpy": numpy}
+        return {"random": random.Random(seed), "uuid": uuid, "numpy": SeededNumpy(seed)}
+
     def remove_imports(self, graph_code_lines: List[str]) -> List[str]:
         return list(
             filter(lambda line: not line.startswith("import"), graph_code_lines)
         )
+
+
+def rename_agents(graph: List[Dict[str, Any]], suffix: str) -> List[Dict[str, Any]]:
+    # the local part of every jid gets the suffix, the connections keep pointing at the same agents
+    def rename(jid: str) -> str:
+        local_part, at, domain = jid.partition("@")
+        return f"{local_part}_{suffix}{at}{domain}"
+
+    return [
+        {
+            **agent,
+            "jid": rename(agent["jid"]),
+            "connections": [rename(jid) for jid in agent.get("connections", [])],
+        }
+        for agent in graph
+    ]
+
+
+def iterate_graph_chunks(
+    graph: List[Dict[str, Any]], chunk_size: int
+) -> Iterator[bytes]:
+    # NDJSON: one agent per line, serialized one chunk at a time
+    for i in range(0, len(graph), chunk_size):
+        yield b"".join(
+            orjson.dumps(agent) + b"\n" for agent in graph[i : i + chunk_size]
+        )
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import logging
 import os
 
 from pydantic import BaseSettings
 
 
+def configure_logging() -> None:
+    logging.basicConfig(format="%(levelname)s:     [%(name)s] %(message)s")
+
+
 class AppSettings(BaseSettings):
     enable_reload: bool = bool(os.environ.get("RELOAD", False))
     port: int = int(os.environ.get("PORT", 8000))
@@ -14,5 +19,13 @@ class CommunicationServerSettings(BaseSettings):
     domain: str = os.environ.get("COMMUNICATION_SERVER_DOMAIN", "")
 
 
+class GraphSettings(BaseSettings):
+    stream_chunk_size: int = int(os.environ.get("GRAPH_STREAM_CHUNK_SIZE", 1000))
+    cache_dir: str = os.environ.get("GRAPH_CACHE_DIR", "/tmp/graph-cache")
+    # 0 disables the cache
+    cache_max_size_MiB: float = float(os.environ.get("GRAPH_CACHE_MAX_SIZE_MIB", 1024))
+
+
 app_settings = AppSettings()
 communication_server_settings = CommunicationServerSettings()
+graph_settings = GraphSettings()
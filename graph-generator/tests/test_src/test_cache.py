@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from src.cache import GraphCache, get_graph_key
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_get_graph_key_depends_on_code_seed_and_domain() -> None:
+    key = get_graph_key(["code"], 1, "domain")
+
+    assert key == get_graph_key(["code"], 1, "domain")
+    assert key != get_graph_key(["code"], 2, "domain")
+    assert key != get_graph_key(["code"], 1, "other_domain")
+    assert key != get_graph_key(["other code"], 1, "domain")
+
+
+def test_after_setting_graph_get_returns_it(tmp_path: Path) -> None:
+    cache = GraphCache(str(tmp_path / "graphs"), 1024**2)
+    graph = [{"jid": "0@domain", "type": "a", "connections": []}]
+
+    cache.set("key", graph)
+
+    assert cache.get("key") == graph
+    assert cache.get("other_key") is None
+
+
+def test_after_exceeding_max_size_least_recently_used_graph_is_evicted(
+    tmp_path: Path,
+) -> None:
+    cache = GraphCache(str(tmp_path), 1024**2)
+    graph = [{"jid": f"{i}@domain"} for i in range(100)]
+    cache.set("a", graph)
+    cache.set("b", graph)
+    cache.max_size = os.path.getsize(cache.get_path("a")) * 2
+    os.utime(cache.get_path("a"), (0, 0))
+    os.utime(cache.get_path("b"), (1, 1))
+    cache.get("a")
+
+    cache.set("c", graph)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == graph
+    assert cache.get("c") == graph
+
+
+def test_cache_with_max_size_0_does_not_store_graphs(tmp_path: Path) -> None:
+    cache = GraphCache(str(tmp_path), 0)
+
+    cache.set("key", [])
+
+    assert cache.get("key") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_corrupted_graph_is_treated_as_cache_miss(tmp_path: Path) -> None:
+    cache = GraphCache(str(tmp_path), 1024**2)
+    with open(cache.get_path("key"), "wb") as f:
+        f.write(b"not compressed")
+
+    assert cache.get("key") is None
@@ -4,12 +4,16 @@ import asyncio
 from typing import TYPE_CHECKING
 from unittest.mock import Mock
 
+import orjson
 import pytest
 from starlette import status
 
-from src.dependencies import graph_runner_service
+from src.cache import GraphCache
+from src.dependencies import graph_cache, graph_runner_service
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from fastapi import FastAPI
     from httpx import AsyncClient
 
@@ -69,3 +73,113 @@ async def test_after_graph_runner_service_fails_response_has_details(
     response = await client.post("/python", json=code)
 
     assert "detail" in response.json()
+
+
+async def test_after_sending_graph_code_to_stream_response_has_graph_ndjson(
+    app: FastAPI, client: AsyncClient
+) -> None:
+    graph_runner_service_mock = Mock()
+    graph_structure = [{"jid": str(i), "type": "a"} for i in range(3)]
+    graph_runner_service_mock.run_algorithm.return_value = graph_structure
+    app.dependency_overrides[graph_runner_service] = lambda: graph_runner_service_mock
+    code = {"graph_code_lines": []}
+
+    response = await client.post("/python/stream", json=code)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line) for line in response.content.splitlines()] == (
+        graph_structure
+    )
+
+
+async def test_after_graph_runner_service_fails_stream_response_has_500_status_code(
+    app: FastAPI, client: AsyncClient
+) -> None:
+    graph_runner_service_mock = Mock()
+    graph_runner_service_mock.run_algorithm.side_effect = Exception()
+    app.dependency_overrides[graph_runner_service] = lambda: graph_runner_service_mock
+    code = {"graph_code_lines": []}
+
+    response = await client.post("/python/stream", json=code)
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+async def test_after_sending_same_graph_code_with_seed_twice_graph_is_generated_once(
+    app: FastAPI, client: AsyncClient, tmp_path: Path
+) -> None:
+    graph_runner_service_mock = Mock()
+    graph_structure = [
+        {"jid": "0@domain", "type": "a", "connections": ["1@domain"]},
+        {"jid": "1@domain", "type": "a", "connections": []},
+    ]
+    graph_runner_service_mock.run_algorithm.return_value = graph_structure
+    app.dependency_overrides[graph_runner_service] = lambda: graph_runner_service_mock
+    app.dependency_overrides[graph_cache] = lambda: GraphCache(str(tmp_path), 1024**2)
+    code = {"graph_code_lines": [], "seed": 1}
+
+    first_response = await client.post("/python", json=code)
+    second_response = await client.post("/python/stream", json=code)
+
+    assert first_response.json()["graph"] == graph_structure
+    graph_runner_service_mock.run_algorithm.assert_called_once_with([], 1)
+    # the cached graph is sent with other jids
+    second_graph = [orjson.loads(line) for line in second_response.content.splitlines()]
+    assert second_graph[0]["jid"] != "0@domain"
+    assert second_graph[0]["connections"] == [second_graph[1]["jid"]]
+
+
+async def test_after_sending_graph_code_without_seed_graph_is_not_cached(
+    app: FastAPI, client: AsyncClient, tmp_path: Path
+) -> None:
+    graph_runner_service_mock = Mock()
+    graph_runner_service_mock.run_algorithm.return_value = []
+    app.dependency_overrides[graph_runner_service] = lambda: graph_runner_service_mock
+    app.dependency_overrides[graph_cache] = lambda: GraphCache(str(tmp_path), 1024**2)
+    code = {"graph_code_lines": []}
+
+    await client.post("/python", json=code)
+    await client.post("/python", json=code)
+
+    assert graph_runner_service_mock.run_algorithm.call_count == 2
+
+
+async def test_after_sending_negative_seed_response_has_422_status_code(
+    client: AsyncClient,
+) -> None:
+    code = {"graph_code_lines": [], "seed": -1}
+
+    response = await client.post("/python", json=code)
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_after_sending_same_graph_code_with_seed_twice_graphs_have_same_topology_and_other_jids(
+    app: FastAPI, client: AsyncClient, tmp_path: Path
+) -> None:
+    app.dependency_overrides[graph_cache] = lambda: GraphCache(str(tmp_path), 1024**2)
+    code = {
+        "graph_code_lines": [
+            "def generate_graph_structure(domain):\n",
+            "    random_id = str(uuid.uuid4())[:5]\n",
+            "    jids = [f'{i}_{random_id}@{domain}' for i in range(10)]\n",
+            "    return [\n",
+            "        {'jid': jid, 'type': 'a', 'connections': random.sample(jids, 3)}\n",
+            "        for jid in jids\n",
+            "    ]",
+        ],
+        "seed": 1,
+    }
+
+    first_graph = (await client.post("/python", json=code)).json()["graph"]
+    second_graph = (await client.post("/python", json=code)).json()["graph"]
+
+    def get_topology(graph):
+        positions = {agent["jid"]: i for i, agent in enumerate(graph)}
+        return [[positions[jid] for jid in agent["connections"]] for agent in graph]
+
+    assert get_topology(first_graph) == get_topology(second_graph)
+    assert not {agent["jid"] for agent in first_graph} & {
+        agent["jid"] for agent in second_graph
+    }
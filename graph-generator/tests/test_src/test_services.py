@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import random
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
+import orjson
 import pytest
 
+from src.services import iterate_graph_chunks, rename_agents
+
 if TYPE_CHECKING:
     from src.services import GraphRunnerService
 
@@ -51,3 +55,86 @@ async def test_after_providing_code_without_imports_method_remove_returns_unchan
     graph = graph_runner_service.remove_imports(code_lines)
 
     assert graph == ["123"]
+
+
+async def test_iterate_graph_chunks_returns_agents_as_ndjson_chunks() -> None:
+    graph = [{"jid": str(i)} for i in range(5)]
+
+    chunks = list(iterate_graph_chunks(graph, 2))
+
+    assert len(chunks) == 3
+    assert [orjson.loads(line) for line in b"".join(chunks).splitlines()] == graph
+
+
+def get_topology(graph: List[Dict[str, Any]]) -> List[Tuple[Any, List[int]]]:
+    # the agents are identified by their position, so that graphs with other jids can be compared
+    positions = {agent["jid"]: i for i, agent in enumerate(graph)}
+    return [
+        (agent["type"], [positions[jid] for jid in agent["connections"]])
+        for agent in graph
+    ]
+
+
+# the code generated by aasm for a statistical graph
+SEEDED_GRAPH_CODE_LINES = [
+    "import random\n",
+    "import uuid\n",
+    "import numpy\n",
+    "def generate_graph_structure(domain):\n",
+    "    random_id = str(uuid.uuid4())[:5]\n",
+    "    jids = [f'{i}_{random_id}@{domain}' for i in range(20)]\n",
+    "    agents = []\n",
+    "    for jid in jids:\n",
+    "        num_connections = max(min(int(numpy.random.normal(5, 2)), 19), 0)\n",
+    "        agents.append({\n",
+    "            'jid': jid,\n",
+    "            'type': 'a',\n",
+    "            'connections': random.sample(\n",
+    "                [other_jid for other_jid in jids if other_jid != jid],\n",
+    "                num_connections,\n",
+    "            ),\n",
+    "        })\n",
+    "    return agents",
+]
+
+
+async def test_after_providing_seed_method_run_algorithm_returns_graphs_with_same_topology_and_other_jids(
+    graph_runner_service: GraphRunnerService,
+) -> None:
+    graph = graph_runner_service.run_algorithm(SEEDED_GRAPH_CODE_LINES, 1)
+    same_seed_graph = graph_runner_service.run_algorithm(SEEDED_GRAPH_CODE_LINES, 1)
+    other_seed_graph = graph_runner_service.run_algorithm(SEEDED_GRAPH_CODE_LINES, 2)
+
+    assert get_topology(graph) == get_topology(same_seed_graph)
+    assert get_topology(graph) != get_topology(other_seed_graph)
+    assert not {agent["jid"] for agent in graph} & {
+        agent["jid"] for agent in same_seed_graph
+    }
+
+
+async def test_rename_agents_renames_agents_and_their_connections() -> None:
+    graph = [
+        {"jid": "0@domain", "type": "a", "connections": ["1@domain"]},
+        {"jid": "1@domain", "type": "b", "connections": []},
+    ]
+
+    renamed_graph = rename_agents(graph, "x")
+
+    assert renamed_graph == [
+        {"jid": "0_x@domain", "type": "a", "connections": ["1_x@domain"]},
+        {"jid": "1_x@domain", "type": "b", "connections": []},
+    ]
+
+
+async def test_method_run_algorithm_does_not_change_global_random_state(
+    graph_runner_service: GraphRunnerService,
+) -> None:
+    code_lines = [
+        "def generate_graph_structure(domain):\n",
+        "    return [random.random()]",
+    ]
+    state = random.getstate()
+
+    graph_runner_service.run_algorithm(code_lines, 1)
+
+    assert random.getstate() == state
@@ -9,12 +9,13 @@ from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List
 
 import orjson
 import uvloop
-from aiokafka import AIOKafkaConsumer
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import ASCENDING
 from pymongo.errors import CollectionInvalid
 
 from src.settings import configure_logging, settings
+from src.writer import PartitionWriter
 
 if TYPE_CHECKING:  # pragma: no cover
     from aiokafka import ConsumerRecord, TopicPartition
@@ -25,18 +26,37 @@ logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_MAIN", "INFO"))
 
 
+class WriterRebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, consumer: Consumer):
+        self.consumer = consumer
+
+    async def on_partitions_revoked(self, revoked: List[TopicPartition]) -> None:
+        # pending writes must be committed before the partitions are reassigned
+        await self.consumer.stop_writers(revoked)
+
+    async def on_partitions_assigned(self, assigned: List[TopicPartition]) -> None:
+        logger.info(f"Assigned partitions: {[tp.partition for tp in assigned]}")
+
+
 class Consumer:
     def __init__(
-        self, db_url: str, kafka_address: str, topic: str, batch_timeout_ms: int
+        self,
+        db_url: str,
+        kafka_address: str,
+        topic: str,
+        batch_timeout_ms: int,
+        max_batches_in_flight: int,
     ):
         self.db_url = db_url
         self.kafka_address = kafka_address
         self.topic = topic
         self.batch_timeout_ms = batch_timeout_ms
+        self.max_batches_in_flight = max_batches_in_flight
         self.kafka: AIOKafkaConsumer | None = None
         self.db_client: AsyncIOMotorClient | None = None
         self.db: AsyncIOMotorDatabase | None = None
         self.collection: AsyncIOMotorCollection | None = None
+        self.writers: Dict[TopicPartition, PartitionWriter] = {}
         self.cleanup_functions = []
 
     def register_cleanup_function(
@@ -47,17 +67,19 @@ class Consumer:
     async def connect_to_kafka(self) -> None:
         logger.info("Connecting to kafka")
         kafka = AIOKafkaConsumer(
-            self.topic,
             bootstrap_servers=self.kafka_address,
             client_id=f"agent_updates_consumer_mongo_{uuid.uuid4()}",
             group_id="agent_updates_consumer_mongo_group",
+            enable_auto_commit=False,
             key_deserializer=lambda k: k.decode("utf-8"),
             value_deserializer=orjson.loads,
         )
         await kafka.start()
+        kafka.subscribe([self.topic], listener=WriterRebalanceListener(self))
         self.kafka = kafka
         logger.info("Connected to kafka")
         self.register_cleanup_function(self.disconnect_from_kafka)
+        self.register_cleanup_function(self.stop_all_writers)
 
     async def disconnect_from_kafka(self) -> None:
         logger.info("Disconnecting from kafka")
@@ -106,7 +128,8 @@ class Consumer:
 
     async def cleanup(self) -> None:
         logger.info("Cleaning up")
-        for cleanup_function in self.cleanup_functions:
+        # resources are released in the reverse order of acquisition
+        for cleanup_function in reversed(self.cleanup_functions):
             await cleanup_function()
 
     async def save_agent_updates_in_db(self, batch: List[Dict[str, Any]]) -> None:
@@ -121,27 +144,54 @@ class Consumer:
             }
             for agent in batch
         ]
-        result = await self.collection.insert_many(data)
+        result = await self.collection.insert_many(data, ordered=False)
         logger.info(
             f"Saved {len(result.inserted_ids)} agent updates (acknowledged: {result.acknowledged})"
         )
 
-    async def get_agent_updates(self) -> List[Dict[str, Any]]:
-        batch: Dict[TopicPartition, List[ConsumerRecord]] = await self.kafka.getmany(
-            timeout_ms=self.batch_timeout_ms
-        )
-        record_lists: List[List[ConsumerRecord]] = list(batch.values())
-        if record_lists:
-            record_list = record_lists[0]
-            return [record.value for record in record_list]
-        return []
+    def get_writer(self, partition: TopicPartition) -> PartitionWriter:
+        if partition not in self.writers:
+            writer = PartitionWriter(
+                partition,
+                self.kafka,
+                self.save_agent_updates_in_db,
+                self.max_batches_in_flight,
+            )
+            writer.start()
+            self.writers[partition] = writer
+        return self.writers[partition]
+
+    async def stop_writers(self, partitions: List[TopicPartition]) -> None:
+        for partition in partitions:
+            writer = self.writers.pop(partition, None)
+            if writer is not None:
+                await writer.stop()
+
+    async def stop_all_writers(self) -> None:
+        await self.stop_writers(list(self.writers.keys()))
+
+    def raise_writer_errors(self) -> None:
+        for writer in self.writers.values():
+            if writer.error is not None:
+                raise writer.error
+
+    async def get_agent_update_batch(
+        self,
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        return await self.kafka.getmany(timeout_ms=self.batch_timeout_ms)
 
     async def consume(self) -> None:
         while True:
-            agent_updates = await self.get_agent_updates()
-            if agent_updates:
-                await self.save_agent_updates_in_db(agent_updates)
-                logger.info(f"Consumed {len(agent_updates)} agent updates")
+            self.raise_writer_errors()
+            batch = await self.get_agent_update_batch()
+            for partition, records in batch.items():
+                if records:
+                    self.raise_writer_errors()
+                    await self.get_writer(partition).put(records)
+            if batch:
+                logger.info(
+                    f"Consumed {sum(len(records) for records in batch.values())} agent updates from {len(batch)} partitions"
+                )
 
     async def start(self) -> None:
         try:
@@ -164,6 +214,7 @@ def main() -> None:
             settings.kafka_address,
             settings.topic,
             settings.batch_timeout_ms,
+            settings.max_batches_in_flight,
         ).start()
     )
 
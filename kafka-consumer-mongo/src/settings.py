@@ -11,6 +11,7 @@ class Settings:
     kafka_address = os.getenv("KAFKA_ADDRESS", "")
     topic = os.getenv("UPDATE_AGENT_INPUT_TOPIC_NAME", "")
     batch_timeout_ms = int(os.getenv("BATCH_TIMEOUT_MS", "1000"))
+    max_batches_in_flight = int(os.getenv("MAX_BATCHES_IN_FLIGHT", "4"))
 
 
 settings = Settings()
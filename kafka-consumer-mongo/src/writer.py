@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiokafka import AIOKafkaConsumer, ConsumerRecord, TopicPartition
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_WRITER", "INFO"))
+
+
+class PartitionWriter:
+    """Writes the records of a single partition to the database.
+
+    Up to `max_batches_in_flight` batches are written concurrently,
+    but offsets are committed strictly in the order in which the batches were received
+    and only after the database acknowledged the write.
+    """
+
+    def __init__(
+        self,
+        partition: TopicPartition,
+        kafka: AIOKafkaConsumer,
+        save: Callable[[List[Dict[str, Any]]], Coroutine[Any, Any, None]],
+        max_batches_in_flight: int,
+    ):
+        self.partition = partition
+        self.kafka = kafka
+        self.save = save
+        self.batches: asyncio.Queue[List[ConsumerRecord] | None] = asyncio.Queue(
+            maxsize=max_batches_in_flight
+        )
+        self.in_flight: asyncio.Queue[Tuple[asyncio.Task, int] | None] = asyncio.Queue()
+        self.in_flight_semaphore = asyncio.Semaphore(max_batches_in_flight)
+        self.error: BaseException | None = None
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        logger.info(f"Starting writer for partition {self.partition.partition}")
+        self.tasks = [
+            asyncio.create_task(self.write()),
+            asyncio.create_task(self.commit()),
+        ]
+
+    async def put(self, records: List[ConsumerRecord]) -> None:
+        await self.batches.put(records)
+
+    async def write(self) -> None:
+        while True:
+            records = await self.batches.get()
+            if records is None:
+                break
+
+            await self.in_flight_semaphore.acquire()
+            task = asyncio.create_task(self.save([record.value for record in records]))
+            await self.in_flight.put((task, records[-1].offset + 1))
+
+        await self.in_flight.put(None)
+
+    async def commit(self) -> None:
+        while True:
+            in_flight_batch = await self.in_flight.get()
+            if in_flight_batch is None:
+                break
+
+            task, offset = in_flight_batch
+            try:
+                await task
+            except Exception as e:
+                logger.error(
+                    f"Writer for partition {self.partition.partition} failed: {e}"
+                )
+                self.fail(e)
+                return
+            finally:
+                self.in_flight_semaphore.release()
+            await self.kafka.commit({self.partition: offset})
+
+    def fail(self, error: BaseException) -> None:
+        self.error = error
+        for task in self.tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+        # unblock the consumer if it is waiting for a free slot
+        while not self.batches.empty():
+            self.batches.get_nowait()
+
+    async def stop(self) -> None:
+        logger.info(f"Stopping writer for partition {self.partition.partition}")
+        if self.error is None:
+            await self.batches.put(None)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        logger.info(f"Stopped writer for partition {self.partition.partition}")
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from aiokafka import TopicPartition
+
+from src.writer import PartitionWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_records(offsets):
+    return [Mock(offset=offset, value={"offset": offset}) for offset in offsets]
+
+
+async def test_partition_writer_commits_offsets_in_order_after_saving() -> None:
+    partition = TopicPartition("topic", 0)
+    kafka = Mock()
+    kafka.commit = AsyncMock()
+    save = AsyncMock()
+    writer = PartitionWriter(partition, kafka, save, max_batches_in_flight=2)
+
+    writer.start()
+    await writer.put(create_records([0, 1]))
+    await writer.put(create_records([2]))
+    await writer.stop()
+
+    assert save.call_count == 2
+    assert [call.args[0] for call in kafka.commit.call_args_list] == [
+        {partition: 2},
+        {partition: 3},
+    ]
+
+
+async def test_partition_writer_does_not_commit_offsets_if_saving_fails() -> None:
+    partition = TopicPartition("topic", 0)
+    kafka = Mock()
+    kafka.commit = AsyncMock()
+    save = AsyncMock(side_effect=Exception("write error"))
+    writer = PartitionWriter(partition, kafka, save, max_batches_in_flight=1)
+
+    writer.start()
+    await writer.put(create_records([0]))
+    await asyncio.wait_for(writer.stop(), timeout=1)
+
+    assert writer.error is not None
+    assert not kafka.commit.called
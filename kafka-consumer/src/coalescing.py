@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+
+def get_agent_key(agent_update: Dict[str, Any]) -> Tuple[str, str]:
+    properties = agent_update["properties"]
+    return properties["simulation_id"], properties["jid"]
+
+
+def get_agent_timestamp(agent_update: Dict[str, Any]) -> int:
+    return agent_update["properties"]["__timestamp__"]
+
+
+def coalesce_agent_updates(
+    agent_updates: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], int]:
+    # only the newest snapshot of every agent is kept;
+    # for equal timestamps the snapshot consumed later wins
+    newest_agent_updates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for agent_update in agent_updates:
+        key = get_agent_key(agent_update)
+        newest_agent_update = newest_agent_updates.get(key)
+        if newest_agent_update is None or get_agent_timestamp(
+            agent_update
+        ) >= get_agent_timestamp(newest_agent_update):
+            newest_agent_updates[key] = agent_update
+
+    num_collapsed = len(agent_updates) - len(newest_agent_updates)
+    return list(newest_agent_updates.values()), num_collapsed
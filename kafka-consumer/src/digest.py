@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+import orjson
+
+# number of items and hash of all of them
+ListDigest = Tuple[int, bytes]
+# relationship name -> digest of its list
+AgentDigest = Dict[str, ListDigest]
+AgentKey = Tuple[str, str]
+
+EMPTY_HASH = b""
+
+
+def get_prefix_hashes(items: List[Any]) -> List[bytes]:
+    # prefix_hashes[i] is the hash of the first i items
+    prefix_hashes = [EMPTY_HASH]
+    for item in items:
+        prefix_hashes.append(
+            hashlib.blake2b(
+                prefix_hashes[-1] + orjson.dumps(item, option=orjson.OPT_SORT_KEYS),
+                digest_size=8,
+            ).digest()
+        )
+    return prefix_hashes
+
+
+def get_relationship_lists(agent_update: Dict[str, Any]) -> Dict[str, List[Any]]:
+    relationship_lists = {}
+    for connection_list in agent_update["connections"]:
+        relationship_lists[connection_list["name"]] = connection_list["to"]
+    for message_list in agent_update["messages"]:
+        relationship_lists[message_list["name"]] = message_list["messages"]
+    return relationship_lists
+
+
+def get_write_plan(
+    agent_update: Dict[str, Any], old_digest: AgentDigest | None
+) -> Tuple[Dict[str, Any], AgentDigest, int]:
+    """Returns the relationship changes to write, the new digest of the agent
+    and the number of relationships that are already stored and do not need to be written.
+
+    Lists which were only appended to since the previous update create only the new relationships.
+    Other changed lists are recreated, and an agent without a digest is fully rewritten.
+    """
+    relationship_lists = get_relationship_lists(agent_update)
+    new_digest: AgentDigest = {}
+    new_items: Dict[str, List[Any]] = {}
+    deleted_relationship_types = []
+    num_skipped = 0
+
+    for name, items in relationship_lists.items():
+        prefix_hashes = get_prefix_hashes(items)
+        new_digest[name] = (len(items), prefix_hashes[-1])
+        num_old_items, old_hash = (
+            old_digest.get(name, (0, EMPTY_HASH))
+            if old_digest is not None
+            else (0, EMPTY_HASH)
+        )
+        if num_old_items <= len(items) and prefix_hashes[num_old_items] == old_hash:
+            new_items[name] = items[num_old_items:]
+            num_skipped += num_old_items
+        else:
+            new_items[name] = items
+            deleted_relationship_types.append(name)
+
+    if old_digest is not None:
+        deleted_relationship_types.extend(
+            name for name in old_digest if name not in relationship_lists
+        )
+
+    write_plan = {
+        "properties": agent_update["properties"],
+        "delete_all": old_digest is None,
+        "deleted_relationship_types": deleted_relationship_types,
+        "connections": [
+            {"name": connection_list["name"], "to": new_items[connection_list["name"]]}
+            for connection_list in agent_update["connections"]
+            if new_items[connection_list["name"]]
+        ],
+        "messages": [
+            {
+                "name": message_list["name"],
+                "messages": new_items[message_list["name"]],
+            }
+            for message_list in agent_update["messages"]
+            if new_items[message_list["name"]]
+        ],
+    }
+    return write_plan, new_digest, num_skipped
+
+
+class RelationshipDigests:
+    """Least recently used digests of the relationship lists of every agent
+    whose relationships were written by this consumer."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.digests: OrderedDict[AgentKey, AgentDigest] = OrderedDict()
+
+    def get_write_plans(
+        self, agent_updates: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[AgentKey, AgentDigest], int]:
+        write_plans = []
+        new_digests = {}
+        num_skipped = 0
+        for agent_update in agent_updates:
+            key = (
+                agent_update["properties"]["simulation_id"],
+                agent_update["properties"]["jid"],
+            )
+            write_plan, new_digests[key], num_agent_skipped = get_write_plan(
+                agent_update, self.digests.get(key)
+            )
+            write_plans.append(write_plan)
+            num_skipped += num_agent_skipped
+        return write_plans, new_digests, num_skipped
+
+    def update(self, new_digests: Dict[AgentKey, AgentDigest]) -> None:
+        for key, digest in new_digests.items():
+            self.digests[key] = digest
+            self.digests.move_to_end(key)
+        while len(self.digests) > self.max_size:
+            self.digests.popitem(last=False)
+
+    def discard(self, keys: Iterable[AgentKey]) -> None:
+        for key in keys:
+            self.digests.pop(key, None)
+
+    def clear(self) -> None:
+        self.digests.clear()
@@ -8,9 +8,12 @@ from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List
 
 import orjson
 import uvloop
-from aiokafka import AIOKafkaConsumer
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener
 from neo4j import AsyncGraphDatabase
 
+from src.coalescing import coalesce_agent_updates
+from src.digest import RelationshipDigests
+from src.pipeline import WritePipeline
 from src.settings import configure_logging, settings
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -21,16 +24,38 @@ logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_MAIN", "INFO"))
 
 
+class DigestRebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, relationship_digests: RelationshipDigests):
+        self.relationship_digests = relationship_digests
+
+    async def on_partitions_revoked(self, revoked: List[TopicPartition]) -> None:
+        # other consumers may update the agents before the partitions come back
+        self.relationship_digests.clear()
+
+    async def on_partitions_assigned(self, assigned: List[TopicPartition]) -> None:
+        logger.info(f"Assigned partitions: {[tp.partition for tp in assigned]}")
+
+
 class Consumer:
     def __init__(
-        self, db_url: str, kafka_address: str, topic: str, batch_timeout_ms: int
+        self,
+        db_url: str,
+        kafka_address: str,
+        topic: str,
+        batch_timeout_ms: int,
+        pipeline_settings: Dict[str, int],
+        max_relationship_digests: int,
     ):
         self.db_url = db_url
         self.kafka_address = kafka_address
         self.topic = topic
         self.batch_timeout_ms = batch_timeout_ms
+        self.pipeline_settings = pipeline_settings
         self.kafka: AIOKafkaConsumer | None = None
         self.db: AsyncNeo4jDriver | None = None
+        self.pipeline: WritePipeline | None = None
+        self.relationship_digests = RelationshipDigests(max_relationship_digests)
+        self.num_collapsed_agent_updates = 0
         self.cleanup_functions = []
 
     def register_cleanup_function(
@@ -41,14 +66,17 @@ class Consumer:
     async def connect_to_kafka(self) -> None:
         logger.info("Connecting to kafka")
         kafka = AIOKafkaConsumer(
-            self.topic,
             bootstrap_servers=self.kafka_address,
             client_id=f"agent_updates_consumer_{uuid.uuid4()}",
             group_id="agent_updates_consumer_group",
+            enable_auto_commit=False,
             key_deserializer=lambda k: k.decode("utf-8"),
             value_deserializer=orjson.loads,
         )
         await kafka.start()
+        kafka.subscribe(
+            [self.topic], listener=DigestRebalanceListener(self.relationship_digests)
+        )
         self.kafka = kafka
         logger.info("Connected to kafka")
         self.register_cleanup_function(self.disconnect_from_kafka)
@@ -61,6 +89,7 @@ class Consumer:
     def connect_to_db(self) -> None:
         logger.info("Connecting to database")
         self.db = AsyncGraphDatabase.driver(self.db_url, keep_alive=True)
+        self.pipeline = WritePipeline(self.db, **self.pipeline_settings)
         logger.info("Connected to database")
         self.register_cleanup_function(self.disconnect_from_db)
 
@@ -75,47 +104,84 @@ class Consumer:
             await cleanup_function()
 
     async def save_agent_updates_in_db(self, batch: List[Dict[str, Any]]) -> None:
-        query = """
-        UNWIND $batch AS event
-        MATCH (agent:Agent {jid: event.properties.jid, simulation_id: event.properties.simulation_id})
-        OPTIONAL MATCH (agent)-[relationship]->()
-        SET agent = event.properties
-        DELETE relationship
-        
-        WITH DISTINCT agent, event
-        UNWIND event.connections as connection_list
-        WITH agent, connection_list.name AS connection_list_name, connection_list.to as connection_list_to, event
-        UNWIND connection_list_to as to
-        MATCH (to_agent:Agent {jid: to, simulation_id: event.properties.simulation_id})
-        CALL apoc.create.relationship(agent, connection_list_name, {r_type: 'connection'}, to_agent) YIELD rel
-        
-        WITH DISTINCT agent, event
-        UNWIND event.messages as message_list
-        WITH agent, message_list.name AS message_list_name, message_list.messages as message_list_messages, event
-        UNWIND message_list_messages as message
-        MATCH (to_agent:Agent {jid: message.sender, simulation_id: event.properties.simulation_id})
-        CALL apoc.create.relationship(agent, message_list_name, message, to_agent) YIELD rel
-        RETURN NULL
-        """
-        async with self.db.session() as session:
-            await session.run(query, batch=batch)
-
-    async def get_agent_updates(self) -> List[Dict[str, Any]]:
-        batch: Dict[TopicPartition, List[ConsumerRecord]] = await self.kafka.getmany(
-            timeout_ms=self.batch_timeout_ms
+        (
+            write_plans,
+            new_digests,
+            num_skipped,
+        ) = self.relationship_digests.get_write_plans(batch)
+        try:
+            incomplete_agents = await self.pipeline.run(write_plans)
+        except Exception:
+            # the stored relationships are unknown after a partial write
+            self.relationship_digests.clear()
+            raise
+        # the relationships of these agents are fully rewritten with their next update,
+        # e.g., once the agents they point at are stored
+        self.relationship_digests.discard(incomplete_agents)
+        self.relationship_digests.update(
+            {
+                key: digest
+                for key, digest in new_digests.items()
+                if key not in incomplete_agents
+            }
         )
-        record_lists: List[List[ConsumerRecord]] = list(batch.values())
-        if record_lists:
-            record_list = record_lists[0]
-            return [record.value for record in record_list]
-        return []
+        logger.info(f"Skipped {num_skipped} unchanged relationships")
+        if incomplete_agents:
+            logger.warning(
+                f"Not every relationship was created for {len(incomplete_agents)} agents, they will be rewritten"
+            )
+
+    async def get_agent_update_batch(
+        self,
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        return await self.kafka.getmany(timeout_ms=self.batch_timeout_ms)
+
+    def get_agent_updates(
+        self, batch: Dict[TopicPartition, List[ConsumerRecord]]
+    ) -> List[Dict[str, Any]]:
+        # records of every partition are kept in offset order,
+        # so the updates of a single agent (keyed by jid) are never reordered
+        return [record.value for records in batch.values() for record in records]
+
+    async def commit_offsets(
+        self, batch: Dict[TopicPartition, List[ConsumerRecord]]
+    ) -> None:
+        offsets = {
+            partition: records[-1].offset + 1
+            for partition, records in batch.items()
+            if records
+        }
+        await self.kafka.commit(offsets)
+
+    def get_partition_lag(
+        self, batch: Dict[TopicPartition, List[ConsumerRecord]]
+    ) -> Dict[int, int | None]:
+        partition_lag = {}
+        for partition, records in batch.items():
+            highwater = self.kafka.highwater(partition)
+            partition_lag[partition.partition] = (
+                highwater - (records[-1].offset + 1)
+                if highwater is not None and records
+                else None
+            )
+        return partition_lag
 
     async def consume(self) -> None:
         while True:
-            agent_updates = await self.get_agent_updates()
+            batch = await self.get_agent_update_batch()
+            agent_updates, num_collapsed = coalesce_agent_updates(
+                self.get_agent_updates(batch)
+            )
+            self.num_collapsed_agent_updates += num_collapsed
             if agent_updates:
                 await self.save_agent_updates_in_db(agent_updates)
-                logger.info(f"Consumed {len(agent_updates)} agent updates")
+                await self.commit_offsets(batch)
+                logger.info(
+                    f"Consumed {len(agent_updates)} agent updates from {len(batch)} partitions (lag: {self.get_partition_lag(batch)})"
+                )
+                logger.info(
+                    f"Collapsed {num_collapsed} outdated agent snapshots (total: {self.num_collapsed_agent_updates})"
+                )
 
     async def start(self) -> None:
         try:
@@ -135,6 +201,14 @@ def main() -> None:
             settings.kafka_address,
             settings.topic,
             settings.batch_timeout_ms,
+            {
+                "initial_chunk_size": settings.initial_chunk_size,
+                "min_chunk_size": settings.min_chunk_size,
+                "max_chunk_size": settings.max_chunk_size,
+                "target_latency_ms": settings.target_transaction_latency_ms,
+                "max_retries": settings.max_chunk_retries,
+            },
+            settings.max_relationship_digests,
         ).start()
     )
 
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Set, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from neo4j import AsyncNeo4jDriver, AsyncTransaction
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_PIPELINE", "INFO"))
+
+
+AgentKey = Tuple[str, str]
+
+
+class Stage(NamedTuple):
+    name: str
+    query: str
+    # returns None if the stage has nothing to write for the agent
+    get_event: Callable[[Dict[str, Any]], Dict[str, Any] | None]
+    # number of relationships the event should create, for stages whose query returns
+    # the number of relationships created for every agent (simulation_id, jid, num_created)
+    count_relationships: Callable[[Dict[str, Any]], int] | None = None
+
+
+def get_agent_key(write_plan: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "jid": write_plan["properties"]["jid"],
+        "simulation_id": write_plan["properties"]["simulation_id"],
+    }
+
+
+def get_event_agent_key(event: Dict[str, Any]) -> AgentKey:
+    return event["simulation_id"], event["jid"]
+
+
+SET_PROPERTIES = Stage(
+    name="set properties",
+    query="""
+    UNWIND $batch AS event
+    MATCH (agent:Agent {jid: event.jid, simulation_id: event.simulation_id})
+    SET agent = event.properties
+    """,
+    get_event=lambda write_plan: {
+        **get_agent_key(write_plan),
+        "properties": write_plan["properties"],
+    },
+)
+
+DELETE_RELATIONSHIPS = Stage(
+    name="delete relationships",
+    query="""
+    UNWIND $batch AS event
+    MATCH (agent:Agent {jid: event.jid, simulation_id: event.simulation_id})-[relationship]->()
+    DELETE relationship
+    """,
+    get_event=lambda write_plan: (
+        get_agent_key(write_plan) if write_plan["delete_all"] else None
+    ),
+)
+
+DELETE_RELATIONSHIP_TYPES = Stage(
+    name="delete relationship types",
+    query="""
+    UNWIND $batch AS event
+    MATCH (agent:Agent {jid: event.jid, simulation_id: event.simulation_id})-[relationship]->()
+    WHERE type(relationship) IN event.types
+    DELETE relationship
+    """,
+    get_event=lambda write_plan: (
+        {
+            **get_agent_key(write_plan),
+            "types": write_plan["deleted_relationship_types"],
+        }
+        if not write_plan["delete_all"] and write_plan["deleted_relationship_types"]
+        else None
+    ),
+)
+
+CREATE_CONNECTIONS = Stage(
+    name="create connections",
+    query="""
+    UNWIND $batch AS event
+    MATCH (agent:Agent {jid: event.jid, simulation_id: event.simulation_id})
+    UNWIND event.connections AS connection_list
+    UNWIND connection_list.to AS to
+    MATCH (to_agent:Agent {jid: to, simulation_id: event.simulation_id})
+    CALL apoc.create.relationship(agent, connection_list.name, {r_type: 'connection'}, to_agent) YIELD rel
+    RETURN event.simulation_id AS simulation_id, event.jid AS jid, count(rel) AS num_created
+    """,
+    get_event=lambda write_plan: (
+        {**get_agent_key(write_plan), "connections": write_plan["connections"]}
+        if write_plan["connections"]
+        else None
+    ),
+    count_relationships=lambda event: sum(
+        len(connection_list["to"]) for connection_list in event["connections"]
+    ),
+)
+
+CREATE_MESSAGES = Stage(
+    name="create messages",
+    query="""
+    UNWIND $batch AS event
+    MATCH (agent:Agent {jid: event.jid, simulation_id: event.simulation_id})
+    UNWIND event.messages AS message_list
+    UNWIND message_list.messages AS message
+    MATCH (to_agent:Agent {jid: message.sender, simulation_id: event.simulation_id})
+    CALL apoc.create.relationship(agent, message_list.name, message, to_agent) YIELD rel
+    RETURN event.simulation_id AS simulation_id, event.jid AS jid, count(rel) AS num_created
+    """,
+    get_event=lambda write_plan: (
+        {**get_agent_key(write_plan), "messages": write_plan["messages"]}
+        if write_plan["messages"]
+        else None
+    ),
+    count_relationships=lambda event: sum(
+        len(message_list["messages"]) for message_list in event["messages"]
+    ),
+)
+
+STAGES = [
+    SET_PROPERTIES,
+    DELETE_RELATIONSHIPS,
+    DELETE_RELATIONSHIP_TYPES,
+    CREATE_CONNECTIONS,
+    CREATE_MESSAGES,
+]
+
+
+async def run_query(
+    tx: AsyncTransaction, query: str, batch: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    result = await tx.run(query, batch=batch)
+    return await result.data()
+
+
+def get_incomplete_agents(
+    stage: Stage, chunk: List[Dict[str, Any]], records: List[Dict[str, Any]]
+) -> Set[AgentKey]:
+    # the relationships to agents which are not stored yet are silently not created
+    num_created = {
+        (record["simulation_id"], record["jid"]): record["num_created"]
+        for record in records
+    }
+    return {
+        get_event_agent_key(event)
+        for event in chunk
+        if num_created.get(get_event_agent_key(event), 0)
+        < stage.count_relationships(event)
+    }
+
+
+class WritePipeline:
+    """Writes agent write plans (see src/digest.py) to the database stage by stage.
+
+    Every stage is split into chunks, each of them written in a separate transaction.
+    The chunk size of a stage follows the observed transaction latency,
+    and a failed chunk is retried on its own (with a smaller chunk size).
+    """
+
+    def __init__(
+        self,
+        db: AsyncNeo4jDriver,
+        initial_chunk_size: int,
+        min_chunk_size: int,
+        max_chunk_size: int,
+        target_latency_ms: int,
+        max_retries: int,
+        stages: List[Stage] = STAGES,
+    ):
+        self.db = db
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_latency = target_latency_ms / 1000
+        self.max_retries = max_retries
+        self.stages = stages
+        self.chunk_sizes: Dict[str, int] = {
+            stage.name: initial_chunk_size for stage in stages
+        }
+
+    async def run_transaction(
+        self, query: str, chunk: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        async with self.db.session() as session:
+            return await session.write_transaction(run_query, query, chunk)
+
+    def adapt_chunk_size(self, stage: Stage, latency: float) -> None:
+        # the chunk size changes at most by a factor of two per transaction
+        ratio = min(max(self.target_latency / max(latency, 1e-3), 0.5), 2.0)
+        self.chunk_sizes[stage.name] = min(
+            max(int(self.chunk_sizes[stage.name] * ratio), self.min_chunk_size),
+            self.max_chunk_size,
+        )
+
+    async def run_stage(
+        self, stage: Stage, events: List[Dict[str, Any]]
+    ) -> Set[AgentKey]:
+        """Returns the agents for which not every relationship of the stage was created."""
+        incomplete_agents = set()
+        position = 0
+        attempt = 0
+        while position < len(events):
+            chunk = events[position : position + self.chunk_sizes[stage.name]]
+            start = time.perf_counter()
+            try:
+                records = await self.run_transaction(stage.query, chunk)
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self.chunk_sizes[stage.name] = max(
+                    self.chunk_sizes[stage.name] // 2, self.min_chunk_size
+                )
+                logger.warning(
+                    f"[{stage.name}] Chunk of {len(chunk)} events failed (attempt {attempt}/{self.max_retries}, retrying with chunk size {self.chunk_sizes[stage.name]}): {e}"
+                )
+                await asyncio.sleep(0.1 * 2**attempt)
+                continue
+
+            attempt = 0
+            position += len(chunk)
+            self.adapt_chunk_size(stage, time.perf_counter() - start)
+            if stage.count_relationships is not None:
+                incomplete_agents |= get_incomplete_agents(stage, chunk, records)
+        return incomplete_agents
+
+    async def run(self, write_plans: List[Dict[str, Any]]) -> Set[AgentKey]:
+        """Returns the agents for which not every relationship was created."""
+        incomplete_agents = set()
+        for stage in self.stages:
+            events = [
+                event
+                for event in map(stage.get_event, write_plans)
+                if event is not None
+            ]
+            if not events:
+                continue
+
+            start = time.perf_counter()
+            incomplete_agents |= await self.run_stage(stage, events)
+            logger.debug(
+                f"[{stage.name}] Wrote {len(events)} events in {time.perf_counter() - start:.3f}s (chunk size: {self.chunk_sizes[stage.name]})"
+            )
+        return incomplete_agents
@@ -11,6 +11,14 @@ class Settings:
     kafka_address = os.getenv("KAFKA_ADDRESS", "")
     topic = os.getenv("UPDATE_AGENT_OUTPUT_TOPIC_NAME", "")
     batch_timeout_ms = int(os.getenv("BATCH_TIMEOUT_MS", "1000"))
+    initial_chunk_size = int(os.getenv("INITIAL_CHUNK_SIZE", "500"))
+    min_chunk_size = int(os.getenv("MIN_CHUNK_SIZE", "10"))
+    max_chunk_size = int(os.getenv("MAX_CHUNK_SIZE", "5000"))
+    target_transaction_latency_ms = int(
+        os.getenv("TARGET_TRANSACTION_LATENCY_MS", "1000")
+    )
+    max_chunk_retries = int(os.getenv("MAX_CHUNK_RETRIES", "3"))
+    max_relationship_digests = int(os.getenv("MAX_RELATIONSHIP_DIGESTS", "1000000"))
 
 
 settings = Settings()
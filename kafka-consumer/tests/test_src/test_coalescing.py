@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from src.coalescing import coalesce_agent_updates
+
+
+def create_agent_update(simulation_id: str, jid: str, timestamp: int):
+    return {
+        "properties": {
+            "simulation_id": simulation_id,
+            "jid": jid,
+            "__timestamp__": timestamp,
+        },
+        "connections": [],
+        "messages": [],
+    }
+
+
+def test_coalesce_agent_updates_keeps_only_newest_snapshot_of_each_agent() -> None:
+    newest = create_agent_update("sim", "agent_1@test", 20)
+    agent_updates = [
+        create_agent_update("sim", "agent_1@test", 10),
+        newest,
+        create_agent_update("sim", "agent_1@test", 15),
+    ]
+
+    coalesced, num_collapsed = coalesce_agent_updates(agent_updates)
+
+    assert coalesced == [newest]
+    assert num_collapsed == 2
+
+
+def test_coalesce_agent_updates_distinguishes_agents_by_simulation_id() -> None:
+    agent_updates = [
+        create_agent_update("sim_1", "agent_1@test", 10),
+        create_agent_update("sim_2", "agent_1@test", 10),
+    ]
+
+    coalesced, num_collapsed = coalesce_agent_updates(agent_updates)
+
+    assert coalesced == agent_updates
+    assert num_collapsed == 0
+
+
+def test_coalesce_agent_updates_prefers_later_snapshot_with_equal_timestamp() -> None:
+    later = create_agent_update("sim", "agent_1@test", 10)
+    later["properties"]["value"] = 1
+    agent_updates = [create_agent_update("sim", "agent_1@test", 10), later]
+
+    coalesced, _ = coalesce_agent_updates(agent_updates)
+
+    assert coalesced == [later]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from src.digest import RelationshipDigests, get_write_plan
+
+
+def create_agent_update(connections, messages):
+    return {
+        "properties": {"simulation_id": "sim", "jid": "agent_1@test"},
+        "connections": [{"name": "friends", "to": connections}],
+        "messages": [{"name": "inbox", "messages": messages}],
+    }
+
+
+def test_get_write_plan_rewrites_all_relationships_of_unknown_agent() -> None:
+    agent_update = create_agent_update(["agent_2@test"], [{"sender": "agent_2@test"}])
+
+    write_plan, _, num_skipped = get_write_plan(agent_update, None)
+
+    assert write_plan["delete_all"]
+    assert write_plan["connections"] == agent_update["connections"]
+    assert write_plan["messages"] == agent_update["messages"]
+    assert num_skipped == 0
+
+
+def test_get_write_plan_creates_only_appended_relationships() -> None:
+    first_message = {"sender": "agent_2@test", "value": 1}
+    second_message = {"sender": "agent_3@test", "value": 2}
+    _, digest, _ = get_write_plan(
+        create_agent_update(["agent_2@test"], [first_message]), None
+    )
+
+    write_plan, _, num_skipped = get_write_plan(
+        create_agent_update(["agent_2@test"], [first_message, second_message]), digest
+    )
+
+    assert not write_plan["delete_all"]
+    assert write_plan["deleted_relationship_types"] == []
+    assert write_plan["connections"] == []
+    assert write_plan["messages"] == [{"name": "inbox", "messages": [second_message]}]
+    assert num_skipped == 2
+
+
+def test_get_write_plan_recreates_list_with_removed_items() -> None:
+    _, digest, _ = get_write_plan(
+        create_agent_update(["agent_2@test", "agent_3@test"], []), None
+    )
+
+    write_plan, _, _ = get_write_plan(create_agent_update(["agent_3@test"], []), digest)
+
+    assert write_plan["deleted_relationship_types"] == ["friends"]
+    assert write_plan["connections"] == [{"name": "friends", "to": ["agent_3@test"]}]
+
+
+def test_relationship_digests_evict_least_recently_updated_agents() -> None:
+    relationship_digests = RelationshipDigests(max_size=1)
+
+    relationship_digests.update({("sim", "agent_1@test"): {}})
+    relationship_digests.update({("sim", "agent_2@test"): {}})
+
+    assert list(relationship_digests.digests.keys()) == [("sim", "agent_2@test")]
+
+
+def test_after_discarding_digest_agent_relationships_are_rewritten() -> None:
+    relationship_digests = RelationshipDigests(max_size=2)
+    agent_update = create_agent_update(["agent_2@test"], [])
+    write_plans, new_digests, _ = relationship_digests.get_write_plans([agent_update])
+    relationship_digests.update(new_digests)
+
+    relationship_digests.discard([("sim", "agent_1@test"), ("sim", "unknown@test")])
+    write_plans, _, _ = relationship_digests.get_write_plans([agent_update])
+
+    assert write_plans[0]["delete_all"]
+    assert write_plans[0]["connections"] == [
+        {"name": "friends", "to": ["agent_2@test"]}
+    ]
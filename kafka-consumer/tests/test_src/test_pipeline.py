@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from src.pipeline import Stage, WritePipeline
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_pipeline(stages, **kwargs) -> WritePipeline:
+    settings = {
+        "initial_chunk_size": 2,
+        "min_chunk_size": 1,
+        "max_chunk_size": 8,
+        "target_latency_ms": 1000,
+        "max_retries": 2,
+        **kwargs,
+    }
+    return WritePipeline(Mock(), stages=stages, **settings)
+
+
+def create_stage(name: str = "stage") -> Stage:
+    return Stage(name=name, query=name, get_event=lambda agent_update: agent_update)
+
+
+@patch("src.pipeline.asyncio.sleep", new=AsyncMock())
+async def test_run_stage_writes_events_in_bounded_chunks() -> None:
+    stage = create_stage()
+    pipeline = create_pipeline([stage], max_chunk_size=2)
+    pipeline.run_transaction = AsyncMock()
+
+    await pipeline.run_stage(stage, [1, 2, 3, 4, 5])
+
+    chunks = [call.args[1] for call in pipeline.run_transaction.call_args_list]
+    assert chunks == [[1, 2], [3, 4], [5]]
+
+
+@patch("src.pipeline.asyncio.sleep", new=AsyncMock())
+async def test_run_stage_retries_only_failed_chunk() -> None:
+    stage = create_stage()
+    pipeline = create_pipeline([stage], max_chunk_size=2)
+    pipeline.run_transaction = AsyncMock(side_effect=[None, Exception(), None, None])
+
+    await pipeline.run_stage(stage, [1, 2, 3, 4])
+
+    chunks = [call.args[1] for call in pipeline.run_transaction.call_args_list]
+    assert chunks[0] == [1, 2]
+    assert sum(chunks[2:], []) == [3, 4]
+
+
+@patch("src.pipeline.asyncio.sleep", new=AsyncMock())
+async def test_run_stage_raises_exception_after_max_retries() -> None:
+    stage = create_stage()
+    pipeline = create_pipeline([stage], max_retries=2)
+    pipeline.run_transaction = AsyncMock(side_effect=Exception())
+
+    with pytest.raises(Exception):
+        await pipeline.run_stage(stage, [1, 2])
+
+    assert pipeline.run_transaction.call_count == 3
+
+
+def test_adapt_chunk_size_grows_chunks_for_fast_transactions() -> None:
+    stage = create_stage()
+    pipeline = create_pipeline([stage])
+
+    pipeline.adapt_chunk_size(stage, latency=0.01)
+
+    assert pipeline.chunk_sizes[stage.name] == 4
+
+
+def test_adapt_chunk_size_shrinks_chunks_for_slow_transactions() -> None:
+    stage = create_stage()
+    pipeline = create_pipeline([stage], initial_chunk_size=8)
+
+    pipeline.adapt_chunk_size(stage, latency=10)
+
+    assert pipeline.chunk_sizes[stage.name] == 4
+
+
+async def test_run_runs_all_stages_in_order() -> None:
+    stages = [create_stage("first"), create_stage("second")]
+    pipeline = create_pipeline(stages)
+    pipeline.run_transaction = AsyncMock()
+
+    await pipeline.run([1])
+
+    queries = [call.args[0] for call in pipeline.run_transaction.call_args_list]
+    assert queries == ["first", "second"]
+
+
+def create_counting_stage(name: str = "stage") -> Stage:
+    return Stage(
+        name=name,
+        query=name,
+        get_event=lambda event: event,
+        count_relationships=lambda event: len(event["to"]),
+    )
+
+
+@patch("src.pipeline.asyncio.sleep", new=AsyncMock())
+async def test_run_stage_returns_agents_with_relationships_not_created() -> None:
+    stage = create_counting_stage()
+    pipeline = create_pipeline([stage], max_chunk_size=8)
+    events = [
+        {"simulation_id": "sim", "jid": "agent_1", "to": ["agent_2", "agent_3"]},
+        {"simulation_id": "sim", "jid": "agent_2", "to": ["agent_1"]},
+        {"simulation_id": "sim", "jid": "agent_3", "to": ["agent_1"]},
+    ]
+    # agent_1 points at a missing agent and agent_3 itself is missing
+    pipeline.run_transaction = AsyncMock(
+        return_value=[
+            {"simulation_id": "sim", "jid": "agent_1", "num_created": 1},
+            {"simulation_id": "sim", "jid": "agent_2", "num_created": 1},
+        ]
+    )
+
+    incomplete_agents = await pipeline.run_stage(stage, events)
+
+    assert incomplete_agents == {("sim", "agent_1"), ("sim", "agent_3")}
+
+
+async def test_run_returns_incomplete_agents_of_every_stage() -> None:
+    stages = [create_counting_stage("first"), create_counting_stage("second")]
+    pipeline = create_pipeline(stages)
+    pipeline.run_transaction = AsyncMock(side_effect=[[], []])
+
+    incomplete_agents = await pipeline.run(
+        [{"simulation_id": "sim", "jid": "agent_1", "to": ["agent_2"]}]
+    )
+
+    assert incomplete_agents == {("sim", "agent_1")}
+    assert pipeline.run_transaction.call_count == 2
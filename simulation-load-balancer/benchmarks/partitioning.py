@@ -0,0 +1,113 @@
+"""Compares the agent partitioners on generated graphs.
+
+Run from the simulation-load-balancer directory:
+    python -m benchmarks.partitioning --agents 10000 --instances 8
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from src.partitioning import PARTITIONERS, get_edge_cut_ratio, get_load_imbalance
+
+AGENT_TYPE_COSTS = {"light": 1.0, "heavy": 4.0}
+
+
+def create_agents(num_agents: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "jid": f"{i}@benchmark",
+            "type": "heavy" if rng.random() < 0.2 else "light",
+            "connections": [],
+        }
+        for i in range(num_agents)
+    ]
+
+
+def generate_random_graph(
+    num_agents: int, num_connections: int, rng: random.Random
+) -> List[Dict[str, Any]]:
+    # the statistical graph of the AASM: every agent connected to randomly chosen ones
+    agents = create_agents(num_agents, rng)
+    for agent in agents:
+        agent["connections"] = [
+            agents[j]["jid"] for j in rng.sample(range(num_agents), num_connections)
+        ]
+    return agents
+
+
+def generate_barabasi_albert_graph(
+    num_agents: int, num_connections: int, rng: random.Random
+) -> List[Dict[str, Any]]:
+    # preferential attachment: new agents connect to the agents with many connections
+    agents = create_agents(num_agents, rng)
+    targets: List[int] = list(range(num_connections))
+    for i in range(num_connections, num_agents):
+        chosen = {rng.choice(targets) for _ in range(num_connections)}
+        agents[i]["connections"] = [agents[j]["jid"] for j in chosen]
+        targets.extend(chosen)
+        targets.extend([i] * len(chosen))
+    return agents
+
+
+def generate_community_graph(
+    num_agents: int, num_connections: int, rng: random.Random
+) -> List[Dict[str, Any]]:
+    # communities of 100 agents, 90% of the connections within the community, shuffled order
+    agents = create_agents(num_agents, rng)
+    community_size = 100
+    for i, agent in enumerate(agents):
+        community = i // community_size * community_size
+        connections = []
+        for _ in range(num_connections):
+            if rng.random() < 0.9:
+                j = rng.randrange(
+                    community, min(community + community_size, num_agents)
+                )
+            else:
+                j = rng.randrange(num_agents)
+            connections.append(agents[j]["jid"])
+        agent["connections"] = connections
+    rng.shuffle(agents)
+    return agents
+
+
+GRAPHS: Dict[str, Callable[[int, int, random.Random], List[Dict[str, Any]]]] = {
+    "random": generate_random_graph,
+    "barabasi-albert": generate_barabasi_albert_graph,
+    "community": generate_community_graph,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=5)
+    parser.add_argument("--instances", type=int, default=8)
+    parser.add_argument("--max-imbalance", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'graph':<16} {'partitioner':<12} {'edge cut':>9} {'imbalance':>10} {'time [s]':>9}"
+    )
+    for graph_name, generate_graph in GRAPHS.items():
+        graph = generate_graph(args.agents, args.connections, random.Random(args.seed))
+        for partitioner_name, partitioner in PARTITIONERS.items():
+            start = time.perf_counter()
+            partitions = partitioner(
+                graph, args.instances, AGENT_TYPE_COSTS, args.max_imbalance
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"{graph_name:<16} {partitioner_name:<12} "
+                f"{get_edge_cut_ratio(partitions):>9.3f} "
+                f"{get_load_imbalance(partitions, AGENT_TYPE_COSTS):>10.3f} "
+                f"{elapsed:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
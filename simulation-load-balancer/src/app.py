@@ -4,7 +4,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.handlers import (
+    create_shutdown_http_client_handler,
     create_shutdown_redis_connection_handler,
+    create_startup_http_client_handler,
     create_startup_redis_connection_handler,
 )
 from src.routers import router
@@ -29,5 +31,7 @@ def get_app(unit_tests: bool = False) -> FastAPI:
     if not unit_tests:
         app.add_event_handler("startup", create_startup_redis_connection_handler(app))
         app.add_event_handler("shutdown", create_shutdown_redis_connection_handler(app))
+        app.add_event_handler("startup", create_startup_http_client_handler(app))
+        app.add_event_handler("shutdown", create_shutdown_http_client_handler(app))
 
     return app
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Coroutine, Dict
+
+from src.db.repositories.instances import InstanceRepository
+from src.db.repositories.simulations import SimulationRepository
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aioredis import Redis
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_MIGRATION", "INFO"))
+
+MIGRATED_KEY = "migration:legacy_state"
+
+
+def decode_legacy_state(value: bytes | None) -> Dict[str, Any] | None:
+    # only the json objects of the previous layout are migrated, other string keys are left alone
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or "status" not in data:
+        return None
+    if data.get("simulation") and "key" not in data:
+        return None
+    return data
+
+
+async def migrate_legacy_state(redis: Redis) -> Coroutine[Any, Any, int]:
+    # the instances and simulations used to be json strings stored under their ids,
+    # the keyspace is scanned on the first startup to move them into the indexed layout
+    if await redis.exists(MIGRATED_KEY):
+        return 0
+    instance_repository = InstanceRepository(redis)
+    simulation_repository = SimulationRepository(redis)
+    num_migrated = 0
+    async for key in redis.scan_iter(_type="STRING"):
+        # the legacy keys were bare ids, namespaced keys (like the leases) belong to the new layout
+        # or to other services sharing the database (like the translation cache)
+        if b":" in key:
+            continue
+        data = decode_legacy_state(await redis.get(key))
+        if data is None:
+            logger.warning(
+                f"Skipping key {key!r}, it is not a legacy instance or simulation"
+            )
+            continue
+        if data.get("simulation"):
+            data.pop("simulation")
+            await simulation_repository.save(data["key"], data)
+        else:
+            await instance_repository.save(key.decode("utf-8"), data)
+        await redis.delete(key)
+        num_migrated += 1
+    await redis.set(MIGRATED_KEY, num_migrated)
+    if num_migrated:
+        logger.info(f"Migrated {num_migrated} instances and simulations")
+    return num_migrated
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aioredis import Redis
+
+
+def encode_hash(data: Dict[str, Any]) -> Dict[str, str]:
+    # every field is stored as json, so that the lists and numbers keep their types
+    return {field: json.dumps(value) for field, value in data.items()}
+
+
+def decode_hash(data: Dict[bytes, bytes]) -> Dict[str, Any]:
+    return {field.decode("utf-8"): json.loads(value) for field, value in data.items()}
+
+
+def decode_members(members: Iterable[bytes]) -> List[str]:
+    return sorted(member.decode("utf-8") for member in members)
+
+
+class BaseRepository:
+    """Entities stored as Redis hashes, found through Redis sets instead of scanning the keyspace."""
+
+    key_prefix: str = ""
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis
+
+    def get_key(self, entity_id: str) -> str:
+        return f"{self.key_prefix}:{entity_id}"
+
+    async def get(self, entity_id: str) -> Dict[str, Any] | None:
+        data = await self.redis.hgetall(self.get_key(entity_id))
+        if not data:
+            return None
+        return {**decode_hash(data), "key": entity_id}
+
+    async def get_many(self, entity_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        # one round-trip for all the entities, the ones removed in the meantime are skipped
+        entity_ids = list(entity_ids)
+        if not entity_ids:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for entity_id in entity_ids:
+                pipe.hgetall(self.get_key(entity_id))
+            results = await pipe.execute()
+        return [
+            {**decode_hash(data), "key": entity_id}
+            for entity_id, data in zip(entity_ids, results)
+            if data
+        ]
+
+    async def get_members(self, set_key: str) -> List[Dict[str, Any]]:
+        return await self.get_many(decode_members(await self.redis.smembers(set_key)))
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from src.db.repositories.base import BaseRepository, decode_members, encode_hash
+from src.status import Status
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aioredis import Redis
+
+INSTANCES_KEY = "instances"
+IDLE_INSTANCES_KEY = "instances:idle"
+
+
+# the scripts build the keys of the instances themselves, which is fine as long as redis is not clustered
+RESERVE_SCRIPT = """
+local instance_ids
+if tonumber(ARGV[3]) > 0 then
+    instance_ids = redis.call('SPOP', KEYS[1], ARGV[3])
+else
+    instance_ids = redis.call('SMEMBERS', KEYS[1])
+    redis.call('DEL', KEYS[1])
+end
+for _, instance_id in ipairs(instance_ids) do
+    redis.call('SET', 'instance:' .. instance_id .. ':lease', ARGV[1], 'EX', ARGV[2])
+end
+return instance_ids
+"""
+
+RENEW_SCRIPT = """
+for i = 3, #ARGV do
+    local lease = 'instance:' .. ARGV[i] .. ':lease'
+    if redis.call('GET', lease) == ARGV[1] then
+        redis.call('EXPIRE', lease, ARGV[2])
+    end
+end
+"""
+
+RELEASE_SCRIPT = """
+for i = 3, #ARGV do
+    local lease = 'instance:' .. ARGV[i] .. ':lease'
+    if redis.call('GET', lease) == ARGV[1] then
+        redis.call('DEL', lease)
+        if ARGV[2] == '1' and redis.call('HGET', 'instance:' .. ARGV[i], 'status') == '"IDLE"' then
+            redis.call('SADD', KEYS[1], ARGV[i])
+        end
+    end
+end
+"""
+
+INDEX_IDLE_SCRIPT = """
+if ARGV[2] == '1' and redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('SADD', KEYS[1], ARGV[1])
+else
+    redis.call('SREM', KEYS[1], ARGV[1])
+end
+"""
+
+
+def get_simulation_instances_key(simulation_id: str) -> str:
+    return f"simulation:{simulation_id}:instances"
+
+
+class InstanceRepository(BaseRepository):
+    """Spade instance states, indexed by status and by the simulation they run.
+
+    * `instance:<id>` - the state of the instance (hash)
+    * `instances` - ids of all the instances (set)
+    * `instances:idle` - ids of the idle instances (set)
+    * `simulation:<simulation id>:instances` - ids of the instances running the simulation (set)
+    * `instance:<id>:lease` - id of the simulation which reserved the instance, with a ttl (string)
+
+    Reserved instances are taken out of the idle ones until their lease is released or expires,
+    so that concurrently created simulations never pick the same instances.
+    """
+
+    key_prefix = "instance"
+
+    def __init__(self, redis: Redis):
+        super().__init__(redis)
+        self.reserve_script = redis.register_script(RESERVE_SCRIPT)
+        self.renew_script = redis.register_script(RENEW_SCRIPT)
+        self.release_script = redis.register_script(RELEASE_SCRIPT)
+        self.index_idle_script = redis.register_script(INDEX_IDLE_SCRIPT)
+
+    def get_lease_key(self, instance_id: str) -> str:
+        return f"{self.get_key(instance_id)}:lease"
+
+    async def get_all(self) -> List[Dict[str, Any]]:
+        return await self.get_members(INSTANCES_KEY)
+
+    async def get_idle(self) -> List[Dict[str, Any]]:
+        return await self.get_members(IDLE_INSTANCES_KEY)
+
+    async def get_by_simulation(self, simulation_id: str) -> List[Dict[str, Any]]:
+        return await self.get_members(get_simulation_instances_key(simulation_id))
+
+    async def get_simulation_id(self, instance_id: str) -> str | None:
+        simulation_id = await self.redis.hget(
+            self.get_key(instance_id), "simulation_id"
+        )
+        return json.loads(simulation_id) if simulation_id is not None else None
+
+    async def save(self, instance_id: str, data: Dict[str, Any]) -> None:
+        # the state and its indexes are replaced at once
+        old_simulation_id = await self.get_simulation_id(instance_id)
+        data = {field: value for field, value in data.items() if field != "key"}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.get_key(instance_id))
+            pipe.hset(self.get_key(instance_id), mapping=encode_hash(data))
+            pipe.sadd(INSTANCES_KEY, instance_id)
+            # a reserved instance is not idle, even though it reports so until its simulation starts
+            await self.index_idle_script(
+                keys=[IDLE_INSTANCES_KEY, self.get_lease_key(instance_id)],
+                args=[instance_id, int(data["status"] == Status.IDLE.name)],
+                client=pipe,
+            )
+            if old_simulation_id is not None:
+                pipe.srem(get_simulation_instances_key(old_simulation_id), instance_id)
+            if data.get("simulation_id") is not None:
+                pipe.sadd(
+                    get_simulation_instances_key(data["simulation_id"]), instance_id
+                )
+            await pipe.execute()
+
+    async def delete(self, instance_id: str) -> None:
+        old_simulation_id = await self.get_simulation_id(instance_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.get_key(instance_id), self.get_lease_key(instance_id))
+            pipe.srem(INSTANCES_KEY, instance_id)
+            pipe.srem(IDLE_INSTANCES_KEY, instance_id)
+            if old_simulation_id is not None:
+                pipe.srem(get_simulation_instances_key(old_simulation_id), instance_id)
+            await pipe.execute()
+
+    async def reserve(
+        self, simulation_id: str, num_instances: int, lease_seconds: int
+    ) -> List[Dict[str, Any]]:
+        # takes num_instances (all if 0) idle instances at once
+        instance_ids = await self.reserve_script(
+            keys=[IDLE_INSTANCES_KEY],
+            args=[simulation_id, lease_seconds, num_instances],
+        )
+        return await self.get_many(decode_members(instance_ids))
+
+    async def renew(
+        self, simulation_id: str, instance_ids: List[str], lease_seconds: int
+    ) -> None:
+        if instance_ids:
+            await self.renew_script(
+                keys=[IDLE_INSTANCES_KEY],
+                args=[simulation_id, lease_seconds, *instance_ids],
+            )
+
+    async def release(
+        self, simulation_id: str, instance_ids: List[str], make_idle: bool
+    ) -> None:
+        # the instances are idle again only if they still report so, otherwise their next report decides
+        if instance_ids:
+            await self.release_script(
+                keys=[IDLE_INSTANCES_KEY],
+                args=[simulation_id, int(make_idle), *instance_ids],
+            )
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from src.db.repositories.base import BaseRepository, encode_hash
+
+SIMULATIONS_KEY = "simulations"
+
+
+class SimulationRepository(BaseRepository):
+    """Simulations started by the load balancer.
+
+    * `simulation:<id>` - the simulation (hash)
+    * `simulations` - ids of all the simulations (set)
+    """
+
+    key_prefix = "simulation"
+
+    async def get_all(self) -> List[Dict[str, Any]]:
+        return await self.get_members(SIMULATIONS_KEY)
+
+    async def save(self, simulation_id: str, data: Dict[str, Any]) -> None:
+        data = {field: value for field, value in data.items() if field != "key"}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.get_key(simulation_id))
+            pipe.hset(self.get_key(simulation_id), mapping=encode_hash(data))
+            pipe.sadd(SIMULATIONS_KEY, simulation_id)
+            await pipe.execute()
@@ -5,12 +5,15 @@ from typing import TYPE_CHECKING, Callable, Type
 from aioredis import Redis
 from starlette.requests import Request
 
+from src.db.repositories.instances import InstanceRepository
+from src.db.repositories.simulations import SimulationRepository
 from src.services.data_processor import DataProcessorService
 from src.services.graph_generator import GraphGeneratorService
 from src.services.simulation_creator import SimulationCreatorService
 from src.services.translator import TranslatorService
 
 if TYPE_CHECKING:  # pragma: no cover
+    from src.db.repositories.base import BaseRepository
     from src.services import BaseServiceWithoutRepository
 
 
@@ -29,9 +32,6 @@ translator_service: Callable[[], TranslatorService] = _get_service_without_repos
 graph_generator_service: Callable[
     [], GraphGeneratorService
 ] = _get_service_without_repository(GraphGeneratorService)
-simulation_creator_service: Callable[
-    [], SimulationCreatorService
-] = _get_service_without_repository(SimulationCreatorService)
 data_processor_service: Callable[
     [], DataProcessorService
 ] = _get_service_without_repository(DataProcessorService)
@@ -45,3 +45,34 @@ def create_get_redis() -> Callable[[Request], Redis]:
 
 
 redis: Callable[[Request], Redis] = create_get_redis()
+
+
+def create_get_repository(
+    repository_type: Type[BaseRepository],
+) -> Callable[[Request], BaseRepository]:
+    def get_repository(request: Request) -> BaseRepository:
+        return repository_type(request.app.state.redis)
+
+    return get_repository
+
+
+instance_repository: Callable[[Request], InstanceRepository] = create_get_repository(
+    InstanceRepository
+)
+simulation_repository: Callable[
+    [Request], SimulationRepository
+] = create_get_repository(SimulationRepository)
+
+
+def create_get_simulation_creator_service() -> Callable[
+    [Request], SimulationCreatorService
+]:
+    def get_simulation_creator_service(request: Request) -> SimulationCreatorService:
+        return SimulationCreatorService(request.app.state.http_client)
+
+    return get_simulation_creator_service
+
+
+simulation_creator_service: Callable[
+    [Request], SimulationCreatorService
+] = create_get_simulation_creator_service()
@@ -5,8 +5,10 @@ import os
 from typing import TYPE_CHECKING, Any, Awaitable, Callable, Coroutine
 
 import aioredis
+import httpx
 
-from src.settings import redis_settings
+from src.db.migration import migrate_legacy_state
+from src.settings import redis_settings, spade_instance_settings
 
 if TYPE_CHECKING:
     from fastapi import FastAPI
@@ -26,6 +28,7 @@ def create_startup_redis_connection_handler(
             password=redis_settings.redis_password,
         )
         logger.info("Connected to redis")
+        await migrate_legacy_state(app.state.redis)
 
     return connect_redis
 
@@ -39,3 +42,30 @@ def create_shutdown_redis_connection_handler(
         logger.info("Disconnected from redis")
 
     return disconnect_redis
+
+
+def create_startup_http_client_handler(
+    app: FastAPI,
+) -> Callable[[], Awaitable[None]]:
+    async def create_http_client() -> Coroutine[Any, Any, None]:
+        logger.info("Creating http client")
+        # shared by the requests sent to the spade instances
+        app.state.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=spade_instance_settings.max_concurrency,
+                max_keepalive_connections=spade_instance_settings.max_concurrency,
+            ),
+            timeout=spade_instance_settings.timeout,
+        )
+
+    return create_http_client
+
+
+def create_shutdown_http_client_handler(
+    app: FastAPI,
+) -> Callable[[], Awaitable[None]]:
+    async def close_http_client() -> Coroutine[Any, Any, None]:
+        logger.info("Closing http client")
+        await app.state.http_client.aclose()
+
+    return close_http_client
@@ -13,4 +13,5 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=app_settings.port,
         reload=app_settings.enable_reload,
+        timeout_keep_alive=app_settings.keep_alive_timeout,
     )
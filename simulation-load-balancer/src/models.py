@@ -1,18 +1,22 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Dict, List
 
 from pydantic import BaseModel
 
 
 class CreateSpadeSimulation(BaseModel):
     aasm_code_lines: List[str]
+    # the same code and seed always generate the same graph
+    graph_seed: int = None
 
 
 class CreatedSimulation(BaseModel):
     simulation_id: str
     info: str
     status: str
+    # seconds spent in every stage of the creation, the stages can overlap
+    timings: Dict[str, float] = None
 
 
 class SimulationData(CreatedSimulation):
@@ -28,6 +32,27 @@ class InstanceState(BaseModel):
     broken_agents: List[str]
     api_memory_usage_MiB: float
     simulation_memory_usage_MiB: float
+    # the resources of the instance, not reported by the older ones
+    cpu_count: int = None
+    available_memory_MiB: float = None
+    agents_per_second: float = None
+    version: int = 0
+
+
+class InstanceStateDelta(BaseModel):
+    # changes to the state with base_version
+    base_version: int
+    version: int
+    status: str
+    simulation_id: str = None
+    num_agents: int
+    broken_agents_added: List[str]
+    broken_agents_removed: List[str]
+    api_memory_usage_MiB: float
+    simulation_memory_usage_MiB: float
+    cpu_count: int = None
+    available_memory_MiB: float = None
+    agents_per_second: float = None
 
 
 class InstanceData(InstanceState):
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_PARTITIONING", "INFO"))
+
+NUM_REFINEMENT_PASSES = 5
+MIN_INSTANCE_WEIGHT = 0.01
+
+Partitioner = Callable[
+    [List[Dict[str, Any]], int, Dict[str, float], float, List[float]],
+    List[List[Dict[str, Any]]],
+]
+
+
+def get_agent_cost(agent: Dict[str, Any], agent_type_costs: Dict[str, float]) -> float:
+    return agent_type_costs.get(agent["type"], 1.0)
+
+
+def get_undirected_neighbours(graph: List[Dict[str, Any]]) -> List[List[int]]:
+    # the agents exchange messages both ways, the connections of unknown agents are skipped
+    index = {agent["jid"]: i for i, agent in enumerate(graph)}
+    neighbours: List[List[int]] = [[] for _ in graph]
+    for i, agent in enumerate(graph):
+        for jid in agent.get("connections", []):
+            j = index.get(jid)
+            if j is not None and j != i:
+                neighbours[i].append(j)
+                neighbours[j].append(i)
+    return neighbours
+
+
+def get_instance_weights(instances: List[Dict[str, Any]]) -> List[float]:
+    """Relative capacity of the instances, the agents are split in proportion to it.
+
+    The compute capacity is the measured number of agents started per second, if every instance has measured it,
+    and the number of CPUs otherwise. The share of an instance is the smaller of its share of the compute capacity
+    and its share of the free memory, so that the small hosts do not run out of memory.
+    Instances which do not report their resources count as one CPU and are not limited by memory.
+    """
+    if all(instance.get("agents_per_second") for instance in instances):
+        compute = [instance["agents_per_second"] for instance in instances]
+    else:
+        compute = [instance.get("cpu_count") or 1 for instance in instances]
+    weights = [value / sum(compute) for value in compute]
+    if all(instance.get("available_memory_MiB") is not None for instance in instances):
+        memory = [instance["available_memory_MiB"] for instance in instances]
+        if sum(memory) > 0:
+            weights = [
+                min(weight, value / sum(memory))
+                for weight, value in zip(weights, memory)
+            ]
+    # every instance runs a part of the simulation, even if it is a small one
+    weights = [max(weight, MIN_INSTANCE_WEIGHT) for weight in weights]
+    return [weight / sum(weights) for weight in weights]
+
+
+def get_target_loads(total: float, n: int, weights: List[float] | None) -> List[float]:
+    if weights is None:
+        return [total / n] * n
+    return [total * weight / sum(weights) for weight in weights]
+
+
+def split_into_instances(
+    graph: List[Dict[str, Any]],
+    n: int,
+    agent_type_costs: Dict[str, float] | None = None,
+    max_imbalance: float = 0.0,
+    weights: List[float] | None = None,
+) -> List[List[Dict[str, Any]]]:
+    # contiguous slices with the number of agents proportional to the weights of the instances
+    if weights is None:
+        batch_size, rem = divmod(len(graph), n)
+        batches = [
+            graph[i * batch_size + min(i, rem) : (i + 1) * batch_size + min(i + 1, rem)]
+            for i in range(n)
+        ]
+        return batches
+
+    ends = []
+    cumulative_load = 0.0
+    for target_load in get_target_loads(len(graph), n, weights):
+        cumulative_load += target_load
+        ends.append(round(cumulative_load))
+    ends[-1] = len(graph)
+    return [graph[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+
+def partition_greedy(
+    graph: List[Dict[str, Any]],
+    n: int,
+    agent_type_costs: Dict[str, float] | None = None,
+    max_imbalance: float = 0.05,
+    weights: List[float] | None = None,
+) -> List[List[Dict[str, Any]]]:
+    """Linear deterministic greedy partitioning of the connections graph.
+
+    The agents are visited in breadth-first order and each of them is placed on the instance with the most
+    of its already placed neighbours, weighted by the free capacity of the instance, so that connected agents
+    share an instance while the cost of the agents stays within `max_imbalance` of the instance's share
+    (equal, unless the instances have `weights`).
+    Then, the agents are moved to the instance with the most of their neighbours, as long as it has capacity left.
+    """
+    agent_type_costs = agent_type_costs or {}
+    costs = [get_agent_cost(agent, agent_type_costs) for agent in graph]
+    capacities = [
+        target_load * (1 + max_imbalance)
+        for target_load in get_target_loads(sum(costs), n, weights)
+    ]
+    neighbours = get_undirected_neighbours(graph)
+    loads = [0.0] * n
+    assignment = [-1] * len(graph)
+
+    def assign(i: int) -> None:
+        neighbour_counts: Dict[int, int] = {}
+        for j in neighbours[i]:
+            if assignment[j] != -1:
+                neighbour_counts[assignment[j]] = (
+                    neighbour_counts.get(assignment[j], 0) + 1
+                )
+        best, best_score = -1, 0.0
+        for partition, count in neighbour_counts.items():
+            if loads[partition] + costs[i] > capacities[partition]:
+                continue
+            score = count * (1 - loads[partition] / capacities[partition])
+            if score > best_score:
+                best, best_score = partition, score
+        if best == -1:
+            best = min(range(n), key=lambda p: loads[p] / capacities[p])
+        assignment[i] = best
+        loads[best] += costs[i]
+
+    for start in range(len(graph)):
+        if assignment[start] != -1:
+            continue
+        assign(start)
+        queue = deque([start])
+        while queue:
+            for j in neighbours[queue.popleft()]:
+                if assignment[j] == -1:
+                    assign(j)
+                    queue.append(j)
+
+    for _ in range(NUM_REFINEMENT_PASSES):
+        num_moved = 0
+        for i in range(len(graph)):
+            neighbour_counts = {}
+            for j in neighbours[i]:
+                neighbour_counts[assignment[j]] = (
+                    neighbour_counts.get(assignment[j], 0) + 1
+                )
+            current = assignment[i]
+            best, best_count = current, neighbour_counts.get(current, 0)
+            for partition, count in neighbour_counts.items():
+                if (
+                    count > best_count
+                    and loads[partition] + costs[i] <= capacities[partition]
+                ):
+                    best, best_count = partition, count
+            if best != current:
+                assignment[i] = best
+                loads[current] -= costs[i]
+                loads[best] += costs[i]
+                num_moved += 1
+        logger.debug(f"Moved {num_moved} agents between instances")
+        if num_moved == 0:
+            break
+
+    partitions: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+    for agent, partition in zip(graph, assignment):
+        partitions[partition].append(agent)
+    return partitions
+
+
+PARTITIONERS: Dict[str, Partitioner] = {
+    "contiguous": split_into_instances,
+    "greedy": partition_greedy,
+}
+
+
+def get_partitioner(name: str) -> Partitioner:
+    try:
+        return PARTITIONERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown partitioner: {name} (available: {', '.join(PARTITIONERS)})"
+        )
+
+
+def get_edge_cut_ratio(partitions: List[List[Dict[str, Any]]]) -> float:
+    # the share of the connections between agents on different instances
+    partition_of = {
+        agent["jid"]: partition
+        for partition, agents in enumerate(partitions)
+        for agent in agents
+    }
+    num_connections = 0
+    num_cut = 0
+    for partition, agents in enumerate(partitions):
+        for agent in agents:
+            for jid in agent.get("connections", []):
+                if jid in partition_of:
+                    num_connections += 1
+                    num_cut += partition_of[jid] != partition
+    return num_cut / num_connections if num_connections else 0.0
+
+
+def get_load_imbalance(
+    partitions: List[List[Dict[str, Any]]],
+    agent_type_costs: Dict[str, float],
+    weights: List[float] | None = None,
+) -> float:
+    # how much the most loaded instance exceeds its share of the load
+    loads = [
+        sum(get_agent_cost(agent, agent_type_costs) for agent in agents)
+        for agents in partitions
+    ]
+    if not loads or sum(loads) == 0:
+        return 0.0
+    target_loads = get_target_loads(sum(loads), len(loads), weights)
+    return max(load / target for load, target in zip(loads, target_loads)) - 1
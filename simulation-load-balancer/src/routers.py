@@ -1,20 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from typing import Any, AsyncIterator
 from uuid import uuid4
 
 
-from aioredis import Redis
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
 from starlette import status
 
+from src.db.repositories.instances import InstanceRepository
+from src.db.repositories.simulations import SimulationRepository
 from src.dependencies import (
     data_processor_service,
     graph_generator_service,
-    redis,
+    instance_repository,
     simulation_creator_service,
+    simulation_repository,
     translator_service,
 )
 from src.exceptions import (
@@ -28,6 +32,7 @@ from src.models import (
     CreateSpadeSimulation,
     InstanceData,
     InstanceState,
+    InstanceStateDelta,
     SimulationData,
     SimulationLoadBalancerState,
 )
@@ -35,38 +40,35 @@ from src.services.data_processor import DataProcessorService
 from src.services.graph_generator import GraphGeneratorService
 from src.services.simulation_creator import SimulationCreatorService
 from src.services.translator import TranslatorService
+from src.settings import simulation_load_balancer_settings
 from src.status import Status
+from src.timings import StageTimings
 
 router = APIRouter()
 
 
+async def iterate_queue(queue: asyncio.Queue) -> AsyncIterator[Any]:
+    # the items put into the queue, until None
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        yield item
+
+
 @router.get("/simulations", response_model=SimulationLoadBalancerState, status_code=200)
-async def get_states(redis_conn: Redis = Depends(redis)):
-    instances = []
-    simulations = []
-    async for key in redis_conn.scan_iter():
-        key_data = await redis_conn.get(key)
-        key_data = json.loads(key_data)
-        try:
-            is_sim = key_data["simulation"]
-            if is_sim:
-                data = SimulationData(
-                    simulation_id=key_data["key"], status=key_data["status"]
-                )
-                simulations.append(data)
-        except KeyError:
-            instance = key_data
-            instance_id = key.decode("UTF-8")
-            data = InstanceData(
-                key=instance_id,
-                status=instance["status"],
-                simulation_id=instance["simulation_id"],
-                num_agents=instance["num_agents"],
-                broken_agents=instance["broken_agents"],
-                api_memory_usage_MiB=instance["api_memory_usage_MiB"],
-                simulation_memory_usage_MiB=instance["simulation_memory_usage_MiB"],
-            )
-            instances.append(data)
+async def get_states(
+    instance_repository_conn: InstanceRepository = Depends(instance_repository),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
+):
+    instances = [
+        InstanceData(**instance)
+        for instance in await instance_repository_conn.get_all()
+    ]
+    simulations = [
+        SimulationData(simulation_id=simulation["key"], status=simulation["status"])
+        for simulation in await simulation_repository_conn.get_all()
+    ]
     return SimulationLoadBalancerState(instances=instances, simulations=simulations)
 
 
@@ -77,10 +79,15 @@ async def create_from_backup(
         simulation_creator_service
     ),
     data_processor_service_conn: DataProcessorService = Depends(data_processor_service),
-    redis_conn: Redis = Depends(redis),
+    instance_repository_conn: InstanceRepository = Depends(instance_repository),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
 ):
-    sim_data = await redis_conn.get(sim_id)
-    sim_data = json.loads(sim_data)
+    sim_data = await simulation_repository_conn.get(sim_id)
+    if sim_data is None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Couldn't restart simulation: No simulation with that id",
+        )
     if sim_data["status"] == Status.ACTIVE.name:
         raise HTTPException(
             status.HTTP_406_NOT_ACCEPTABLE, f"Can't restart a running simulation"
@@ -109,28 +116,28 @@ async def create_from_backup(
         raise HTTPException(500, f"Could not create a simulation (data processor: {e})")
 
     # start the simulation
-    available_instances = []
-    # get every instance which is available
-    async for key in redis_conn.scan_iter():
-        instance = await redis_conn.get(key)
-        instance = json.loads(instance)
-        instance["key"] = key.decode("utf-8")
-        logging.warning(instance["key"])
-        try:
-            if str(instance["status"]) == Status.IDLE.name:
-                available_instances.append(instance)
-        except KeyError as e:
-            pass
+    # reserve the available instances, so that no other simulation is started on them
+    available_instances = await instance_repository_conn.reserve(
+        simulation_id,
+        simulation_load_balancer_settings.max_instances,
+        simulation_load_balancer_settings.instance_lease_seconds,
+    )
+    logging.warning(f"Found {len(available_instances)} instances")
 
+    success = False
     try:
         if len(available_instances) == 0:
             raise HTTPException(500, "Couldn't find available instances")
         logging.info("Creating simulation...")
         attempt = 1
-        success = False
         # attempt three times to create the simulation
         while not success and attempt <= 3:
             attempt = attempt + 1
+            await instance_repository_conn.renew(
+                simulation_id,
+                [inst["key"] for inst in available_instances],
+                simulation_load_balancer_settings.instance_lease_seconds,
+            )
             bad_instances = await simulation_creator_service_conn.create(
                 sim_data["agent_code_lines"], backup, available_instances, simulation_id
             )
@@ -154,7 +161,7 @@ async def create_from_backup(
                     inst for inst in available_instances if inst["key"] not in bad_keys
                 ]
                 for key in bad_keys:
-                    await redis_conn.delete(key)
+                    await instance_repository_conn.delete(key)
                 # for the remaining instances we need to delete all the correctly started simulations
                 await simulation_creator_service_conn.delete_simulation_instances(
                     available_instances
@@ -166,14 +173,19 @@ async def create_from_backup(
             )
     except SimulationCreatorException as e:
         raise HTTPException(500, f"Couldn't create simulation (spade instance:{e})")
+    finally:
+        # the instances running the simulation are no longer idle once they report their state
+        await instance_repository_conn.release(
+            simulation_id,
+            [inst["key"] for inst in available_instances],
+            make_idle=not success,
+        )
     new_data = {
         "available_instances": available_instances,
         "status": Status.ACTIVE.name,
-        "simulation": True,
-        "key": simulation_id,
         "agent_code_lines": sim_data["agent_code_lines"],
     }
-    await redis_conn.mset({simulation_id: json.dumps(new_data)})
+    await simulation_repository_conn.save(simulation_id, new_data)
 
     return CreatedSimulation(
         simulation_id=simulation_id, status=Status.ACTIVE.name, info=""
@@ -191,49 +203,74 @@ async def create_simulation(
         simulation_creator_service
     ),
     data_processor_service_conn: DataProcessorService = Depends(data_processor_service),
-    redis_conn: Redis = Depends(redis),
+    instance_repository_conn: InstanceRepository = Depends(instance_repository),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
 ):
+    timings = StageTimings()
     try:
-        agent_code_lines, graph_code_lines = await translator_service_conn.translate(
-            simulation_data.aasm_code_lines
-        )
+        with timings.measure("translate"):
+            (
+                agent_code_lines,
+                graph_code_lines,
+            ) = await translator_service_conn.translate(simulation_data.aasm_code_lines)
     except TranslatorException as e:
         raise HTTPException(500, f"Could not create a simulation (translator: {e}).")
 
+    # the graph is backed up as it arrives from the graph generator, and while the simulation is started
+    simulation_id = str(uuid4())[:10]
+    backup_chunks = asyncio.Queue()
+    backup = asyncio.create_task(
+        timings.measure_coroutine(
+            "backup",
+            data_processor_service_conn.save_state_stream(
+                simulation_id, iterate_queue(backup_chunks)
+            ),
+        )
+    )
+    graph = []
     try:
-        graph = await graph_generator_service_conn.generate(graph_code_lines)
+        with timings.measure("generate_graph"):
+            async for graph_chunk in graph_generator_service_conn.generate_stream(
+                graph_code_lines,
+                simulation_load_balancer_settings.stream_chunk_size,
+                simulation_data.graph_seed,
+            ):
+                graph.extend(graph_chunk)
+                backup_chunks.put_nowait(graph_chunk)
     except GraphGeneratorException as e:
+        backup.cancel()
         raise HTTPException(
             500, f"Could not create a simulation (graph generator: {e})."
         )
-
-    simulation_id = str(uuid4())[:10]
-    try:
-        backup_status = await data_processor_service_conn.save_state(
-            simulation_id, graph
-        )
-    except DataProcessorException as e:
-        raise HTTPException(500, f"Could not create a simulation (data processor: {e})")
+    except Exception:
+        backup.cancel()
+        raise
+    backup_chunks.put_nowait(None)
 
     # start the simulation
-    available_instances = []
-    # get every instance which is available
-    async for key in redis_conn.scan_iter():
-        instance = await redis_conn.get(key)
-        instance = json.loads(instance)
-        instance["key"] = key.decode("utf-8")
-        logging.warning(instance["key"])
-        if str(instance["status"]) == Status.IDLE.name:
-            available_instances.append(instance)
+    timings.start("start_instances")
+    # reserve the available instances, so that no other simulation is started on them
+    available_instances = await instance_repository_conn.reserve(
+        simulation_id,
+        simulation_load_balancer_settings.max_instances,
+        simulation_load_balancer_settings.instance_lease_seconds,
+    )
     logging.warning(f"Found {len(available_instances)} instances")
 
+    success = False
     try:
+        if len(available_instances) == 0:
+            raise HTTPException(500, "Couldn't find available instances")
         logging.info("Creating simulation...")
         attempt = 1
-        success = False
         # attempt three times to create the simulation
         while not success and attempt <= 3:
             attempt = attempt + 1
+            await instance_repository_conn.renew(
+                simulation_id,
+                [inst["key"] for inst in available_instances],
+                simulation_load_balancer_settings.instance_lease_seconds,
+            )
             bad_instances = await simulation_creator_service_conn.create(
                 agent_code_lines, graph, available_instances, simulation_id
             )
@@ -256,7 +293,7 @@ async def create_simulation(
                     inst for inst in available_instances if inst["key"] not in bad_keys
                 ]
                 for key in bad_keys:
-                    await redis_conn.delete(key)
+                    await instance_repository_conn.delete(key)
                 # for the remaining instances we need to delete all the correctly started simulations
                 await simulation_creator_service_conn.delete_simulation_instances(
                     available_instances
@@ -267,62 +304,140 @@ async def create_simulation(
             )
     except SimulationCreatorException as e:
         raise HTTPException(500, f"Couldn't create simulation (spade instance:{e})")
+    finally:
+        timings.stop("start_instances")
+        # the instances running the simulation are no longer idle once they report their state
+        await instance_repository_conn.release(
+            simulation_id,
+            [inst["key"] for inst in available_instances],
+            make_idle=not success,
+        )
+        if not success:
+            await asyncio.gather(backup, return_exceptions=True)
+
+    try:
+        await backup
+    except Exception as e:
+        # the simulation is already running on the instances, it is stopped if it could not be backed up
+        await simulation_creator_service_conn.delete_simulation_instances(
+            available_instances
+        )
+        raise HTTPException(500, f"Could not create a simulation (data processor: {e})")
+    logging.info(f"Simulation {simulation_id} created, timings: {timings.as_dict()}")
+
     sim_data = {
         "available_instances": available_instances,
         "status": Status.ACTIVE.name,
-        "simulation": True,
-        "key": simulation_id,
         "agent_code_lines": agent_code_lines,
     }
-    await redis_conn.mset({simulation_id: json.dumps(sim_data)})
+    await simulation_repository_conn.save(simulation_id, sim_data)
 
     return CreatedSimulation(
-        simulation_id=simulation_id, status=Status.ACTIVE.name, info=""
+        simulation_id=simulation_id,
+        status=Status.ACTIVE.name,
+        info="",
+        timings=timings.as_dict(),
     )
 
 
-@router.put("/instances/{instance_id}/state", status_code=200)
-async def save_instance_data(
-    instance_id: str,
-    body: InstanceState,
-    simulation_creator_service_conn: SimulationCreatorService = Depends(
-        simulation_creator_service
-    ),
-    redis_conn: Redis = Depends(redis),
+async def stop_simulation_with_broken_agents(
+    data: dict,
+    simulation_creator_service_conn: SimulationCreatorService,
+    instance_repository_conn: InstanceRepository,
+    simulation_repository_conn: SimulationRepository,
 ):
-    data = json.loads(body.json())
-    logging.warning(f"Got state from instance: {instance_id}. State is: {data}")
-    await redis_conn.mset({instance_id: body.json()})
-
     if len(data["broken_agents"]) != 0 and (
         data["status"] == Status.RUNNING.name or data["status"] == Status.STARTING.name
     ):
         sim_id = data["simulation_id"]
-        available_instances = []
-        # get every instance which is available
-        async for key in redis_conn.scan_iter():
-            instance = await redis_conn.get(key)
-            instance = json.loads(instance)
-            instance["key"] = key.decode("utf-8")
-            logging.warning(instance["key"])
-            try:
-                if str(instance["simulation_id"]) == sim_id:
-                    available_instances.append(instance)
-            except KeyError:
-                pass
+        # get every instance running the simulation
+        available_instances = await instance_repository_conn.get_by_simulation(sim_id)
         err = await simulation_creator_service_conn.delete_simulation_instances(
             available_instances
         )
-        old_data = await redis_conn.get(sim_id)
-        old_data = json.loads(old_data)
+        old_data = await simulation_repository_conn.get(sim_id)
         sim_data = {
             "available_instances": [],
             "status": Status.BROKEN.name,
-            "simulation": True,
-            "key": sim_id,
             "agent_code_lines": old_data["agent_code_lines"],
         }
-        await redis_conn.mset({sim_id: json.dumps(sim_data)})
+        await simulation_repository_conn.save(sim_id, sim_data)
+
+
+@router.put("/instances/{instance_id}/state", status_code=200)
+async def save_instance_data(
+    instance_id: str,
+    body: InstanceState,
+    simulation_creator_service_conn: SimulationCreatorService = Depends(
+        simulation_creator_service
+    ),
+    instance_repository_conn: InstanceRepository = Depends(instance_repository),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
+):
+    data = json.loads(body.json())
+    logging.warning(f"Got state from instance: {instance_id}. State is: {data}")
+    await instance_repository_conn.save(instance_id, data)
+
+    await stop_simulation_with_broken_agents(
+        data,
+        simulation_creator_service_conn,
+        instance_repository_conn,
+        simulation_repository_conn,
+    )
+
+    return
+
+
+# the instance sends the full state with PUT if the delta is rejected
+@router.patch("/instances/{instance_id}/state", status_code=200)
+async def update_instance_data(
+    instance_id: str,
+    body: InstanceStateDelta,
+    simulation_creator_service_conn: SimulationCreatorService = Depends(
+        simulation_creator_service
+    ),
+    instance_repository_conn: InstanceRepository = Depends(instance_repository),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
+):
+    logging.warning(
+        f"Got state changes from instance: {instance_id}. Changes are: {body}"
+    )
+    data = await instance_repository_conn.get(instance_id)
+    if data is None:
+        raise HTTPException(
+            status.HTTP_409_CONFLICT, f"No state of instance {instance_id}"
+        )
+    if data.get("version", 0) != body.base_version:
+        raise HTTPException(
+            status.HTTP_409_CONFLICT,
+            f"State version of instance {instance_id} is {data.get('version', 0)}, not {body.base_version}",
+        )
+
+    broken_agents = set(data["broken_agents"])
+    broken_agents.difference_update(body.broken_agents_removed)
+    broken_agents.update(body.broken_agents_added)
+    data.update(
+        {
+            "status": body.status,
+            "simulation_id": body.simulation_id,
+            "num_agents": body.num_agents,
+            "broken_agents": list(broken_agents),
+            "api_memory_usage_MiB": body.api_memory_usage_MiB,
+            "simulation_memory_usage_MiB": body.simulation_memory_usage_MiB,
+            "cpu_count": body.cpu_count,
+            "available_memory_MiB": body.available_memory_MiB,
+            "agents_per_second": body.agents_per_second,
+            "version": body.version,
+        }
+    )
+    await instance_repository_conn.save(instance_id, data)
+
+    await stop_simulation_with_broken_agents(
+        data,
+        simulation_creator_service_conn,
+        instance_repository_conn,
+        simulation_repository_conn,
+    )
 
     return
 
@@ -333,17 +448,14 @@ async def del_instance_data(
     simulation_creator_service_conn: SimulationCreatorService = Depends(
         simulation_creator_service
     ),
-    redis_conn: Redis = Depends(redis),
+    simulation_repository_conn: SimulationRepository = Depends(simulation_repository),
 ):
-    sim_data = await redis_conn.get(simulation_id)
-    sim_instances = []
-    if sim_data is None:
+    sim_instances = await simulation_repository_conn.get(simulation_id)
+    if sim_instances is None:
         raise HTTPException(
             status_code=500,
             detail=f"Couldn't delete simulation: No simulation with that id",
         )
-    else:
-        sim_instances = json.loads(sim_data)
 
     success = False
     attempt = 0
@@ -361,11 +473,9 @@ async def del_instance_data(
         new_sim_data = {
             "available_instances": [],
             "status": Status.BROKEN.name,
-            "simulation": True,
-            "key": simulation_id,
             "agent_code_lines": sim_instances["agent_code_lines"],
         }
-        await redis_conn.mset({simulation_id: json.dumps(new_sim_data)})
+        await simulation_repository_conn.save(simulation_id, new_sim_data)
         raise HTTPException(
             status_code=504,
             detail=f"Failed to delete simulation at {json.dumps(error_instances)}",
@@ -374,8 +484,6 @@ async def del_instance_data(
         new_sim_data = {
             "available_instances": [],
             "status": Status.DEACTIVATED.name,
-            "simulation": True,
-            "key": simulation_id,
             "agent_code_lines": sim_instances["agent_code_lines"],
         }
-        await redis_conn.mset({simulation_id: json.dumps(new_sim_data)})
+        await simulation_repository_conn.save(simulation_id, new_sim_data)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 import httpx
+import orjson
 from starlette import status
 
 from src.exceptions import DataProcessorException
@@ -11,6 +12,23 @@ from src.services.base import BaseServiceWithoutRepository
 from src.settings import data_processor_settings
 
 
+async def iterate_json_array(
+    chunks: AsyncIterator[List[Dict[str, Any]]]
+) -> AsyncIterator[bytes]:
+    # the backup endpoint expects a json array, it is sent one chunk of agents at a time
+    yield b"["
+    is_separating_comma_required = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        serialized_chunk = b",".join(orjson.dumps(agent) for agent in chunk)
+        if is_separating_comma_required:
+            serialized_chunk = b"," + serialized_chunk
+        is_separating_comma_required = True
+        yield serialized_chunk
+    yield b"]"
+
+
 class DataProcessorService(BaseServiceWithoutRepository):
     async def save_state(
         self, simulation_id: str, graph: List[Dict[str, Any]]
@@ -27,6 +45,29 @@ class DataProcessorService(BaseServiceWithoutRepository):
                 )
             return StatusResponse(status_code=response.status_code, status="success")
 
+    async def save_state_stream(
+        self, simulation_id: str, graph_chunks: AsyncIterator[List[Dict[str, Any]]]
+    ) -> StatusResponse:
+        # the backup is sent while the graph is still being received
+        async with httpx.AsyncClient(
+            base_url=data_processor_settings.url, timeout=None
+        ) as client:
+            try:
+                response = await client.post(
+                    f"/simulations/{simulation_id}/backup",
+                    content=iterate_json_array(graph_chunks),
+                    headers={"Content-Type": "application/json"},
+                )
+            except httpx.HTTPError as e:
+                raise DataProcessorException(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, f"Couldn't save backup ({e})"
+                )
+            if response.status_code != status.HTTP_200_OK:
+                raise DataProcessorException(
+                    response.status_code, "Couldn't save backup"
+                )
+            return StatusResponse(status_code=response.status_code, status="success")
+
     async def get_backup(self, simulation_id: str) -> List[Dict[str, Any]]:
         async with httpx.AsyncClient(
             base_url=data_processor_settings.url, timeout=None
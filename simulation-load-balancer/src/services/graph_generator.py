@@ -1,18 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 import httpx
 from starlette import status
 
 from src.exceptions import GraphGeneratorException
+from src.ndjson import iterate_graph_chunks, iterate_lines
 from src.services.base import BaseServiceWithoutRepository
 from src.settings import graph_generator_settings
 
 
+def get_graph_generator_data(
+    graph_code_lines: List[str], seed: int | None
+) -> Dict[str, Any]:
+    # the seed is sent only if set, so that the other requests stay unchanged
+    graph_generator_data = {"graph_code_lines": graph_code_lines}
+    if seed is not None:
+        graph_generator_data["seed"] = seed
+    return graph_generator_data
+
+
 class GraphGeneratorService(BaseServiceWithoutRepository):
-    async def generate(self, graph_code_lines: List[str]) -> List[Dict[str, Any]]:
-        graph_generator_data = {"graph_code_lines": graph_code_lines}
+    async def generate(
+        self, graph_code_lines: List[str], seed: int | None = None
+    ) -> List[Dict[str, Any]]:
+        graph_generator_data = get_graph_generator_data(graph_code_lines, seed)
 
         async with httpx.AsyncClient(
             base_url=graph_generator_settings.url, timeout=None
@@ -29,3 +42,41 @@ class GraphGeneratorService(BaseServiceWithoutRepository):
             )
 
         return graph_generator_response_body["graph"]
+
+    async def generate_stream(
+        self, graph_code_lines: List[str], chunk_size: int, seed: int | None = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        # the chunks of the graph are returned as soon as they arrive
+        graph_generator_data = get_graph_generator_data(graph_code_lines, seed)
+
+        async with httpx.AsyncClient(
+            base_url=graph_generator_settings.url, timeout=None
+        ) as client:
+            async with client.stream(
+                "POST", "/python/stream", json=graph_generator_data
+            ) as graph_generator_response:
+                if graph_generator_response.status_code == status.HTTP_200_OK:
+                    try:
+                        async for graph_chunk in iterate_graph_chunks(
+                            iterate_lines(graph_generator_response.aiter_bytes()),
+                            chunk_size,
+                        ):
+                            yield graph_chunk
+                    except ValueError as e:
+                        raise GraphGeneratorException(
+                            graph_generator_response.status_code, str(e)
+                        )
+                    return
+
+                # graph generators without the streaming endpoint
+                if graph_generator_response.status_code not in (
+                    status.HTTP_404_NOT_FOUND,
+                    status.HTTP_405_METHOD_NOT_ALLOWED,
+                ):
+                    await graph_generator_response.aread()
+                    raise GraphGeneratorException(
+                        graph_generator_response.status_code,
+                        graph_generator_response.text,
+                    )
+
+        yield await self.generate(graph_code_lines, seed)
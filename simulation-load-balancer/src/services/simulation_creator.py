@@ -1,90 +1,184 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterable, List, TypeVar
 
 import httpx
+import orjson
 from starlette import status
 
 from src.models import InstanceData, InstanceErrorData
+from src.partitioning import get_instance_weights, get_partitioner
 from src.services.base import BaseServiceWithoutRepository
+from src.settings import simulation_load_balancer_settings, spade_instance_settings
 
+T = TypeVar("T")
 
-def split_into_instances(
-    graph: List[Dict[str, Any]], n: int
-) -> List[List[Dict[str, Any]]]:
-    batch_size, rem = divmod(len(graph), n)
-    batches = [
-        graph[i * batch_size + min(i, rem) : (i + 1) * batch_size + min(i + 1, rem)]
-        for i in range(n)
-    ]
-    return batches
+
+async def iterate_simulation_stream(
+    simulation_id: str,
+    agent_code_lines: List[str],
+    agents: List[Dict[str, Any]],
+    chunk_size: int,
+) -> AsyncIterator[bytes]:
+    # NDJSON: the header followed by one agent per line, serialized one chunk at a time
+    yield orjson.dumps(
+        {
+            "simulation_id": simulation_id,
+            "agent_code_lines": agent_code_lines,
+            "num_agents": len(agents),
+        }
+    ) + b"\n"
+    for i in range(0, len(agents), chunk_size):
+        yield b"".join(
+            orjson.dumps(agent) + b"\n" for agent in agents[i : i + chunk_size]
+        )
+
+
+async def gather_with_concurrency(
+    max_concurrency: int, coros: Iterable[Awaitable[T]]
+) -> List[T]:
+    # the results are in the order of the coroutines
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(coro: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+def get_instance_url(key: str) -> str:
+    return f"http://{key}:8000"
 
 
 class SimulationCreatorService(BaseServiceWithoutRepository):
+    """Sends the requests to all instances at once, through the client shared by the application."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def delete_simulation_instance(
+        self, instance: InstanceData
+    ) -> InstanceErrorData | None:
+        try:
+            spade_instance_response = await self.client.delete(
+                f"{get_instance_url(instance['key'])}/simulation",
+                timeout=spade_instance_settings.timeout,
+            )
+            if spade_instance_response.status_code == status.HTTP_200_OK:
+                logging.info(f"Deleted instance {str(instance['key'])}")
+                return None
+            return InstanceErrorData(
+                key=instance["key"],
+                status_code=str(spade_instance_response.status_code),
+                info=f"DeletionError: {instance['key']}",
+            )
+        except Exception:
+            return InstanceErrorData(
+                key=instance["key"],
+                status_code="418",
+                info=f"DeletionError: {instance['key']}",
+            )
+
     async def delete_simulation_instances(
         self, instances: List[InstanceData]
     ) -> List[InstanceErrorData]:
-        error_instances = []
-        for instance in instances:
-            url = f"http://{str(instance['key'])}:8000"
-            try:
-                async with httpx.AsyncClient(base_url=url, timeout=None) as client:
-                    spade_instance_response = await client.delete("/simulation")
-                    if spade_instance_response.status_code == status.HTTP_200_OK:
-                        logging.info(f"Deleted instance {str(instance['key'])}")
-                    else:
-                        error_instances.append(
-                            InstanceErrorData(
-                                key=instance["key"],
-                                status_code=str(spade_instance_response.status_code),
-                                info=f"DeletionError: {instance['key']}",
-                            )
-                        )
-            except Exception:
-                error_instances.append(
-                    InstanceErrorData(
-                        key=instance["key"],
-                        status_code="418",
-                        info=f"DeletionError: {instance['key']}",
-                    )
+        results = await gather_with_concurrency(
+            spade_instance_settings.max_concurrency,
+            (self.delete_simulation_instance(instance) for instance in instances),
+        )
+        return [result for result in results if result is not None]
+
+    async def check_instance_health(
+        self, instance: InstanceErrorData
+    ) -> InstanceErrorData | None:
+        try:
+            spade_instance_response = await self.client.get(
+                f"{get_instance_url(instance.key)}/healthcheck",
+                timeout=spade_instance_settings.timeout,
+            )
+            if spade_instance_response.status_code != status.HTTP_200_OK:
+                return InstanceErrorData(
+                    key=instance.key,
+                    status_code=spade_instance_response.status_code,
+                    info=f"{instance.key}: Unexpected",
                 )
-        return error_instances
+        except httpx.TimeoutException:
+            return InstanceErrorData(
+                key=instance.key,
+                status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                info=f"{instance.key}: Timeout",
+            )
+        except httpx.ConnectError:
+            return InstanceErrorData(
+                key=instance.key,
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                info=f"{instance.key}: Unavailable",
+            )
+        return None
 
     async def check_health(
         self, instances: List[InstanceErrorData]
     ) -> List[InstanceErrorData]:
-        bad_instances = []
-        for instance in instances:
-            url = f"http://{str(instance.key)}:8000"
-            try:
-                async with httpx.AsyncClient(base_url=url, timeout=None) as client:
-                    spade_instance_response = await client.get("/healthcheck")
-                    if spade_instance_response.status_code != status.HTTP_200_OK:
-                        bad_instances.append(
-                            InstanceErrorData(
-                                key=instance.key,
-                                status_code=spade_instance_response.status_code,
-                                info=f"{instance.key}: Unexpected",
-                            )
-                        )
-            except httpx.TimeoutException as e:
-                bad_instances.append(
-                    InstanceErrorData(
-                        key=instance.key,
-                        status_code=status.HTTP_408_REQUEST_TIMEOUT,
-                        info=f"{instance.key}: Timeout",
-                    )
+        results = await gather_with_concurrency(
+            spade_instance_settings.max_concurrency,
+            (self.check_instance_health(instance) for instance in instances),
+        )
+        return [result for result in results if result is not None]
+
+    async def create_instance_simulation(
+        self,
+        agent_code_lines: List[str],
+        agents: List[Dict[str, Any]],
+        instance: InstanceData,
+        simulation_id: str,
+    ) -> InstanceErrorData | None:
+        url = get_instance_url(instance["key"])
+        try:
+            spade_instance_response = await self.client.post(
+                f"{url}/simulation/stream",
+                content=iterate_simulation_stream(
+                    simulation_id,
+                    agent_code_lines,
+                    agents,
+                    simulation_load_balancer_settings.stream_chunk_size,
+                ),
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=spade_instance_settings.create_timeout,
+            )
+            # instances without the streaming endpoint
+            if spade_instance_response.status_code in (
+                status.HTTP_404_NOT_FOUND,
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+            ):
+                spade_instance_response = await self.client.post(
+                    f"{url}/simulation",
+                    json={
+                        "simulation_id": simulation_id,
+                        "agent_code_lines": agent_code_lines,
+                        "agent_data": agents,
+                    },
+                    timeout=spade_instance_settings.create_timeout,
                 )
-            except httpx.ConnectError as e:
-                bad_instances.append(
-                    InstanceErrorData(
-                        key=instance.key,
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                        info=f"{instance.key}: Unavailable",
-                    )
+            spade_instance_response_body = spade_instance_response.json()
+            if spade_instance_response.status_code != status.HTTP_201_CREATED:
+                return InstanceErrorData(
+                    key=instance["key"],
+                    status_code=str(spade_instance_response.status_code),
+                    info=f"{instance['key']}: {str(spade_instance_response_body)}",
                 )
-        return bad_instances
+        except Exception as e:
+            logging.error(
+                f"Failed to create simulation on instance {instance['key']}: {e}"
+            )
+            return InstanceErrorData(
+                key=instance["key"],
+                status_code="418",
+                info=f"Creation Error: {instance['key']}",
+            )
+        return None
 
     async def create(
         self,
@@ -93,41 +187,29 @@ class SimulationCreatorService(BaseServiceWithoutRepository):
         instances: List[InstanceData],
         simulation_id: str,
     ) -> List[InstanceErrorData]:
-        instance_agents = split_into_instances(graph, len(instances))
-
-        error_instances = []
-
-        for instance, agents in zip(instances, instance_agents):
-            simulation_data = {
-                "simulation_id": simulation_id,
-                "agent_code_lines": agent_code_lines,
-                "agent_data": agents,
-            }
-            url = f"http://{str(instance['key'])}:8000"
-            try:
-                print(type(agents))
-                async with httpx.AsyncClient(base_url=url, timeout=None) as client:
-                    spade_instance_response = await client.post(
-                        "/simulation",
-                        json=simulation_data,
-                    )
-                    spade_instance_response_body = spade_instance_response.json()
-                    if spade_instance_response.status_code != status.HTTP_201_CREATED:
-                        error_instances.append(
-                            InstanceErrorData(
-                                key=instance["key"],
-                                status_code=str(spade_instance_response.status_code),
-                                info=f"{instance['key']}: {str(spade_instance_response_body)}",
-                            )
-                        )
-            except Exception as e:
-                print(e)
-                error_instances.append(
-                    InstanceErrorData(
-                        key=instance["key"],
-                        status_code="418",
-                        info=f"Creation Error: {instance['key']}",
-                    )
+        # the connected agents are placed together, so that fewer messages cross instances,
+        # and the instances get the agents in proportion to their reported resources
+        weights = get_instance_weights(instances)
+        logging.info(
+            f"Instance weights: {dict(zip((instance['key'] for instance in instances), weights))}"
+        )
+        # the partitioning of large graphs takes a while, so it runs in a thread
+        # to keep the event loop serving the heartbeats and state updates meanwhile
+        instance_agents = await asyncio.to_thread(
+            get_partitioner(simulation_load_balancer_settings.partitioner),
+            graph,
+            len(instances),
+            simulation_load_balancer_settings.agent_type_costs,
+            simulation_load_balancer_settings.max_partition_imbalance,
+            weights,
+        )
+        results = await gather_with_concurrency(
+            spade_instance_settings.max_concurrency,
+            (
+                self.create_instance_simulation(
+                    agent_code_lines, agents, instance, simulation_id
                 )
-
-        return error_instances
+                for instance, agents in zip(instances, instance_agents)
+            ),
+        )
+        return [result for result in results if result is not None]
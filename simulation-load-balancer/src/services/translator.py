@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import hashlib
+import json
+from collections import OrderedDict
 from typing import List, Tuple
 
 import httpx
@@ -9,19 +12,44 @@ from src.exceptions import TranslatorException
 from src.services.base import BaseServiceWithoutRepository
 from src.settings import translator_settings
 
+# hashes returned by the translator, by the hash of the code they were returned for
+translated_code_hashes: OrderedDict[str, str] = OrderedDict()
+
+
+def get_code_key(aasm_code_lines: List[str]) -> str:
+    return hashlib.sha256(json.dumps(aasm_code_lines).encode("utf-8")).hexdigest()
+
+
+def remember_code_hash(code_key: str, code_hash: str) -> None:
+    translated_code_hashes[code_key] = code_hash
+    translated_code_hashes.move_to_end(code_key)
+    while len(translated_code_hashes) > translator_settings.code_hash_cache_size:
+        translated_code_hashes.popitem(last=False)
+
 
 class TranslatorService(BaseServiceWithoutRepository):
     async def translate(
         self, aasm_code_lines: List[str]
     ) -> Tuple[List[str], List[str]]:
+        code_key = get_code_key(aasm_code_lines)
         translator_data = {"code_lines": aasm_code_lines}
 
         async with httpx.AsyncClient(
             base_url=translator_settings.url, timeout=None
         ) as client:
-            translator_response = await client.post(
-                "/python/spade", json=translator_data
-            )
+            translator_response = None
+            code_hash = translated_code_hashes.get(code_key)
+            if code_hash is not None:
+                translator_response = await client.get(f"/python/spade/{code_hash}")
+                # evicted from the translator cache or translated by another version of the translator
+                if translator_response.status_code == status.HTTP_404_NOT_FOUND:
+                    translated_code_hashes.pop(code_key, None)
+                    translator_response = None
+
+            if translator_response is None:
+                translator_response = await client.post(
+                    "/python/spade", json=translator_data
+                )
 
         translator_response_body = translator_response.json()
 
@@ -30,6 +58,10 @@ class TranslatorService(BaseServiceWithoutRepository):
                 translator_response.status_code, str(translator_response_body)
             )
 
+        # older translators do not cache the translations
+        if translator_response_body.get("code_hash") is not None:
+            remember_code_hash(code_key, translator_response_body["code_hash"])
+
         return (
             translator_response_body["agent_code_lines"],
             translator_response_body["graph_code_lines"],
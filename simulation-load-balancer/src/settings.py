@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
 import logging
 import os
+from typing import Dict
 
 from pydantic import BaseSettings
 
@@ -13,6 +15,8 @@ def configure_logging() -> None:
 class AppSettings(BaseSettings):
     enable_reload: bool = bool(os.environ.get("RELOAD", False))
     port: int = int(os.environ.get("PORT", 8000))
+    # longer than the instance announcement period, so that instances keep their connections
+    keep_alive_timeout: int = int(os.environ.get("KEEP_ALIVE_TIMEOUT", 75))
 
 
 class RedisSettings(BaseSettings):
@@ -23,6 +27,9 @@ class RedisSettings(BaseSettings):
 
 class TranslatorSettings(BaseSettings):
     url: str = os.environ.get("TRANSLATOR_URL", "")
+    code_hash_cache_size: int = int(
+        os.environ.get("TRANSLATOR_CODE_HASH_CACHE_SIZE", 1024)
+    )
 
 
 class GraphGeneratorSettings(BaseSettings):
@@ -31,6 +38,29 @@ class GraphGeneratorSettings(BaseSettings):
 
 class SimulationLoadBalancerSettings(BaseSettings):
     max_per_instance: str = os.environ.get("MAX_AGENTS_PER_INSTANCE", "50")
+    stream_chunk_size: int = int(os.environ.get("SIMULATION_STREAM_CHUNK_SIZE", 1000))
+    partitioner: str = os.environ.get("AGENT_PARTITIONER", "greedy")
+    agent_type_costs: Dict[str, float] = json.loads(
+        os.environ.get("AGENT_TYPE_COSTS", "{}")
+    )
+    max_partition_imbalance: float = float(
+        os.environ.get("AGENT_PARTITION_MAX_IMBALANCE", 0.05)
+    )
+    # 0 to run every simulation on all idle instances
+    max_instances: int = int(os.environ.get("SIMULATION_MAX_INSTANCES", 0))
+    # renewed before every attempt to create the simulation, so it should outlast one
+    instance_lease_seconds: int = int(
+        os.environ.get(
+            "INSTANCE_LEASE_SECONDS",
+            int(float(os.environ.get("SPADE_INSTANCE_CREATE_TIMEOUT", 600))) + 60,
+        )
+    )
+
+
+class SpadeInstanceSettings(BaseSettings):
+    max_concurrency: int = int(os.environ.get("SPADE_INSTANCE_MAX_CONCURRENCY", 16))
+    timeout: float = float(os.environ.get("SPADE_INSTANCE_TIMEOUT", 30))
+    create_timeout: float = float(os.environ.get("SPADE_INSTANCE_CREATE_TIMEOUT", 600))
 
 
 class DataProcessorSettings(BaseSettings):
@@ -42,4 +72,5 @@ redis_settings = RedisSettings()
 translator_settings = TranslatorSettings()
 graph_generator_settings = GraphGeneratorSettings()
 simulation_load_balancer_settings = SimulationLoadBalancerSettings()
+spade_instance_settings = SpadeInstanceSettings()
 data_processor_settings = DataProcessorSettings()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """Durations of the stages of a simulation creation, in seconds.
+
+    The stages are measured on their own, so that the overlapping ones can be told apart from the total.
+    """
+
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.started_at: Dict[str, float] = {}
+        self.durations: Dict[str, float] = {}
+
+    def start(self, stage: str) -> None:
+        self.started_at[stage] = time.perf_counter()
+
+    def stop(self, stage: str) -> None:
+        self.durations[stage] = time.perf_counter() - self.started_at.pop(stage)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        self.start(stage)
+        try:
+            yield
+        finally:
+            self.stop(stage)
+
+    async def measure_coroutine(self, stage: str, coro: Awaitable[T]) -> T:
+        with self.measure(stage):
+            return await coro
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.durations, "total": time.perf_counter() - self.created_at}
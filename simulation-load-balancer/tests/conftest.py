@@ -8,7 +8,7 @@ from httpx import AsyncClient
 
 from src.app import get_app
 from src.services.graph_generator import GraphGeneratorService
-from src.services.translator import TranslatorService
+from src.services.translator import TranslatorService, translated_code_hashes
 from src.settings import app_settings, graph_generator_settings, translator_settings
 
 if TYPE_CHECKING:
@@ -47,3 +47,4 @@ def graph_generator_service() -> GraphGeneratorService:
 @pytest.fixture
 def translator_service() -> TranslatorService:
     yield TranslatorService()
+    translated_code_hashes.clear()
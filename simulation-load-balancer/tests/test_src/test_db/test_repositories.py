@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import json
+from typing import Any, List, Tuple
+from unittest.mock import AsyncMock, MagicMock, Mock, call
+
+import pytest
+
+from src.db.migration import migrate_legacy_state
+from src.db.repositories.base import decode_hash, encode_hash
+from src.db.repositories.instances import InstanceRepository
+from src.db.repositories.simulations import SimulationRepository
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_redis_mock(results: List[Any] | None = None) -> Tuple[Mock, Mock]:
+    pipe = Mock()
+    pipe.execute = AsyncMock(return_value=results or [])
+    pipeline = MagicMock()
+    pipeline.__aenter__.return_value = pipe
+    redis = Mock()
+    redis.pipeline.return_value = pipeline
+    redis.hget = AsyncMock(return_value=None)
+    redis.exists = AsyncMock(return_value=0)
+    redis.set = AsyncMock()
+    redis.register_script.side_effect = lambda script: AsyncMock()
+    return redis, pipe
+
+
+def test_encode_hash_keeps_value_types_after_decoding() -> None:
+    data = {"num_agents": 2, "broken_agents": ["a"], "simulation_id": None}
+
+    encoded = encode_hash(data)
+
+    assert (
+        decode_hash(
+            {field.encode(): value.encode() for field, value in encoded.items()}
+        )
+        == data
+    )
+
+
+async def test_get_returns_none_for_missing_entity() -> None:
+    redis, _ = create_redis_mock()
+    redis.hgetall = AsyncMock(return_value={})
+
+    assert await InstanceRepository(redis).get("instance_1") is None
+    redis.hgetall.assert_awaited_once_with("instance:instance_1")
+
+
+async def test_get_idle_reads_idle_instances_in_one_pipeline() -> None:
+    redis, pipe = create_redis_mock(
+        results=[{b"status": b'"IDLE"'}, {}],
+    )
+    redis.smembers = AsyncMock(return_value={b"instance_2", b"instance_1"})
+
+    instances = await InstanceRepository(redis).get_idle()
+
+    redis.smembers.assert_awaited_once_with("instances:idle")
+    redis.pipeline.assert_called_once_with(transaction=False)
+    assert pipe.hgetall.call_args_list == [
+        call("instance:instance_1"),
+        call("instance:instance_2"),
+    ]
+    assert instances == [{"status": "IDLE", "key": "instance_1"}]
+
+
+async def test_get_many_does_not_query_redis_without_ids() -> None:
+    redis, _ = create_redis_mock()
+
+    assert await SimulationRepository(redis).get_many([]) == []
+    redis.pipeline.assert_not_called()
+
+
+async def test_save_instance_moves_it_to_simulation_instances() -> None:
+    redis, pipe = create_redis_mock()
+    redis.hget = AsyncMock(return_value=b'"old_simulation"')
+    repository = InstanceRepository(redis)
+
+    await repository.save(
+        "instance_1",
+        {"key": "instance_1", "status": "RUNNING", "simulation_id": "simulation"},
+    )
+
+    redis.pipeline.assert_called_once_with(transaction=True)
+    pipe.hset.assert_called_once_with(
+        "instance:instance_1",
+        mapping={"status": '"RUNNING"', "simulation_id": '"simulation"'},
+    )
+    pipe.sadd.assert_has_calls(
+        [
+            call("instances", "instance_1"),
+            call("simulation:simulation:instances", "instance_1"),
+        ]
+    )
+    pipe.srem.assert_called_once_with(
+        "simulation:old_simulation:instances", "instance_1"
+    )
+    repository.index_idle_script.assert_awaited_once_with(
+        keys=["instances:idle", "instance:instance_1:lease"],
+        args=["instance_1", 0],
+        client=pipe,
+    )
+    pipe.execute.assert_awaited_once()
+
+
+async def test_save_idle_instance_adds_it_to_idle_instances_unless_reserved() -> None:
+    redis, pipe = create_redis_mock()
+    repository = InstanceRepository(redis)
+
+    await repository.save("instance_1", {"status": "IDLE", "simulation_id": None})
+
+    pipe.sadd.assert_called_once_with("instances", "instance_1")
+    pipe.srem.assert_not_called()
+    repository.index_idle_script.assert_awaited_once_with(
+        keys=["instances:idle", "instance:instance_1:lease"],
+        args=["instance_1", 1],
+        client=pipe,
+    )
+
+
+async def test_delete_instance_removes_it_from_indexes() -> None:
+    redis, pipe = create_redis_mock()
+    redis.hget = AsyncMock(return_value=b'"simulation"')
+
+    await InstanceRepository(redis).delete("instance_1")
+
+    pipe.delete.assert_called_once_with(
+        "instance:instance_1", "instance:instance_1:lease"
+    )
+    pipe.srem.assert_has_calls(
+        [
+            call("instances", "instance_1"),
+            call("instances:idle", "instance_1"),
+            call("simulation:simulation:instances", "instance_1"),
+        ]
+    )
+
+
+async def test_migrate_legacy_state_moves_string_keys_to_repositories() -> None:
+    redis, pipe = create_redis_mock()
+    legacy_state = {
+        b"instance_1": {"status": "IDLE", "simulation_id": None},
+        b"simulation": {
+            "simulation": True,
+            "key": "simulation",
+            "status": "ACTIVE",
+            "available_instances": [],
+            "agent_code_lines": [],
+        },
+    }
+
+    async def scan_iter(_type: str):
+        for key in legacy_state:
+            yield key
+
+    redis.scan_iter = scan_iter
+    redis.get = AsyncMock(side_effect=lambda key: json.dumps(legacy_state[key]))
+    redis.delete = AsyncMock()
+
+    num_migrated = await migrate_legacy_state(redis)
+
+    assert num_migrated == 2
+    redis.set.assert_awaited_once_with("migration:legacy_state", 2)
+    pipe.sadd.assert_has_calls(
+        [call("instances", "instance_1"), call("simulations", "simulation")]
+    )
+    redis.delete.assert_has_awaits([call(b"instance_1"), call(b"simulation")])
+
+
+async def test_migrate_legacy_state_leaves_other_string_keys_untouched() -> None:
+    redis, pipe = create_redis_mock()
+    string_keys = {
+        b"session": "not json",
+        b"counter": "3",
+        b"settings": json.dumps({"theme": "dark"}),
+        b"instance:instance_1:lease": "simulation",
+    }
+
+    async def scan_iter(_type: str):
+        for key in string_keys:
+            yield key
+
+    redis.scan_iter = scan_iter
+    redis.get = AsyncMock(side_effect=lambda key: string_keys[key])
+    redis.delete = AsyncMock()
+
+    num_migrated = await migrate_legacy_state(redis)
+
+    assert num_migrated == 0
+    pipe.hset.assert_not_called()
+    redis.delete.assert_not_awaited()
+
+
+async def test_migrate_legacy_state_skips_leases_of_reserved_instances() -> None:
+    redis, pipe = create_redis_mock()
+    string_keys = {b"instance:instance_1:lease": json.dumps({"status": "IDLE"})}
+
+    async def scan_iter(_type: str):
+        for key in string_keys:
+            yield key
+
+    redis.scan_iter = scan_iter
+    redis.get = AsyncMock(side_effect=lambda key: string_keys[key])
+    redis.delete = AsyncMock()
+
+    num_migrated = await migrate_legacy_state(redis)
+
+    assert num_migrated == 0
+    redis.get.assert_not_awaited()
+    redis.delete.assert_not_awaited()
+
+
+async def test_migrate_legacy_state_skips_cached_translations() -> None:
+    redis, _ = create_redis_mock()
+    translation = {"status": "ACTIVE", "key": "agent", "simulation": True}
+    string_keys = {b"translation:0.1.0:abc": json.dumps(translation)}
+
+    async def scan_iter(_type: str):
+        for key in string_keys:
+            yield key
+
+    redis.scan_iter = scan_iter
+    redis.get = AsyncMock(side_effect=lambda key: string_keys[key])
+    redis.delete = AsyncMock()
+
+    num_migrated = await migrate_legacy_state(redis)
+
+    assert num_migrated == 0
+    redis.get.assert_not_awaited()
+    redis.delete.assert_not_awaited()
+
+
+async def test_migrate_legacy_state_runs_only_once() -> None:
+    redis, _ = create_redis_mock()
+    redis.exists = AsyncMock(return_value=1)
+    redis.scan_iter = Mock()
+
+    num_migrated = await migrate_legacy_state(redis)
+
+    assert num_migrated == 0
+    redis.exists.assert_awaited_once_with("migration:legacy_state")
+    redis.scan_iter.assert_not_called()
+    redis.set.assert_not_awaited()
+
+
+async def test_reserve_returns_instances_claimed_by_script() -> None:
+    redis, pipe = create_redis_mock(results=[{b"status": b'"IDLE"'}])
+    repository = InstanceRepository(redis)
+    repository.reserve_script.return_value = [b"instance_1"]
+
+    instances = await repository.reserve("simulation", 2, 60)
+
+    repository.reserve_script.assert_awaited_once_with(
+        keys=["instances:idle"], args=["simulation", 60, 2]
+    )
+    pipe.hgetall.assert_called_once_with("instance:instance_1")
+    assert instances == [{"status": "IDLE", "key": "instance_1"}]
+
+
+async def test_release_passes_whether_instances_are_idle_again() -> None:
+    redis, _ = create_redis_mock()
+    repository = InstanceRepository(redis)
+
+    await repository.release("simulation", ["instance_1", "instance_2"], True)
+    await repository.release("simulation", [], True)
+
+    repository.release_script.assert_awaited_once_with(
+        keys=["instances:idle"], args=["simulation", 1, "instance_1", "instance_2"]
+    )
+
+
+async def test_renew_extends_leases_of_reserved_instances() -> None:
+    redis, _ = create_redis_mock()
+    repository = InstanceRepository(redis)
+
+    await repository.renew("simulation", ["instance_1"], 60)
+
+    repository.renew_script.assert_awaited_once_with(
+        keys=["instances:idle"], args=["simulation", 60, "instance_1"]
+    )
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import pytest
+
+from src.partitioning import (
+    get_edge_cut_ratio,
+    get_instance_weights,
+    get_load_imbalance,
+    get_partitioner,
+    partition_greedy,
+    split_into_instances,
+)
+
+
+def create_clique(prefix: str, size: int, agent_type: str = "a"):
+    jids = [f"{prefix}{i}" for i in range(size)]
+    return [
+        {
+            "type": agent_type,
+            "jid": jid,
+            "connections": [other for other in jids if other != jid],
+        }
+        for jid in jids
+    ]
+
+
+def create_interleaved_cliques(num_cliques: int, size: int):
+    cliques = [create_clique(f"c{i}_", size) for i in range(num_cliques)]
+    return [clique[i] for i in range(size) for clique in cliques]
+
+
+def test_split_into_instances_returns_contiguous_batches_of_equal_size() -> None:
+    graph = [{"type": "a", "jid": str(i)} for i in range(5)]
+
+    batches = split_into_instances(graph, 2)
+
+    assert batches == [graph[:3], graph[3:]]
+
+
+def test_partition_greedy_keeps_connected_agents_together() -> None:
+    graph = create_interleaved_cliques(4, 5)
+
+    partitions = partition_greedy(graph, 4)
+
+    assert sorted(len(agents) for agents in partitions) == [5, 5, 5, 5]
+    assert get_edge_cut_ratio(partitions) == 0.0
+    assert get_edge_cut_ratio(split_into_instances(graph, 4)) > 0.5
+
+
+def test_partition_greedy_places_every_agent_once() -> None:
+    graph = create_interleaved_cliques(3, 4) + [{"type": "a", "jid": "lonely"}]
+
+    partitions = partition_greedy(graph, 2)
+
+    assert sorted(agent["jid"] for agents in partitions for agent in agents) == sorted(
+        agent["jid"] for agent in graph
+    )
+
+
+def test_partition_greedy_balances_agent_type_costs() -> None:
+    graph = create_clique("heavy", 4, "heavy") + create_clique("light", 12, "light")
+    agent_type_costs = {"heavy": 3.0, "light": 1.0}
+
+    partitions = partition_greedy(graph, 2, agent_type_costs, 0.1)
+
+    assert get_load_imbalance(partitions, agent_type_costs) <= 0.1
+
+
+def test_split_into_instances_returns_batches_proportional_to_weights() -> None:
+    graph = [{"type": "a", "jid": str(i)} for i in range(10)]
+
+    batches = split_into_instances(graph, 3, weights=[0.2, 0.5, 0.3])
+
+    assert batches == [graph[:2], graph[2:7], graph[7:]]
+
+
+def test_partition_greedy_places_agents_in_proportion_to_weights() -> None:
+    graph = create_interleaved_cliques(8, 5)
+    weights = [0.25, 0.75]
+
+    partitions = partition_greedy(graph, 2, max_imbalance=0.0, weights=weights)
+
+    assert [len(agents) for agents in partitions] == [10, 30]
+    assert get_edge_cut_ratio(partitions) == 0.0
+    assert get_load_imbalance(partitions, {}, weights) == pytest.approx(0.0)
+
+
+def test_get_instance_weights_without_reported_resources_are_equal() -> None:
+    instances = [{"key": "a"}, {"key": "b"}]
+
+    assert get_instance_weights(instances) == [0.5, 0.5]
+
+
+def test_get_instance_weights_are_limited_by_available_memory() -> None:
+    instances = [
+        {"cpu_count": 4, "available_memory_MiB": 1000},
+        {"cpu_count": 4, "available_memory_MiB": 3000},
+    ]
+
+    weights = get_instance_weights(instances)
+
+    assert weights[0] == pytest.approx(1 / 3)
+    assert weights[1] == pytest.approx(2 / 3)
+
+
+def test_get_instance_weights_prefer_measured_agents_per_second() -> None:
+    instances = [
+        {"cpu_count": 1, "agents_per_second": 300.0},
+        {"cpu_count": 3, "agents_per_second": 100.0},
+    ]
+
+    assert get_instance_weights(instances) == pytest.approx([0.75, 0.25])
+
+    instances[0]["agents_per_second"] = None
+
+    assert get_instance_weights(instances) == pytest.approx([0.25, 0.75])
+
+
+def test_get_edge_cut_ratio_returns_share_of_connections_between_instances() -> None:
+    partitions = [
+        [{"type": "a", "jid": "0", "connections": ["1", "2"]}],
+        [{"type": "a", "jid": "1", "connections": ["2"]}, {"type": "a", "jid": "2"}],
+    ]
+
+    assert get_edge_cut_ratio(partitions) == pytest.approx(2 / 3)
+
+
+def test_get_load_imbalance_returns_excess_of_most_loaded_instance() -> None:
+    partitions = [[{"type": "a"}, {"type": "b"}], [{"type": "a"}]]
+
+    assert get_load_imbalance(partitions, {"b": 2.0}) == pytest.approx(0.5)
+
+
+def test_get_partitioner_raises_for_unknown_name() -> None:
+    assert get_partitioner("contiguous") is split_into_instances
+
+    with pytest.raises(ValueError):
+        get_partitioner("unknown")
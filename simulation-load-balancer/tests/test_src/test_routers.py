@@ -1,13 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TYPE_CHECKING
-from unittest.mock import Mock
+from typing import TYPE_CHECKING, Any, AsyncIterator, List
+from unittest.mock import AsyncMock, Mock
 
+import httpx
 import pytest
 from starlette import status
 
-from src.dependencies import graph_generator_service, translator_service
+from src.dependencies import (
+    data_processor_service,
+    graph_generator_service,
+    instance_repository,
+    simulation_creator_service,
+    simulation_repository,
+    translator_service,
+)
 from src.exceptions import GraphGeneratorException, TranslatorException
 
 if TYPE_CHECKING:
@@ -17,6 +25,11 @@ if TYPE_CHECKING:
 pytestmark = pytest.mark.asyncio
 
 
+async def iterate(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
 async def test_after_creating_simulaton_response_has_simulation_id(
     app: FastAPI, client: AsyncClient
 ) -> None:
@@ -27,9 +40,7 @@ async def test_after_creating_simulaton_response_has_simulation_id(
     app.dependency_overrides[translator_service] = lambda: translator_service_mock
 
     graph_generator_service_mock = Mock()
-    generate_future = asyncio.Future()
-    generate_future.set_result([])
-    graph_generator_service_mock.generate.return_value = generate_future
+    graph_generator_service_mock.generate_stream.return_value = iterate([[]])
     app.dependency_overrides[
         graph_generator_service
     ] = lambda: graph_generator_service_mock
@@ -51,9 +62,7 @@ async def test_after_creating_simulaton_response_has_201_status_code(
     app.dependency_overrides[translator_service] = lambda: translator_service_mock
 
     graph_generator_service_mock = Mock()
-    generate_future = asyncio.Future()
-    generate_future.set_result([])
-    graph_generator_service_mock.generate.return_value = generate_future
+    graph_generator_service_mock.generate_stream.return_value = iterate([[]])
     app.dependency_overrides[
         graph_generator_service
     ] = lambda: graph_generator_service_mock
@@ -107,9 +116,9 @@ async def test_after_simulation_was_not_created_due_to_graph_generator_error_res
     app.dependency_overrides[translator_service] = lambda: translator_service_mock
 
     graph_generator_service_mock = Mock()
-    generate_future = asyncio.Future()
-    generate_future.set_exception(GraphGeneratorException(0, ""))
-    graph_generator_service_mock.generate.side_effect = generate_future
+    graph_generator_service_mock.generate_stream.side_effect = GraphGeneratorException(
+        0, ""
+    )
     app.dependency_overrides[
         graph_generator_service
     ] = lambda: graph_generator_service_mock
@@ -131,9 +140,9 @@ async def test_after_simulation_was_not_created_due_to_graph_generator_error_res
     app.dependency_overrides[translator_service] = lambda: translator_service_mock
 
     graph_generator_service_mock = Mock()
-    generate_future = asyncio.Future()
-    generate_future.set_exception(GraphGeneratorException(0, ""))
-    graph_generator_service_mock.generate.side_effect = generate_future
+    graph_generator_service_mock.generate_stream.side_effect = GraphGeneratorException(
+        0, ""
+    )
     app.dependency_overrides[
         graph_generator_service
     ] = lambda: graph_generator_service_mock
@@ -143,3 +152,53 @@ async def test_after_simulation_was_not_created_due_to_graph_generator_error_res
     response = await client.post("/simulations", json=code)
 
     assert "detail" in response.json()
+
+
+async def test_after_backup_fails_simulation_is_deleted_from_instances_and_not_saved(
+    app: FastAPI, client: AsyncClient
+) -> None:
+    translator_service_mock = Mock()
+    translator_service_mock.translate = AsyncMock(return_value=([], []))
+    app.dependency_overrides[translator_service] = lambda: translator_service_mock
+
+    graph_generator_service_mock = Mock()
+    graph_generator_service_mock.generate_stream.return_value = iterate([[]])
+    app.dependency_overrides[
+        graph_generator_service
+    ] = lambda: graph_generator_service_mock
+
+    data_processor_service_mock = Mock()
+    data_processor_service_mock.save_state_stream = AsyncMock(
+        side_effect=httpx.ConnectError("Connection refused")
+    )
+    app.dependency_overrides[
+        data_processor_service
+    ] = lambda: data_processor_service_mock
+
+    instances = [{"key": "instance_1"}]
+    instance_repository_mock = Mock()
+    instance_repository_mock.reserve = AsyncMock(return_value=instances)
+    instance_repository_mock.renew = AsyncMock()
+    instance_repository_mock.release = AsyncMock()
+    app.dependency_overrides[instance_repository] = lambda: instance_repository_mock
+
+    simulation_creator_service_mock = Mock()
+    simulation_creator_service_mock.create = AsyncMock(return_value=[])
+    simulation_creator_service_mock.delete_simulation_instances = AsyncMock()
+    app.dependency_overrides[
+        simulation_creator_service
+    ] = lambda: simulation_creator_service_mock
+
+    simulation_repository_mock = Mock()
+    simulation_repository_mock.save = AsyncMock()
+    app.dependency_overrides[simulation_repository] = lambda: simulation_repository_mock
+
+    code = {"aasm_code_lines": []}
+
+    response = await client.post("/simulations", json=code)
+
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    simulation_creator_service_mock.delete_simulation_instances.assert_awaited_once_with(
+        instances
+    )
+    simulation_repository_mock.save.assert_not_awaited()
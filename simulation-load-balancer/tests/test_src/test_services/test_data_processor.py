@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, AsyncIterator, List
+
+import httpx
+import orjson
+import pytest
+
+from src.exceptions import DataProcessorException
+from src.services.data_processor import DataProcessorService, iterate_json_array
+from src.settings import data_processor_settings
+
+if TYPE_CHECKING:
+    from pytest_httpx import HTTPXMock
+
+pytestmark = pytest.mark.asyncio
+
+data_processor_settings.url = "http://fake-data-processor"
+
+
+async def iterate(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+async def test_iterate_json_array_joins_chunks_into_one_array() -> None:
+    chunks = [[{"jid": "0"}, {"jid": "1"}], [], [{"jid": "2"}]]
+
+    body = b"".join([part async for part in iterate_json_array(iterate(chunks))])
+
+    assert orjson.loads(body) == [{"jid": "0"}, {"jid": "1"}, {"jid": "2"}]
+    assert orjson.loads(
+        b"".join([part async for part in iterate_json_array(iterate([]))])
+    ) == ([])
+
+
+async def test_save_state_stream_sends_graph_chunks_as_backup(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(
+        url=f"{data_processor_settings.url}/simulations/sim/backup",
+        method="POST",
+        status_code=200,
+    )
+
+    await DataProcessorService().save_state_stream(
+        "sim", iterate([[{"jid": "0"}], [{"jid": "1"}]])
+    )
+
+    request = httpx_mock.get_request()
+    assert orjson.loads(await request.aread()) == [{"jid": "0"}, {"jid": "1"}]
+
+
+async def test_after_data_processor_does_not_return_status_200_save_state_stream_raises_data_processor_exception(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(
+        url=f"{data_processor_settings.url}/simulations/sim/backup",
+        method="POST",
+        status_code=400,
+    )
+
+    with pytest.raises(DataProcessorException):
+        await DataProcessorService().save_state_stream("sim", iterate([]))
+
+
+async def test_after_data_processor_is_unreachable_save_state_stream_raises_data_processor_exception(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_exception(httpx.ConnectError("Connection refused"))
+
+    with pytest.raises(DataProcessorException):
+        await DataProcessorService().save_state_stream("sim", iterate([]))
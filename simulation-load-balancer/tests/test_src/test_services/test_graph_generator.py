@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import orjson
 import pytest
 
 from src.exceptions import GraphGeneratorException
@@ -46,3 +47,76 @@ async def test_after_graph_generator_does_not_return_status_200_generate_raises_
 
     with pytest.raises(GraphGeneratorException):
         await graph_generator_service.generate(code)
+
+
+async def test_generate_stream_returns_graph_chunks(
+    graph_generator_service: GraphGeneratorService, httpx_mock: HTTPXMock
+) -> None:
+    graph = [{"type": "a", "jid": str(i)} for i in range(3)]
+    httpx_mock.add_response(
+        url=f"{graph_generator_settings.url}/python/stream",
+        method="POST",
+        status_code=200,
+        content=b"".join(orjson.dumps(agent) + b"\n" for agent in graph),
+    )
+
+    chunks = [chunk async for chunk in graph_generator_service.generate_stream([], 2)]
+
+    assert chunks == [graph[:2], graph[2:]]
+
+
+async def test_generate_stream_returns_whole_graph_without_streaming_endpoint(
+    graph_generator_service: GraphGeneratorService, httpx_mock: HTTPXMock
+) -> None:
+    graph = [{"type": "a", "jid": "0"}]
+    httpx_mock.add_response(
+        url=f"{graph_generator_settings.url}/python/stream",
+        method="POST",
+        status_code=404,
+    )
+    httpx_mock.add_response(
+        url=f"{graph_generator_settings.url}/python",
+        method="POST",
+        status_code=200,
+        json={"graph": graph},
+    )
+
+    chunks = [chunk async for chunk in graph_generator_service.generate_stream([], 2)]
+
+    assert chunks == [graph]
+
+
+async def test_after_graph_generator_does_not_return_status_200_generate_stream_raises_graph_generator_exception(
+    graph_generator_service: GraphGeneratorService, httpx_mock: HTTPXMock
+) -> None:
+    httpx_mock.add_response(
+        url=f"{graph_generator_settings.url}/python/stream",
+        method="POST",
+        status_code=500,
+        json={},
+    )
+
+    with pytest.raises(GraphGeneratorException):
+        async for _ in graph_generator_service.generate_stream([], 2):
+            pass
+
+
+async def test_after_providing_seed_generate_stream_sends_it_to_graph_generator(
+    graph_generator_service: GraphGeneratorService, httpx_mock: HTTPXMock
+) -> None:
+    httpx_mock.add_response(
+        url=f"{graph_generator_settings.url}/python/stream",
+        method="POST",
+        status_code=200,
+        content=b"",
+    )
+
+    chunks = [
+        chunk async for chunk in graph_generator_service.generate_stream([], 2, 7)
+    ]
+
+    assert chunks == []
+    assert orjson.loads(httpx_mock.get_request().content) == {
+        "graph_code_lines": [],
+        "seed": 7,
+    }
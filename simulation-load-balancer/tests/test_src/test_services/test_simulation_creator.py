@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING
+
+import httpx
+import orjson
+import pytest
+
+from src.models import InstanceErrorData
+from src.services.simulation_creator import (
+    SimulationCreatorService,
+    gather_with_concurrency,
+    iterate_simulation_stream,
+)
+
+if TYPE_CHECKING:
+    from pytest_httpx import HTTPXMock
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_iterate_simulation_stream_returns_header_and_agent_chunks() -> None:
+    agents = [{"type": "a", "jid": str(i)} for i in range(3)]
+
+    chunks = [
+        chunk async for chunk in iterate_simulation_stream("sim", ["code"], agents, 2)
+    ]
+
+    assert orjson.loads(chunks[0]) == {
+        "simulation_id": "sim",
+        "agent_code_lines": ["code"],
+        "num_agents": 3,
+    }
+    assert [orjson.loads(line) for line in b"".join(chunks[1:]).splitlines()] == agents
+    assert len(chunks) == 3
+
+
+async def test_create_streams_agents_to_instance(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(
+        url="http://instance:8000/simulation/stream",
+        method="POST",
+        status_code=201,
+        content=b"null",
+    )
+    agents = [{"type": "a", "jid": "1"}]
+
+    error_instances = await SimulationCreatorService(httpx.AsyncClient()).create(
+        ["code"], agents, [{"key": "instance"}], "sim"
+    )
+
+    assert error_instances == []
+    lines = (await httpx_mock.get_requests()[0].aread()).splitlines()
+    assert orjson.loads(lines[1]) == agents[0]
+
+
+async def test_create_sends_whole_simulation_to_instance_without_streaming_endpoint(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(
+        url="http://instance:8000/simulation/stream",
+        method="POST",
+        status_code=404,
+        json={"detail": "Not Found"},
+    )
+    httpx_mock.add_response(
+        url="http://instance:8000/simulation",
+        method="POST",
+        status_code=201,
+        content=b"null",
+    )
+    agents = [{"type": "a", "jid": "1"}]
+
+    error_instances = await SimulationCreatorService(httpx.AsyncClient()).create(
+        ["code"], agents, [{"key": "instance"}], "sim"
+    )
+
+    assert error_instances == []
+    assert orjson.loads(httpx_mock.get_requests()[1].read())["agent_data"] == agents
+
+
+async def test_create_partitions_graph_outside_event_loop_thread(
+    httpx_mock: HTTPXMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    httpx_mock.add_response(
+        url="http://instance:8000/simulation/stream",
+        method="POST",
+        status_code=201,
+        content=b"null",
+    )
+    partitioner_threads = []
+
+    def partitioner(graph, *args):
+        partitioner_threads.append(threading.get_ident())
+        return [graph]
+
+    monkeypatch.setattr(
+        "src.services.simulation_creator.get_partitioner", lambda name: partitioner
+    )
+
+    await SimulationCreatorService(httpx.AsyncClient()).create(
+        ["code"], [{"type": "a", "jid": "1"}], [{"key": "instance"}], "sim"
+    )
+
+    assert partitioner_threads
+    assert threading.get_ident() not in partitioner_threads
+
+
+async def test_gather_with_concurrency_limits_concurrent_coroutines_and_keeps_order() -> None:
+    running = 0
+    max_running = 0
+
+    async def run(i: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01 * (5 - i))
+        running -= 1
+        return i
+
+    results = await gather_with_concurrency(2, (run(i) for i in range(5)))
+
+    assert results == [0, 1, 2, 3, 4]
+    assert max_running == 2
+
+
+async def test_create_returns_errors_of_failed_instances_only(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(
+        url="http://instance-1:8000/simulation/stream",
+        method="POST",
+        status_code=201,
+        content=b"null",
+    )
+    httpx_mock.add_response(
+        url="http://instance-2:8000/simulation/stream",
+        method="POST",
+        status_code=400,
+        json={"detail": "Simulation is already running."},
+    )
+    agents = [{"type": "a", "jid": str(i)} for i in range(2)]
+
+    error_instances = await SimulationCreatorService(httpx.AsyncClient()).create(
+        ["code"], agents, [{"key": "instance-1"}, {"key": "instance-2"}], "sim"
+    )
+
+    assert [error.key for error in error_instances] == ["instance-2"]
+    assert error_instances[0].status_code == "400"
+
+
+async def test_check_health_returns_unavailable_instances(
+    httpx_mock: HTTPXMock,
+) -> None:
+    httpx_mock.add_response(
+        url="http://instance-1:8000/healthcheck", method="GET", json={}
+    )
+    httpx_mock.add_exception(
+        httpx.ConnectError(""), url="http://instance-2:8000/healthcheck"
+    )
+    instances = [
+        InstanceErrorData(key=key, status_code="418", info="")
+        for key in ("instance-1", "instance-2")
+    ]
+
+    bad_instances = await SimulationCreatorService(httpx.AsyncClient()).check_health(
+        instances
+    )
+
+    assert [(error.key, error.status_code) for error in bad_instances] == [
+        ("instance-2", "503")
+    ]
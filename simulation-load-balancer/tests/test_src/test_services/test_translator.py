@@ -46,3 +46,70 @@ async def test_after_translator_does_not_return_status_200_translate_raises_tran
 
     with pytest.raises(TranslatorException):
         await translator_service.translate(aasm_code_lines)
+
+
+async def test_after_translating_same_code_twice_translate_sends_only_code_hash(
+    translator_service: TranslatorService, httpx_mock: HTTPXMock
+) -> None:
+    translation = {
+        "agent_code_lines": ["class test"],
+        "graph_code_lines": [],
+        "code_hash": "hash",
+    }
+    httpx_mock.add_response(
+        url=f"{translator_settings.url}/python/spade",
+        method="POST",
+        status_code=200,
+        json=translation,
+    )
+    httpx_mock.add_response(
+        url=f"{translator_settings.url}/python/spade/hash",
+        method="GET",
+        status_code=200,
+        json=translation,
+    )
+
+    aasm_code_lines = ["agent test", "eagent"]
+
+    await translator_service.translate(aasm_code_lines)
+    result = await translator_service.translate(aasm_code_lines)
+
+    assert result == (["class test"], [])
+    assert [request.method for request in httpx_mock.get_requests()] == [
+        "POST",
+        "GET",
+    ]
+
+
+async def test_after_translator_does_not_hold_code_hash_translate_sends_code_again(
+    translator_service: TranslatorService, httpx_mock: HTTPXMock
+) -> None:
+    translation = {
+        "agent_code_lines": ["class test"],
+        "graph_code_lines": [],
+        "code_hash": "hash",
+    }
+    httpx_mock.add_response(
+        url=f"{translator_settings.url}/python/spade",
+        method="POST",
+        status_code=200,
+        json=translation,
+    )
+    httpx_mock.add_response(
+        url=f"{translator_settings.url}/python/spade/hash",
+        method="GET",
+        status_code=404,
+        json={"detail": "translation not cached"},
+    )
+
+    aasm_code_lines = ["agent test", "eagent"]
+
+    await translator_service.translate(aasm_code_lines)
+    result = await translator_service.translate(aasm_code_lines)
+
+    assert result == (["class test"], [])
+    assert [request.method for request in httpx_mock.get_requests()] == [
+        "POST",
+        "GET",
+        "POST",
+    ]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.timings import StageTimings
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_stage_timings_measure_overlapping_stages() -> None:
+    timings = StageTimings()
+
+    with timings.measure("first"):
+        await asyncio.gather(
+            timings.measure_coroutine("second", asyncio.sleep(0.02)),
+            asyncio.sleep(0.01),
+        )
+
+    durations = timings.as_dict()
+    assert durations["second"] >= 0.02
+    assert durations["first"] >= durations["second"]
+    assert durations["total"] >= durations["first"]
+
+
+async def test_stage_timings_measure_failed_stages() -> None:
+    timings = StageTimings()
+
+    with pytest.raises(ValueError):
+        with timings.measure("stage"):
+            raise ValueError()
+
+    assert "stage" in timings.as_dict()
@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from fastapi import FastAPI
 
+from src.http_client import (
+    create_shutdown_http_client_handler,
+    create_startup_http_client_handler,
+)
 from src.kafka import (
     create_shutdown_kafka_connection_handler,
     create_startup_kafka_connection_handler,
@@ -25,6 +29,7 @@ def get_app(unit_tests: bool = False) -> FastAPI:
     app.include_router(router)
 
     if not unit_tests:  # pragma: no cover
+        app.add_event_handler("startup", create_startup_http_client_handler(app))
         app.add_event_handler("startup", create_simulation_state_startup_handler(app))
         app.add_event_handler("startup", create_instance_state_handler(app))
         app.add_event_handler(
@@ -33,5 +38,6 @@ def get_app(unit_tests: bool = False) -> FastAPI:
         app.add_event_handler("startup", create_startup_kafka_connection_handler(app))
         app.add_event_handler("shutdown", create_simulation_state_shutdown_handler(app))
         app.add_event_handler("shutdown", create_shutdown_kafka_connection_handler(app))
+        app.add_event_handler("shutdown", create_shutdown_http_client_handler(app))
 
     return app
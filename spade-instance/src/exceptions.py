@@ -24,3 +24,8 @@ class SimulationIdNotSetException(Exception):
 class KafkaNotSetException(Exception):
     def __init__(self):
         super().__init__("Kafka is not set")
+
+
+class HttpClientNotSetException(Exception):
+    def __init__(self):
+        super().__init__("Http client is not set")
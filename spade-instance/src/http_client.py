@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Callable, Coroutine
+
+import httpx
+
+from src.exceptions import HttpClientNotSetException
+from src.settings import http_client_settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_HTTP_CLIENT", "INFO"))
+
+
+def create_http_client() -> httpx.AsyncClient:
+    # connections are kept alive between the announcements instead of being opened every period
+    return httpx.AsyncClient(
+        http2=http_client_settings.http2,
+        limits=httpx.Limits(
+            max_connections=http_client_settings.max_connections,
+            max_keepalive_connections=http_client_settings.max_keepalive_connections,
+            keepalive_expiry=http_client_settings.keepalive_expiry,
+        ),
+        timeout=http_client_settings.timeout,
+    )
+
+
+def set_app_http_client(app: FastAPI, http_client: httpx.AsyncClient) -> None:
+    app.state.http_client = http_client
+
+
+def get_app_http_client(app: FastAPI) -> httpx.AsyncClient:
+    try:
+        return app.state.http_client
+    except AttributeError:
+        raise HttpClientNotSetException()
+
+
+def create_startup_http_client_handler(
+    app: FastAPI,
+) -> Callable[[], Coroutine[Any, Any, None]]:
+    async def create() -> Coroutine[Any, Any, None]:
+        logger.info("Creating http client")
+        set_app_http_client(app, create_http_client())
+
+    return create
+
+
+def create_shutdown_http_client_handler(
+    app: FastAPI,
+) -> Callable[[], Coroutine[Any, Any, None]]:
+    async def close() -> Coroutine[Any, Any, None]:
+        logger.info("Closing http client")
+        await get_app_http_client(app).aclose()
+
+    return close
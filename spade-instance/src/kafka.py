@@ -17,6 +17,25 @@ logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_KAFKA", "INFO"))
 
 
+def serialize_value(value: Any) -> bytes:
+    # agent updates are serialized in the simulation process
+    if isinstance(value, bytes):
+        return value
+    return orjson.dumps(value)
+
+
+def create_kafka_producer() -> AIOKafkaProducer:
+    # it must be created inside of the event loop it is used in
+    return AIOKafkaProducer(
+        bootstrap_servers=kafka_settings.address,
+        key_serializer=str.encode,
+        value_serializer=serialize_value,
+        compression_type=kafka_settings.compression_type,
+        linger_ms=kafka_settings.linger_ms,
+        max_batch_size=kafka_settings.max_batch_size,
+    )
+
+
 def set_app_kafka(app: FastAPI, kafka: AIOKafkaProducer) -> None:
     app.state.kafka = kafka
 
@@ -33,11 +52,7 @@ def create_startup_kafka_connection_handler(
 ) -> Callable[[], Coroutine[Any, Any, None]]:
     async def connect() -> Coroutine[Any, Any, None]:
         logger.info("Connecting to kafka")
-        kafka_producer = AIOKafkaProducer(
-            bootstrap_servers=kafka_settings.address,
-            key_serializer=str.encode,
-            value_serializer=orjson.dumps,
-        )
+        kafka_producer = create_kafka_producer()
         await kafka_producer.start()
         set_app_kafka(app, kafka_producer)
         logger.info("Connected to kafka")
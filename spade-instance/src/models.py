@@ -13,6 +13,12 @@ class CreateSimulation(BaseModel):
     agent_data: List[Dict[str, Any]]
 
 
+class CreateSimulationStreamHeader(BaseModel):
+    simulation_id: str
+    agent_code_lines: List[str]
+    num_agents: int
+
+
 class DeletedSimulation(BaseModel):
     simulation_id: str
 
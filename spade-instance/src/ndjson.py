@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+
+
+async def iterate_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # the chunks of the request body are not aligned with the lines
+    remainder = b""
+    async for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if remainder.strip():
+        yield remainder
+
+
+async def iterate_agent_data_chunks(
+    lines: AsyncIterator[bytes], chunk_size: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    agent_data = []
+    async for line in lines:
+        agent = orjson.loads(line)
+        if not isinstance(agent, dict) or "type" not in agent:
+            raise ValueError(f"Invalid agent data: {line[:100]}")
+        agent_data.append(agent)
+        if len(agent_data) == chunk_size:
+            yield agent_data
+            agent_data = []
+    if agent_data:
+        yield agent_data
@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Tuple
 
-import httpx
 import orjson
 import psutil
 from fastapi_utils.tasks import repeat_every
+from starlette import status
 
+from src.http_client import get_app_http_client
+from src.resources import get_available_memory_MiB, get_cpu_count
 from src.settings import instance_settings, simulation_load_balancer_settings
 from src.state import get_app_simulation_state
 
@@ -27,6 +29,7 @@ async def get_instance_information(app: FastAPI) -> Awaitable[Dict[str, Any]]:
     status, simulation_id, num_agents, broken_agents = await get_app_simulation_state(
         app
     ).get_state()
+    agents_per_second = await get_app_simulation_state(app).get_agents_per_second()
     return {
         "status": status.name,
         "simulation_id": simulation_id,
@@ -34,10 +37,66 @@ async def get_instance_information(app: FastAPI) -> Awaitable[Dict[str, Any]]:
         "broken_agents": broken_agents,
         "api_memory_usage_MiB": api_memory_usage,
         "simulation_memory_usage_MiB": simulation_memory_usage,
+        "cpu_count": get_cpu_count(),
+        "available_memory_MiB": get_available_memory_MiB(),
+        "agents_per_second": agents_per_second,
     }
 
 
+class InstanceStateDeltaEncoder:
+    """Encodes the instance state as changes to the last state acknowledged by the simulation load balancer.
+
+    The full state is sent first, then every `snapshot_period` announcements to recover from any drift,
+    and whenever the load balancer does not accept the changes.
+    """
+
+    def __init__(self, snapshot_period: int):
+        self.snapshot_period = snapshot_period
+        self.acknowledged_state: Dict[str, Any] | None = None
+        self.acknowledged_version = 0
+        self.num_deltas = 0
+
+    def encode(self, instance_state: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        # returns whether the payload is a delta and the payload
+        version = self.acknowledged_version + 1
+        if self.acknowledged_state is None or self.num_deltas >= self.snapshot_period:
+            return False, {**instance_state, "version": version}
+
+        acknowledged_broken_agents = set(self.acknowledged_state["broken_agents"])
+        broken_agents = set(instance_state["broken_agents"])
+        delta = {
+            key: value
+            for key, value in instance_state.items()
+            if key != "broken_agents"
+        }
+        delta.update(
+            {
+                "base_version": self.acknowledged_version,
+                "version": version,
+                "broken_agents_added": list(broken_agents - acknowledged_broken_agents),
+                "broken_agents_removed": list(
+                    acknowledged_broken_agents - broken_agents
+                ),
+            }
+        )
+        return True, delta
+
+    def acknowledge(
+        self, instance_state: Dict[str, Any], payload: Dict[str, Any], is_delta: bool
+    ) -> None:
+        self.acknowledged_state = instance_state
+        self.acknowledged_version = payload["version"]
+        self.num_deltas = self.num_deltas + 1 if is_delta else 0
+
+    def reset(self) -> None:
+        self.acknowledged_state = None
+
+
 def create_instance_state_handler(app: FastAPI) -> Callable[[], Awaitable[None]]:
+    encoder = InstanceStateDeltaEncoder(
+        simulation_load_balancer_settings.snapshot_period
+    )
+
     @repeat_every(
         seconds=simulation_load_balancer_settings.announcement_period,
         raise_exceptions=False,
@@ -46,17 +105,37 @@ def create_instance_state_handler(app: FastAPI) -> Callable[[], Awaitable[None]]
     async def instance_state_handler() -> Awaitable[None]:
         instance_state = await get_instance_information(app)
         url = f"{simulation_load_balancer_settings.url}/instances/{instance_settings.id}/state"
+        is_delta, payload = encoder.encode(instance_state)
         logger.info(
-            f"Sending state to simulation load balancer ({url}): {instance_state}"
+            f"Sending state {'changes ' if is_delta else ''}to simulation load balancer ({url}): {payload}"
         )
         try:
-            async with httpx.AsyncClient() as client:
-                await client.put(
+            client = get_app_http_client(app)
+            response = await client.request(
+                "PATCH" if is_delta else "PUT",
+                url,
+                headers={"Content-Type": "application/json"},
+                data=orjson.dumps(payload),
+            )
+            # the load balancer lost the state, missed an update or does not support deltas
+            if is_delta and response.status_code in (
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+                status.HTTP_409_CONFLICT,
+            ):
+                logger.info(
+                    f"State changes rejected by simulation load balancer ({response.status_code}), sending full state"
+                )
+                encoder.reset()
+                is_delta, payload = encoder.encode(instance_state)
+                response = await client.put(
                     url,
                     headers={"Content-Type": "application/json"},
-                    data=orjson.dumps(instance_state),
+                    data=orjson.dumps(payload),
                 )
+            response.raise_for_status()
+            encoder.acknowledge(instance_state, payload, is_delta)
         except Exception as e:
+            encoder.reset()
             logger.warn(f"Error while sending state to simulation load balancer: {e}")
 
     return instance_state_handler
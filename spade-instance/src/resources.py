@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+import os
+
+import psutil
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_RESOURCES", "INFO"))
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def read_cgroup_file(*paths: str) -> str | None:
+    # the first of the files that exists, cgroup v2 paths go first
+    for path in paths:
+        try:
+            with open(os.path.join(CGROUP_ROOT, path)) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def get_cgroup_cpu_limit() -> float | None:
+    cpu_max = read_cgroup_file("cpu.max")
+    if cpu_max is not None:
+        quota, period = cpu_max.split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+
+    quota = read_cgroup_file("cpu/cpu.cfs_quota_us", "cpu,cpuacct/cpu.cfs_quota_us")
+    period = read_cgroup_file("cpu/cpu.cfs_period_us", "cpu,cpuacct/cpu.cfs_period_us")
+    if quota is None or period is None or int(quota) < 0:
+        return None
+    return int(quota) / int(period)
+
+
+def get_cpu_count() -> int:
+    # the CPUs the container can use, rather than the CPUs of the host
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        cpu_count = os.cpu_count() or 1
+    cpu_limit = get_cgroup_cpu_limit()
+    if cpu_limit is not None:
+        cpu_count = min(cpu_count, max(round(cpu_limit), 1))
+    return cpu_count
+
+
+def get_available_memory_MiB() -> float:
+    # the memory left under the container limit, if it is lower than the memory left on the host
+    available_memory = psutil.virtual_memory().available
+    memory_limit = read_cgroup_file("memory.max", "memory/memory.limit_in_bytes")
+    memory_usage = read_cgroup_file("memory.current", "memory/memory.usage_in_bytes")
+    if memory_limit is not None and memory_usage is not None and memory_limit != "max":
+        available_memory = min(
+            available_memory, max(int(memory_limit) - int(memory_usage), 0)
+        )
+        logger.debug(f"Memory limit: {memory_limit}, usage: {memory_usage}")
+    return available_memory / 1024**2
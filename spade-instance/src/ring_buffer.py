@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_RING_BUFFER", "INFO"))
+
+# header fields (uint64), each of them written by a single side only
+WRITE_POSITION = 0  # producer
+NUM_WRITTEN = 1  # producer
+HIGH_WATER_MARK = 2  # producer, in bytes
+READ_POSITION = 3  # consumer
+NUM_READ = 4  # consumer
+CLOSED = 5  # consumer
+HEADER_SIZE = 64
+RECORD_HEADER = struct.Struct("<II")
+
+
+class SharedMemoryRingBuffer:
+    """Single-producer, single-consumer ring buffer of byte records in shared memory.
+
+    The positions are monotonically increasing byte counters, and every header field
+    has a single writer, so neither side needs a lock (the simulation process can be killed at any time).
+    A record is copied before the position which publishes it is advanced.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.shared_memory = SharedMemory(create=True, size=HEADER_SIZE + capacity)
+        self._attach()
+        for field in range(HEADER_SIZE // 8):
+            self.header[field] = 0
+
+    def _attach(self) -> None:
+        # aligned 8-byte fields are stored with a single write
+        self.header = self.shared_memory.buf[:HEADER_SIZE].cast("Q")
+        self.data = self.shared_memory.buf[HEADER_SIZE:]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "shared_memory": self.shared_memory}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.capacity = state["capacity"]
+        self.shared_memory = state["shared_memory"]
+        self._attach()
+
+    def _copy_in(self, position: int, data: bytes) -> None:
+        start = position % self.capacity
+        first_part = min(len(data), self.capacity - start)
+        self.data[start : start + first_part] = data[:first_part]
+        if first_part < len(data):
+            self.data[: len(data) - first_part] = data[first_part:]
+
+    def _copy_out(self, position: int, size: int) -> bytes:
+        start = position % self.capacity
+        first_part = min(size, self.capacity - start)
+        data = bytes(self.data[start : start + first_part])
+        if first_part < size:
+            data += bytes(self.data[: size - first_part])
+        return data
+
+    def try_put(self, key: bytes, value: bytes) -> bool:
+        size = RECORD_HEADER.size + len(key) + len(value)
+        if size > self.capacity:
+            raise ValueError(
+                f"Record of {size} bytes does not fit in the ring buffer ({self.capacity} bytes)"
+            )
+
+        write_position = self.header[WRITE_POSITION]
+        used = write_position - self.header[READ_POSITION]
+        if size > self.capacity - used:
+            return False
+
+        self._copy_in(
+            write_position, RECORD_HEADER.pack(len(key), len(value)) + key + value
+        )
+        self.header[HIGH_WATER_MARK] = max(self.header[HIGH_WATER_MARK], used + size)
+        self.header[NUM_WRITTEN] += 1
+        self.header[WRITE_POSITION] = write_position + size
+        return True
+
+    def try_get(self) -> Tuple[bytes, bytes] | None:
+        read_position = self.header[READ_POSITION]
+        if self.header[WRITE_POSITION] == read_position:
+            return None
+
+        key_size, value_size = RECORD_HEADER.unpack(
+            self._copy_out(read_position, RECORD_HEADER.size)
+        )
+        record = self._copy_out(
+            read_position + RECORD_HEADER.size, key_size + value_size
+        )
+        self.header[NUM_READ] += 1
+        self.header[READ_POSITION] = (
+            read_position + RECORD_HEADER.size + key_size + value_size
+        )
+        return record[:key_size], record[key_size:]
+
+    def qsize(self) -> int:
+        return self.header[NUM_WRITTEN] - self.header[NUM_READ]
+
+    def empty(self) -> bool:
+        return self.header[WRITE_POSITION] == self.header[READ_POSITION]
+
+    @property
+    def high_water_mark(self) -> int:
+        return self.header[HIGH_WATER_MARK]
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header[CLOSED])
+
+    def close(self) -> None:
+        self.header[CLOSED] = 1
+
+    def release(self) -> None:
+        self.header.release()
+        self.data.release()
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+
+class AgentUpdateWriter:
+    """Used by the agents in the simulation process in place of the backup queue.
+
+    Every update is serialized once, here, and waits for free space in the buffer (backpressure).
+    """
+
+    def __init__(
+        self, ring_buffer: SharedMemoryRingBuffer, simulation_id: str, poll_ms: int
+    ):
+        self.ring_buffer = ring_buffer
+        self.simulation_id = simulation_id
+        self.poll_seconds = poll_ms / 1000
+
+    async def coro_put(self, update: Dict[str, Any]) -> None:
+        update["simulation_id"] = self.simulation_id
+        key = update["jid"].encode("utf-8")
+        value = orjson.dumps(update)
+        if self.ring_buffer.try_put(key, value):
+            return
+
+        logger.debug(f"[{update['jid']}] Agent updates buffer is full, waiting")
+        while not self.ring_buffer.try_put(key, value):
+            await asyncio.sleep(self.poll_seconds)
+
+
+class AgentUpdateReader:
+    """Reads serialized agent updates as (jid, value) tuples.
+
+    It follows the interface of the AioQueue used by the state;
+    None is returned once the buffer has been closed and emptied.
+    """
+
+    def __init__(self, ring_buffer: SharedMemoryRingBuffer, poll_ms: int):
+        self.ring_buffer = ring_buffer
+        self.poll_seconds = poll_ms / 1000
+
+    def get_nowait(self) -> Tuple[str, bytes] | None:
+        record = self.ring_buffer.try_get()
+        if record is not None:
+            key, value = record
+            return key.decode("utf-8"), value
+        if self.ring_buffer.closed:
+            return None
+        raise queue.Empty
+
+    async def coro_get(self, timeout: float | None = None) -> Tuple[str, bytes] | None:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+            await asyncio.sleep(self.poll_seconds)
+
+    def qsize(self) -> int:
+        return self.ring_buffer.qsize()
+
+    def empty(self) -> bool:
+        return self.ring_buffer.empty()
+
+    @property
+    def high_water_mark_MiB(self) -> float:
+        return self.ring_buffer.high_water_mark / 1024**2
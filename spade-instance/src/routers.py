@@ -5,10 +5,14 @@ import os
 
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
+from pydantic import ValidationError
+from starlette.requests import Request
 
 from src.dependencies import state
 from src.exceptions import SimulationException
-from src.models import CreateSimulation, DeletedSimulation
+from src.models import CreateSimulation, CreateSimulationStreamHeader, DeletedSimulation
+from src.ndjson import iterate_agent_data_chunks, iterate_lines
+from src.settings import simulation_settings
 from src.state import State
 
 logger = logging.getLogger(__name__)
@@ -39,6 +43,31 @@ async def create_simulation(
         raise HTTPException(400, str(e))
 
 
+@router.post("/simulation/stream", status_code=201)
+async def create_simulation_from_stream(
+    request: Request, state: State = Depends(state)
+):
+    # NDJSON body: the header (CreateSimulationStreamHeader) followed by one agent per line
+    lines = iterate_lines(request.stream())
+    try:
+        header = CreateSimulationStreamHeader.parse_raw(await lines.__anext__())
+    except (StopAsyncIteration, ValidationError) as e:
+        raise HTTPException(400, f"Invalid simulation header: {e}")
+
+    logger.debug(
+        f"Creating simulation {header.simulation_id} from stream, state: {await state.get_state()}"
+    )
+    try:
+        await state.stream_simulation_process(
+            header.simulation_id,
+            header.agent_code_lines,
+            header.num_agents,
+            iterate_agent_data_chunks(lines, simulation_settings.agent_data_chunk_size),
+        )
+    except SimulationException as e:
+        raise HTTPException(400, str(e))
+
+
 @router.delete("/simulation", response_model=DeletedSimulation, status_code=200)
 async def delete_simulation(state: State = Depends(state)):
     logger.debug(f"Deleting simulation, state: {await state.get_state()}")
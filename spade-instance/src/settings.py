@@ -38,11 +38,47 @@ class SimulationSettings(BaseSettings):
     status_period: int = int(
         os.environ.get("ACTIVE_SIMULATION_STATUS_ANNOUCEMENT_PERIOD", 10)
     )
-    registration_retry_after: int = int(
+    registration_retry_after: float = float(
         os.environ.get("AGENT_REGISTRATION_RETRY_AFTER", 5)
     )
+    registration_max_retry_after: float = float(
+        os.environ.get("AGENT_REGISTRATION_MAX_RETRY_AFTER", 60)
+    )
+    registration_initial_concurrency: int = int(
+        os.environ.get("AGENT_REGISTRATION_INITIAL_CONCURRENCY", 5)
+    )
     registration_max_concurrency: int = int(
-        os.environ.get("AGENT_REGISTRATION_MAX_CONCURRENCY", 5)
+        os.environ.get("AGENT_REGISTRATION_MAX_CONCURRENCY", 200)
+    )
+    registration_target_latency_ms: int = int(
+        os.environ.get("AGENT_REGISTRATION_TARGET_LATENCY_MS", 1000)
+    )
+    connection_mode: str = os.environ.get("AGENT_CONNECTION_MODE", "register")
+    registration_batch_size: int = int(
+        os.environ.get("AGENT_REGISTRATION_BATCH_SIZE", 100)
+    )
+    agent_updates_buffer_size_MiB: int = int(
+        os.environ.get("AGENT_UPDATES_BUFFER_SIZE_MIB", 16)
+    )
+    agent_updates_buffer_poll_ms: int = int(
+        os.environ.get("AGENT_UPDATES_BUFFER_POLL_MS", 5)
+    )
+    num_workers: int = int(os.environ.get("SIMULATION_NUM_WORKERS", 1))
+    agent_data_chunk_size: int = int(os.environ.get("AGENT_DATA_CHUNK_SIZE", 1000))
+    # by default, every simulation process is started ahead of the simulation
+    num_warm_workers: int = int(
+        os.environ.get(
+            "SIMULATION_NUM_WARM_WORKERS", os.environ.get("SIMULATION_NUM_WORKERS", 1)
+        )
+    )
+    agent_code_cache_dir: str = os.environ.get(
+        "AGENT_CODE_CACHE_DIR", "/tmp/agent_code_cache"
+    )
+    agent_code_cache_max_entries: int = int(
+        os.environ.get("AGENT_CODE_CACHE_MAX_ENTRIES", 32)
+    )
+    produce_to_kafka: bool = (
+        os.environ.get("SIMULATION_PRODUCE_TO_KAFKA", "false").lower() == "true"
     )
 
 
@@ -51,11 +87,32 @@ class SimulationLoadBalancerSettings(BaseSettings):
     announcement_period: int = int(
         os.environ.get("SIMULATION_LOAD_BALANCER_ANNOUNCEMENT_PERIOD", 10)
     )
+    snapshot_period: int = int(
+        os.environ.get("SIMULATION_LOAD_BALANCER_SNAPSHOT_PERIOD", 6)
+    )
 
 
 class KafkaSettings(BaseSettings):
     address: str = os.environ.get("KAFKA_ADDRESS", "")
     topic: str = os.environ.get("KAFKA_UPDATE_AGENT_INPUT_TOPIC_NAME", "")
+    compression_type: str = os.environ.get("KAFKA_COMPRESSION_TYPE", "gzip")
+    linger_ms: int = int(os.environ.get("KAFKA_LINGER_MS", 20))
+    max_batch_size: int = int(os.environ.get("KAFKA_MAX_BATCH_SIZE", 262144))
+    send_batch_size: int = int(os.environ.get("KAFKA_SEND_BATCH_SIZE", 500))
+    send_batch_timeout_ms: int = int(os.environ.get("KAFKA_SEND_BATCH_TIMEOUT_MS", 100))
+    max_batches_awaiting_ack: int = int(
+        os.environ.get("KAFKA_MAX_BATCHES_AWAITING_ACK", 4)
+    )
+
+
+class HttpClientSettings(BaseSettings):
+    http2: bool = os.environ.get("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+    max_connections: int = int(os.environ.get("HTTP_CLIENT_MAX_CONNECTIONS", 10))
+    max_keepalive_connections: int = int(
+        os.environ.get("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", 5)
+    )
+    keepalive_expiry: float = float(os.environ.get("HTTP_CLIENT_KEEPALIVE_EXPIRY", 60))
+    timeout: float = float(os.environ.get("HTTP_CLIENT_TIMEOUT", 5))
 
 
 app_settings = AppSettings()
@@ -65,3 +122,4 @@ instance_settings = InstanceSettings()
 simulation_settings = SimulationSettings()
 simulation_load_balancer_settings = SimulationLoadBalancerSettings()
 kafka_settings = KafkaSettings()
+http_client_settings = HttpClientSettings()
@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import copy
 import datetime
+import hashlib
+import importlib.util
 import logging
+import marshal
 import os
 import random
 import sys
+import types
 from typing import TYPE_CHECKING, Any, Dict, List
 
 import httpx
@@ -13,12 +17,18 @@ import numpy
 import orjson
 import spade
 
-from src.settings import backup_settings, communication_server_settings
+from src.settings import (
+    backup_settings,
+    communication_server_settings,
+    simulation_settings,
+)
 
 if TYPE_CHECKING:  # pragma: no cover
-    from aioprocessing import AioQueue
     from spade.agent import Agent
 
+    from src.ring_buffer import AgentUpdateWriter
+    from src.simulation.kafka import KafkaAgentUpdateWriter
+
 logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_SIMULATION_CODE_GENERATION", "INFO"))
 
@@ -27,23 +37,108 @@ def remove_imports(agent_code_lines: List[str]) -> List[str]:
     return list(filter(lambda line: not line.startswith("import"), agent_code_lines))
 
 
+# modules imported by the translated code, see remove_imports
+AGENT_MODULE_GLOBALS = {
+    "copy": copy,
+    "datetime": datetime,
+    "httpx": httpx,
+    "numpy": numpy,
+    "orjson": orjson,
+    "random": random,
+    "spade": spade,
+    "sys": sys,
+}
+
+
+def get_agent_code_hash(agent_code_lines: List[str]) -> str:
+    return hashlib.sha256("\n".join(agent_code_lines).encode("utf-8")).hexdigest()
+
+
+def load_cached_agent_code(path: str) -> types.CodeType | None:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    # the bytecode is specific to the interpreter version
+    magic_number = importlib.util.MAGIC_NUMBER
+    if not data.startswith(magic_number):
+        return None
+    try:
+        return marshal.loads(data[len(magic_number) :])
+    except (EOFError, TypeError, ValueError):
+        logger.warning(f"Invalid cached agent code: {path}")
+        return None
+
+
+def store_cached_agent_code(path: str, code: types.CodeType) -> None:
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # several simulation processes can compile the same code at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+        os.replace(tmp_path, path)
+
+        cached = sorted(
+            (
+                entry
+                for entry in os.scandir(cache_dir)
+                if entry.name.endswith(".marshal")
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in cached[: -simulation_settings.agent_code_cache_max_entries]:
+            os.remove(entry.path)
+    except OSError as e:
+        logger.warning(f"Could not cache agent code: {e}")
+
+
+def compile_agent_code(agent_code_lines: List[str], code_hash: str) -> types.CodeType:
+    path = os.path.join(
+        simulation_settings.agent_code_cache_dir, f"{code_hash}.marshal"
+    )
+    code = load_cached_agent_code(path)
+    if code is not None:
+        logger.debug(f"Loaded cached agent code: {path}")
+        return code
+
+    code_without_imports = remove_imports(agent_code_lines)
+    code = compile("\n".join(code_without_imports), f"<agents {code_hash}>", "exec")
+    store_cached_agent_code(path, code)
+    return code
+
+
+def load_agent_module(agent_code_lines: List[str]) -> types.ModuleType:
+    code_hash = get_agent_code_hash(agent_code_lines)
+    module_name = f"aasm_agents_{code_hash}"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module = types.ModuleType(module_name)
+    module.__dict__.update(AGENT_MODULE_GLOBALS)
+    exec(compile_agent_code(agent_code_lines, code_hash), module.__dict__)
+    sys.modules[module_name] = module
+    return module
+
+
 def generate_agents(
     agent_code_lines: List[str],
     agent_data: List[Dict[str, Any]],
-    agent_updates: AioQueue,
+    agent_updates: AgentUpdateWriter | KafkaAgentUpdateWriter,
 ) -> List[Agent]:
     agent_logger = logging.getLogger("agent")
     agent_logger.setLevel(level=os.environ.get("LOG_LEVEL_AGENT", "INFO"))
 
-    code_without_imports = remove_imports(agent_code_lines)
-
-    exec("\n".join(code_without_imports))
+    agent_module = load_agent_module(agent_code_lines)
 
     agents = []
     for agent_data_dict in agent_data:
         agent_type = agent_data_dict["type"]
         del agent_data_dict["type"]
-        agent = locals()[agent_type](
+        agent = getattr(agent_module, agent_type)(
             password=communication_server_settings.password,
             backup_method="queue",
             backup_queue=agent_updates,
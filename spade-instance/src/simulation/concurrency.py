@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_SIMULATION_CONCURRENCY", "INFO"))
+
+
+def get_retry_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # exponential backoff with full jitter, so that failed agents do not retry in lockstep
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits the number of concurrent operations with AIMD.
+
+    The limit doubles every round of fast, successful operations until the first slow or failed one (slow start),
+    and then grows by one per round. A slow or failed operation halves the limit,
+    at most once per target latency, so that a single burst of errors does not collapse it.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency_ms: int,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency_ms / 1000
+        self.slow_start = True
+        self.in_flight = 0
+        self.num_errors = 0
+        self.last_decrease = -math.inf
+        self.condition = asyncio.Condition()
+
+    def has_free_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(self.has_free_slot)
+            self.in_flight += 1
+
+    async def release(self, latency: float, success: bool) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            if success and latency <= self.target_latency:
+                increase = 1 if self.slow_start else 1 / self.limit
+                self.limit = min(self.limit + increase, self.max_limit)
+            else:
+                self.num_errors += 0 if success else 1
+                now = time.monotonic()
+                if now - self.last_decrease >= self.target_latency:
+                    self.limit = max(self.limit / 2, self.min_limit)
+                    self.slow_start = False
+                    self.last_decrease = now
+                    logger.debug(
+                        f"Decreased concurrency to {int(self.limit)} (latency: {latency:.3f}s, success: {success})"
+                    )
+            # wake up only as many waiters as there are free slots
+            self.condition.notify(max(int(self.limit) - self.in_flight, 0))
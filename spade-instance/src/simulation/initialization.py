@@ -4,13 +4,17 @@ import asyncio
 import copy
 import logging
 import os
+import time
+from enum import Enum
 from typing import TYPE_CHECKING, Any, Coroutine, Dict, List
 
 import aioxmpp
+from spade.agent import AuthenticationFailure
 from spade.behaviour import FSMBehaviour
 from spade.presence import PresenceManager
 
 from src.settings import simulation_settings
+from src.simulation.concurrency import AdaptiveConcurrencyLimiter, get_retry_delay
 
 if TYPE_CHECKING:  # pragma: no cover
     from aioxmpp.structs import JID
@@ -21,25 +25,51 @@ logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_SIMULATION_INITIALIZATION", "INFO"))
 
 
+class ConnectionMode(str, Enum):
+    # register every agent over its own stream, then log in
+    REGISTER = "register"
+    # log in, and register only if the account does not exist
+    LOGIN_FIRST = "login_first"
+    # register the agents in batches over shared streams, then log in first
+    BATCH_REGISTER = "batch_register"
+
+
+def get_registration_security_layer(
+    agent: Agent,
+) -> aioxmpp.security_layer.SecurityLayer:
+    return aioxmpp.make_security_layer(
+        None, no_verify=not agent.verify_security
+    )._replace(tls_required=False)
+
+
 # https://github.com/agent-based-information-flow-simulation/spade/blob/6a857c2ae0a86b3bdfd20ccfcd28a11e1c6db81e/spade/agent.py#L171
 # TLS is set to false
 async def async_register(agent: Agent) -> Coroutine[Any, Any, None]:  # pragma: no cover
-    metadata = aioxmpp.make_security_layer(
-        None, no_verify=not agent.verify_security
-    )._replace(tls_required=False)
-    query = aioxmpp.ibr.Query(agent.jid.localpart, agent.password)
+    await async_register_batch([agent])
+
+
+# in-band registration of many accounts over a single stream
+# the registrations are sent one by one, as the responses are not matched by id
+# an error response (i.e., the account already exists) is ignored
+async def async_register_batch(
+    agents: List[Agent],
+) -> Coroutine[Any, Any, None]:  # pragma: no cover
     _, stream, _ = await aioxmpp.node.connect_xmlstream(
-        agent.jid, metadata, loop=agent.loop
+        agents[0].jid, get_registration_security_layer(agents[0]), loop=agents[0].loop
     )
-    await aioxmpp.ibr.register(stream, query)
+    try:
+        for agent in agents:
+            query = aioxmpp.ibr.Query(agent.jid.localpart, agent.password)
+            await aioxmpp.ibr.register(stream, query)
+    finally:
+        stream.close()
 
 
 # https://github.com/agent-based-information-flow-simulation/spade/blob/6a857c2ae0a86b3bdfd20ccfcd28a11e1c6db81e/spade/agent.py#L93
 # TLS is set to false
-# register and connect client
-async def async_connect(agent: Agent) -> Coroutine[Any, Any, None]:  # pragma: no cover
+# connect client of a registered agent
+async def async_login(agent: Agent) -> Coroutine[Any, Any, None]:  # pragma: no cover
     await agent._hook_plugin_before_connection()
-    await async_register(agent)
     agent.client = aioxmpp.PresenceManagedClient(
         agent.jid,
         aioxmpp.make_security_layer(
@@ -61,37 +91,116 @@ async def async_connect(agent: Agent) -> Coroutine[Any, Any, None]:  # pragma: n
     await agent._hook_plugin_after_connection()
 
 
+async def async_connect(
+    agent: Agent, connection_mode: ConnectionMode
+) -> Coroutine[Any, Any, None]:
+    if connection_mode == ConnectionMode.REGISTER:
+        await async_register(agent)
+        await async_login(agent)
+        return
+
+    try:
+        await async_login(agent)
+    except AuthenticationFailure:
+        logger.debug(f"[{agent.jid}] Authentication failed, registering")
+        await async_register(agent)
+        await async_login(agent)
+
+
+async def pre_register_agents(
+    agents: List[Agent], batch_size: int, max_concurrency: int
+) -> Coroutine[Any, Any, None]:
+    # the agents of a batch must share the server of the stream
+    agents_by_domain: Dict[str, List[Agent]] = {}
+    for agent in agents:
+        agents_by_domain.setdefault(agent.jid.domain, []).append(agent)
+    batches = [
+        domain_agents[i : i + batch_size]
+        for domain_agents in agents_by_domain.values()
+        for i in range(0, len(domain_agents), batch_size)
+    ]
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def register_batch(batch: List[Agent]) -> Coroutine[Any, Any, None]:
+        async with semaphore:
+            try:
+                await async_register_batch(batch)
+            except Exception as e:
+                # the agents of the batch register on their own when logging in fails
+                logger.warning(f"Failed to pre-register {len(batch)} agents: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[register_batch(batch) for batch in batches])
+    logger.info(
+        f"Pre-registered {len(agents)} agents in {len(batches)} batches in {time.perf_counter() - start:.2f}s"
+    )
+
+
 async def connect_with_retry(
-    agent: Agent, retry_after: int
+    agent: Agent,
+    limiter: AdaptiveConcurrencyLimiter,
+    retry_after: float,
+    max_retry_after: float,
+    connection_mode: ConnectionMode,
 ) -> Coroutine[Any, Any, None]:
+    attempt = 0
     while True:
         logger.debug(f"Attempting to connect agent {agent.jid}")
+        await limiter.acquire()
+        start = time.perf_counter()
         try:
-            await async_connect(agent)
+            await async_connect(agent, connection_mode)
         except Exception as e:
+            await limiter.release(time.perf_counter() - start, success=False)
+            delay = get_retry_delay(attempt, retry_after, max_retry_after)
+            attempt += 1
             logger.warning(
-                f"[{agent.jid}] Connection error (retry in {retry_after} seconds): {e}"
+                f"[{agent.jid}] Connection error (retry in {delay:.2f} seconds): {e}"
             )
-            await asyncio.sleep(retry_after)
+            await asyncio.sleep(delay)
             continue
+        await limiter.release(time.perf_counter() - start, success=True)
         break
     logger.info(f"[{agent.jid}] Connected")
 
 
 async def connect_agents(agents: List[Agent]) -> Coroutine[Any, Any, None]:
-    concurrency = simulation_settings.registration_max_concurrency
-    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=simulation_settings.registration_initial_concurrency,
+        min_limit=1,
+        max_limit=simulation_settings.registration_max_concurrency,
+        target_latency_ms=simulation_settings.registration_target_latency_ms,
+    )
 
-    logger.debug(f"Connecting agents with concurrency {concurrency}")
+    connection_mode = ConnectionMode(simulation_settings.connection_mode)
 
-    async def rate_limited_connect(agent: Agent) -> Coroutine[Any, Any, None]:
-        async with semaphore:
-            await connect_with_retry(
-                agent, simulation_settings.registration_retry_after
-            )
+    logger.debug(
+        f"Connecting agents with initial concurrency {int(limiter.limit)} ({connection_mode.value})"
+    )
 
-    tasks = [asyncio.create_task(rate_limited_connect(agent)) for agent in agents]
+    start = time.perf_counter()
+    if connection_mode == ConnectionMode.BATCH_REGISTER:
+        await pre_register_agents(
+            agents,
+            simulation_settings.registration_batch_size,
+            simulation_settings.registration_initial_concurrency,
+        )
+    tasks = [
+        asyncio.create_task(
+            connect_with_retry(
+                agent,
+                limiter,
+                simulation_settings.registration_retry_after,
+                simulation_settings.registration_max_retry_after,
+                connection_mode,
+            )
+        )
+        for agent in agents
+    ]
     await asyncio.gather(*tasks)
+    logger.info(
+        f"Time to all connected: {time.perf_counter() - start:.2f}s for {len(agents)} agents (final concurrency: {int(limiter.limit)}, connection errors: {limiter.num_errors})"
+    )
 
 
 # https://github.com/agent-based-information-flow-simulation/spade/blob/6a857c2ae0a86b3bdfd20ccfcd28a11e1c6db81e/spade/agent.py#L137
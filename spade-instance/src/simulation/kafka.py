@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Dict
+
+import orjson
+
+from src.settings import kafka_settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiokafka import AIOKafkaProducer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_SIMULATION_KAFKA", "INFO"))
+
+
+class KafkaAgentUpdateWriter:
+    """Used by the agents in place of the backup queue if the simulation process produces to Kafka directly.
+
+    The sends are not awaited until acknowledged, the producer groups them into batches
+    (and makes the agents wait if its buffer is full).
+    """
+
+    def __init__(self, kafka: AIOKafkaProducer, simulation_id: str):
+        self.kafka = kafka
+        self.simulation_id = simulation_id
+        self.num_failed = 0
+
+    def log_send_error(self, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is None:
+            return
+
+        self.num_failed += 1
+        logger.warning(
+            f"Failed to send agent update to the broker ({self.num_failed} so far): {future.exception()}"
+        )
+
+    async def coro_put(self, update: Dict[str, Any]) -> None:
+        update["simulation_id"] = self.simulation_id
+        future = await self.kafka.send(
+            topic=kafka_settings.topic, key=update["jid"], value=orjson.dumps(update)
+        )
+        future.add_done_callback(self.log_send_error)
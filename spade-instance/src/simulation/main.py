@@ -3,22 +3,27 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
-from typing import TYPE_CHECKING, Any, Coroutine, Dict, List
+from typing import TYPE_CHECKING, Any, AsyncIterator, Coroutine, Dict, List
 
-import spade
 import uvloop
 from spade.container import Container
 
+from src.kafka import create_kafka_producer
+from src.ring_buffer import AgentUpdateWriter
 from src.settings import simulation_settings
 from src.simulation.code_generation import generate_agents
 from src.simulation.initialization import connect_agents, setup_agents
-from src.simulation.status import send_status
+from src.simulation.kafka import KafkaAgentUpdateWriter
+from src.simulation.status import BrokenAgentTracker, send_status
 
 if TYPE_CHECKING:  # pragma: no cover
+    from multiprocessing.connection import Connection
+
     from aioprocessing import AioQueue
-    from aioxmpp.structs import JID
     from spade.agent import Agent
 
+    from src.ring_buffer import SharedMemoryRingBuffer
+
 logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_SIMULATION_MAIN", "INFO"))
 logging.getLogger("spade.behaviour").setLevel(
@@ -32,51 +37,130 @@ class SimulationInfiniteLoop:
     async def run(
         self,
         agents: List[Agent],
-        agent_behaviours: Dict[JID, List[spade.behaviour.PeriodicBehaviour]],
+        broken_agent_tracker: BrokenAgentTracker,
         status_annoucement_period: int,
         simulation_status_updates: AioQueue,
+        worker: int = 0,
     ) -> Coroutine[Any, Any, None]:
         while self.RUNNING:
             Container().reset()
-            await send_status(agents, agent_behaviours, simulation_status_updates)
+            await send_status(
+                len(agents), broken_agent_tracker, simulation_status_updates, worker
+            )
             await asyncio.sleep(status_annoucement_period)
 
 
+async def iterate_agent_data(
+    agent_data: List[Dict[str, Any]]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    yield agent_data
+
+
+async def receive_agent_data(
+    commands: Connection,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    # the agent data arrives in chunks, ended with None
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            agent_data = await loop.run_in_executor(None, commands.recv)
+            if agent_data is None:
+                break
+            yield agent_data
+    finally:
+        commands.close()
+
+
 async def run_simulation(
+    simulation_id: str,
+    worker: int,
     agent_code_lines: List[str],
-    agent_data: List[Dict[str, Any]],
-    agent_updates: AioQueue,
+    agent_data: AsyncIterator[List[Dict[str, Any]]],
+    agent_updates: SharedMemoryRingBuffer | None,
     simulation_status_updates: AioQueue,
 ) -> Coroutine[Any, Any, None]:
     Container().loop = asyncio.get_running_loop()
 
+    # without the buffer, the agent updates are sent to Kafka from this process
+    if agent_updates is None:
+        logger.info("Connecting to kafka...")
+        kafka = create_kafka_producer()
+        await kafka.start()
+        agent_update_writer = KafkaAgentUpdateWriter(kafka, simulation_id)
+    else:
+        agent_update_writer = AgentUpdateWriter(
+            agent_updates,
+            simulation_id,
+            simulation_settings.agent_updates_buffer_poll_ms,
+        )
+
+    # the agents are generated while the rest of their data is still being received
     logger.info("Generating agents...")
-    agents = generate_agents(agent_code_lines, agent_data, agent_updates)
+    agents = []
+    async for agent_data_chunk in agent_data:
+        agents.extend(
+            generate_agents(agent_code_lines, agent_data_chunk, agent_update_writer)
+        )
 
     logger.info("Connecting agents to the communication server...")
     await connect_agents(agents)
 
     logger.info("Running setup...")
     agent_behaviours = setup_agents(agents)
+    broken_agent_tracker = BrokenAgentTracker()
+    broken_agent_tracker.track_agents(agents, agent_behaviours)
 
-    logger.info(f"Simulation started with {len(agents)} agents.")
+    logger.info(f"Simulation worker {worker} started with {len(agents)} agents.")
     await SimulationInfiniteLoop().run(
         agents,
-        agent_behaviours,
+        broken_agent_tracker,
         simulation_settings.status_period,
         simulation_status_updates,
+        worker,
     )
 
 
 def main(
+    simulation_id: str,
+    worker: int,
     agent_code_lines: List[str],
     agent_data: List[Dict[str, Any]],
-    agent_updates: AioQueue,
+    agent_updates: SharedMemoryRingBuffer | None,
     simulation_status_updates: AioQueue,
 ) -> None:
     uvloop.install()
     asyncio.run(
         run_simulation(
-            agent_code_lines, agent_data, agent_updates, simulation_status_updates
+            simulation_id,
+            worker,
+            agent_code_lines,
+            iterate_agent_data(agent_data),
+            agent_updates,
+            simulation_status_updates,
+        )
+    )
+
+
+def worker_main(
+    commands: Connection,
+    agent_updates: SharedMemoryRingBuffer | None,
+    simulation_status_updates: AioQueue,
+) -> None:
+    # everything but the agents is ready before the simulation is started
+    uvloop.install()
+    try:
+        simulation_id, worker, agent_code_lines = commands.recv()
+    except EOFError:
+        commands.close()
+        return
+
+    asyncio.run(
+        run_simulation(
+            simulation_id,
+            worker,
+            agent_code_lines,
+            receive_agent_data(commands),
+            agent_updates,
+            simulation_status_updates,
         )
     )
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import TYPE_CHECKING, Any, Coroutine, Dict, List
+from typing import TYPE_CHECKING, Any, Coroutine, Dict, List, Set, Tuple
 
 from src.status import Status
 
@@ -45,20 +45,108 @@ def get_broken_agents(
     return broken_agents
 
 
-def get_instance_status(num_agents: int, broken_agents: List[str]) -> Dict[str, Any]:
+class BrokenAgentTracker:
+    """Keeps the set of broken agents up to date from the client and behaviour callbacks,
+    so that the status does not require checking every agent.
+
+    A disconnected agent is no longer broken once its stream is established again (the client reconnects on its own),
+    while an agent with a killed behaviour stays broken.
+    """
+
+    def __init__(self):
+        self.disconnected_agents: Set[str] = set()
+        self.killed_agents: Set[str] = set()
+        self.reported_broken_agents: Set[str] = set()
+
+    @property
+    def broken_agents(self) -> Set[str]:
+        return self.disconnected_agents | self.killed_agents
+
+    def set_disconnected(self, jid: str, disconnected: bool) -> None:
+        if disconnected:
+            logger.debug(f"[{jid}] Disconnected")
+            self.disconnected_agents.add(jid)
+        else:
+            self.disconnected_agents.discard(jid)
+
+    def track_behaviour(self, jid: str, behaviour: Behaviour) -> None:
+        # spade kills the behaviour with the exception as the exit code if it fails
+        kill = behaviour.kill
+
+        def kill_and_track(exit_code: Any | None = None) -> None:
+            kill(exit_code)
+            if behaviour._exit_code != 0:
+                logger.error(f"[{jid}] {behaviour}: KILLED")
+                self.killed_agents.add(jid)
+
+        behaviour.kill = kill_and_track
+
+    def track_agent(self, agent: Agent, behaviours: List[Behaviour]) -> None:
+        jid = str(agent.jid)
+        # the agent is checked in full only once, then the callbacks keep its state
+        if any(behaviour._exit_code != 0 for behaviour in behaviours):
+            self.killed_agents.add(jid)
+        elif get_broken_agents([agent], {agent.jid: behaviours}):
+            self.set_disconnected(jid, True)
+        if agent.client is None:
+            return
+
+        for signal in (
+            agent.client.on_failure,
+            agent.client.on_stopped,
+            agent.client.on_stream_destroyed,
+            agent.client.on_stream_suspended,
+        ):
+            signal.connect(lambda *args, **kwargs: self.set_disconnected(jid, True))
+        for signal in (
+            agent.client.on_stream_established,
+            agent.client.on_stream_resumed,
+        ):
+            signal.connect(lambda *args, **kwargs: self.set_disconnected(jid, False))
+        for behaviour in behaviours:
+            self.track_behaviour(jid, behaviour)
+
+    def track_agents(
+        self, agents: List[Agent], agent_behaviours: Dict[JID, List[Behaviour]]
+    ) -> None:
+        for agent in agents:
+            self.track_agent(agent, agent_behaviours[agent.jid])
+
+    def get_delta(self) -> Tuple[List[str], List[str]]:
+        # the agents which became broken and the ones which are no longer broken since the last call
+        broken_agents = self.broken_agents
+        added = broken_agents - self.reported_broken_agents
+        removed = self.reported_broken_agents - broken_agents
+        self.reported_broken_agents = broken_agents
+        return list(added), list(removed)
+
+
+def get_instance_status(
+    num_agents: int,
+    broken_agents_added: List[str],
+    broken_agents_removed: List[str],
+    worker: int = 0,
+) -> Dict[str, Any]:
     return {
+        "worker": worker,
         "status": Status.RUNNING,
         "num_agents": num_agents,
-        "broken_agents": broken_agents,
+        "broken_agents_added": broken_agents_added,
+        "broken_agents_removed": broken_agents_removed,
     }
 
 
 async def send_status(
-    agents: List[Agent],
-    agent_num_behaviours: Dict[JID, int],
+    num_agents: int,
+    broken_agent_tracker: BrokenAgentTracker,
     simulation_status_updates: AioQueue,
+    worker: int = 0,
 ) -> Coroutine[Any, Any, None]:
-    broken_agents = get_broken_agents(agents, agent_num_behaviours)
-    instance_status = get_instance_status(len(agents), broken_agents)
-    logger.info(f"Sending status to spade api: {instance_status}")
+    broken_agents_added, broken_agents_removed = broken_agent_tracker.get_delta()
+    instance_status = get_instance_status(
+        num_agents, broken_agents_added, broken_agents_removed, worker
+    )
+    logger.info(
+        f"Sending status to spade api: {instance_status['num_agents']} agents, {len(broken_agent_tracker.reported_broken_agents)} broken (+{len(broken_agents_added)}, -{len(broken_agents_removed)})"
+    )
     await simulation_status_updates.coro_put(instance_status)
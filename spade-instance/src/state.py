@@ -3,11 +3,21 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
-from multiprocessing import Process
-from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, List, Tuple
+import queue
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Set,
+    Tuple,
+)
 
 import psutil
-from aioprocessing import AioQueue
 
 from src.exceptions import (
     SimulationException,
@@ -15,15 +25,20 @@ from src.exceptions import (
     SimulationStateNotSetException,
 )
 from src.kafka import get_app_kafka
-from src.settings import kafka_settings
-from src.simulation.main import main
+from src.ring_buffer import AgentUpdateReader, SharedMemoryRingBuffer
+from src.settings import kafka_settings, simulation_settings
 from src.status import Status
+from src.worker_pool import SimulationWorkerPool
 
 if TYPE_CHECKING:  # pragma: no cover
     from asyncio.locks import Lock
+    from multiprocessing import Process
 
+    from aioprocessing import AioQueue
     from fastapi import FastAPI
 
+    from src.worker_pool import SimulationWorker
+
 logger = logging.getLogger(__name__)
 logger.setLevel(level=os.environ.get("LOG_LEVEL_STATE", "INFO"))
 
@@ -33,12 +48,28 @@ class State:
         self.app: FastAPI = app
         self.mutex: Lock = asyncio.Lock()
         self.status: Status = Status.IDLE
-        self.simulation_process: Process | None = None
+        self.simulation_processes: List[Process] = []
         self.simulation_id: str | None = None
         self.num_agents: int = 0
         self.broken_agents: List[str] = []
-        self.agent_updates: AioQueue | None = None
-        self.simulation_status_update: AioQueue | None = None
+        # one buffer and reader per simulation process, unless they produce to Kafka
+        self.agent_updates: List[SharedMemoryRingBuffer] = []
+        self.agent_updates_tasks: List[asyncio.Task] = []
+        # the loop keeps only weak references to the tasks, the ones waiting for acks are kept here
+        self.agent_updates_ack_tasks: Set[asyncio.Task] = set()
+        # one status queue per simulation process
+        self.simulation_status_updates: List[AioQueue] = []
+        # the number of agents started per second by the last simulation, kept between simulations
+        self.simulation_started_at: float | None = None
+        self.agents_per_second: float | None = None
+        self.worker_pool = SimulationWorkerPool(
+            size=simulation_settings.num_warm_workers,
+            agent_updates_capacity=None
+            if simulation_settings.produce_to_kafka
+            else simulation_settings.agent_updates_buffer_size_MiB
+            * 1024**2
+            // simulation_settings.num_workers,
+        )
 
     async def _clean_state(self) -> None:
         # not the most elegant solution
@@ -46,21 +77,37 @@ class State:
         # and then it puts poison pills into the queues
         # it's been noticed that sometimes the poison pills are not processed if put immediately
         # TODO: find a better solution
-        await self.await_empty_queue(
-            self.simulation_status_updates, wait_before_seconds=0.5, every_seconds=0.5
-        )
-        await self.await_empty_queue(
-            self.agent_updates, wait_before_seconds=0.5, every_seconds=0.5
-        )
-        await self.simulation_status_updates.coro_put(None)
-        await self.agent_updates.coro_put(None)
+        for simulation_status_updates in self.simulation_status_updates:
+            await self.await_empty_queue(
+                simulation_status_updates, wait_before_seconds=0.5, every_seconds=0.5
+            )
+            await simulation_status_updates.coro_put(None)
+        for agent_updates, agent_updates_task in zip(
+            self.agent_updates, self.agent_updates_tasks
+        ):
+            await self.await_empty_queue(
+                agent_updates, wait_before_seconds=0.5, every_seconds=0.5
+            )
+            # the reader stops after reading the remaining agent updates
+            agent_updates.close()
+            await agent_updates_task
+            logger.info(
+                f"Agent updates buffer high-water mark: {agent_updates.high_water_mark / 1024**2:.2f} MiB"
+            )
+            agent_updates.release()
+        # the readers are done, so no more batches are sent and the remaining acks are awaited
+        await asyncio.gather(*self.agent_updates_ack_tasks)
 
-        self.simulation_process = None
+        self.simulation_processes = []
         self.simulation_id = None
+        self.simulation_started_at = None
         self.num_agents = 0
         self.broken_agents = []
-        self.agent_updates = None
-        self.simulation_status_updates = None
+        self.agent_updates = []
+        self.agent_updates_tasks = []
+        self.simulation_status_updates = []
+        # the processes of the simulation are not reused, they are replaced by new ones
+        self.worker_pool.fill()
 
     async def update_active_state(
         self, status: Status, num_agents: int, broken_agents: List[str]
@@ -70,6 +117,17 @@ class State:
             if self.status == status.IDLE:
                 raise SimulationException(self.status, "Simulation is not running.")
 
+            if (
+                self.status == Status.STARTING
+                and status == Status.RUNNING
+                and self.simulation_started_at is not None
+                and num_agents > 0
+            ):
+                elapsed = time.monotonic() - self.simulation_started_at
+                self.agents_per_second = num_agents / max(elapsed, 1e-3)
+                logger.info(
+                    f"Started {num_agents} agents in {elapsed:.2f}s ({self.agents_per_second:.1f} agents/s)"
+                )
             self.status = status
             self.num_agents = num_agents
             self.broken_agents = broken_agents
@@ -86,6 +144,11 @@ class State:
                 self.broken_agents,
             )
 
+    async def get_agents_per_second(self) -> Coroutine[Any, Any, float | None]:
+        logger.debug("Getting agents per second")
+        async with self.mutex:
+            return self.agents_per_second
+
     async def get_simulation_id(self) -> Coroutine[Any, Any, str]:
         logger.debug("Getting simulation id")
         async with self.mutex:
@@ -100,6 +163,57 @@ class State:
         agent_code_lines: List[str],
         agent_data: List[Dict[str, Any]],
     ) -> Coroutine[Any, Any, None]:
+        workers = await self.start_simulation_workers(
+            simulation_id, agent_code_lines, len(agent_data)
+        )
+        for simulation_worker, shard in zip(
+            workers, split_agent_data(agent_data, len(workers))
+        ):
+            await simulation_worker.send_agent_data(shard)
+            await simulation_worker.finish()
+
+    async def stream_simulation_process(
+        self,
+        simulation_id: str,
+        agent_code_lines: List[str],
+        num_agents: int,
+        agent_data_chunks: AsyncIterator[List[Dict[str, Any]]],
+    ) -> Coroutine[Any, Any, None]:
+        workers = await self.start_simulation_workers(
+            simulation_id, agent_code_lines, num_agents
+        )
+        # the simulation processes generate the agents while the next chunks are received
+        try:
+            num_received = 0
+            async for agent_data in agent_data_chunks:
+                for shard, simulation_worker in enumerate(workers):
+                    # the agents are dealt as if split_agent_data was called with all of them
+                    shard_agent_data = agent_data[
+                        (shard - num_received) % len(workers) :: len(workers)
+                    ]
+                    if shard_agent_data:
+                        await simulation_worker.send_agent_data(shard_agent_data)
+                num_received += len(agent_data)
+            for simulation_worker in workers:
+                await simulation_worker.finish()
+        except Exception as e:
+            logger.warning(
+                f"Failed to receive agents of simulation {simulation_id}: {e}"
+            )
+            try:
+                await self.kill_simulation_process()
+            except SimulationException:
+                pass
+            raise SimulationException(
+                Status.IDLE, f"Failed to receive agents: {e}"
+            ) from e
+
+    async def start_simulation_workers(
+        self,
+        simulation_id: str,
+        agent_code_lines: List[str],
+        num_agents: int,
+    ) -> Coroutine[Any, Any, List[SimulationWorker]]:
         logger.debug(
             f"Starting simulation {simulation_id}, state: {await self.get_state()}"
         )
@@ -109,54 +223,100 @@ class State:
 
             self.status = Status.STARTING
             self.simulation_id = simulation_id
-            self.agent_updates = AioQueue()
-            self.simulation_status_updates = AioQueue()
-            self.simulation_process = Process(
-                target=main,
-                args=(
-                    agent_code_lines,
-                    agent_data,
-                    self.agent_updates,
-                    self.simulation_status_updates,
-                ),
-            )
-            self.simulation_process.start()
-            asyncio.create_task(
-                self.read_update_from_queue_and_run(
-                    queue=self.agent_updates,
-                    queue_name=f"agent updates ({simulation_id})",
-                    simulation_id=simulation_id,
-                    func=self.create_send_agent_update_to_broker(),
+            self.simulation_started_at = time.monotonic()
+            # the agents are split between the simulation processes, taken from the pool of the waiting ones,
+            # each of them sends the agent updates to Kafka on its own or passes them through its buffer
+            num_shards = get_num_shards(num_agents, simulation_settings.num_workers)
+            workers = self.worker_pool.acquire(num_shards)
+            set_instance_state = self.create_set_instance_state(num_workers=num_shards)
+            for worker, simulation_worker in enumerate(workers):
+                self.simulation_processes.append(simulation_worker.process)
+                self.simulation_status_updates.append(
+                    simulation_worker.simulation_status_updates
                 )
-            )
-            asyncio.create_task(
-                self.read_update_from_queue_and_run(
-                    queue=self.simulation_status_updates,
-                    queue_name=f"instance updates ({simulation_id})",
-                    simulation_id=self.simulation_id,
-                    func=self.create_set_instance_state(),
+                await simulation_worker.start(simulation_id, worker, agent_code_lines)
+                asyncio.create_task(
+                    self.read_update_from_queue_and_run(
+                        queue=simulation_worker.simulation_status_updates,
+                        queue_name=f"instance updates ({simulation_id}, worker {worker})",
+                        simulation_id=simulation_id,
+                        func=set_instance_state,
+                    )
                 )
-            )
-
-    def create_send_agent_update_to_broker(self):
+                if simulation_worker.agent_updates is not None:
+                    self.agent_updates.append(simulation_worker.agent_updates)
+                    self.agent_updates_tasks.append(
+                        asyncio.create_task(
+                            self.read_update_batch_from_queue_and_run(
+                                queue=AgentUpdateReader(
+                                    simulation_worker.agent_updates,
+                                    poll_ms=simulation_settings.agent_updates_buffer_poll_ms,
+                                ),
+                                queue_name=f"agent updates ({simulation_id}, worker {worker})",
+                                simulation_id=simulation_id,
+                                func=self.create_send_agent_updates_to_broker(),
+                                max_batch_size=kafka_settings.send_batch_size,
+                                max_wait_ms=kafka_settings.send_batch_timeout_ms,
+                            )
+                        )
+                    )
+            return workers
+
+    def create_send_agent_updates_to_broker(self):
         kafka = get_app_kafka(self.app)
+        batches_awaiting_ack = asyncio.Semaphore(
+            kafka_settings.max_batches_awaiting_ack
+        )
 
-        async def send_agent_update_to_broker(
-            update: Dict[str, Any], simulation_id: str
+        async def await_acks(futures: List[asyncio.Future]) -> None:
+            try:
+                results = await asyncio.gather(*futures, return_exceptions=True)
+                errors = [result for result in results if isinstance(result, Exception)]
+                if errors:
+                    logger.warning(
+                        f"Failed to send {len(errors)}/{len(futures)} agent updates to the broker: {errors[0]}"
+                    )
+            finally:
+                batches_awaiting_ack.release()
+
+        async def send_agent_updates_to_broker(
+            updates: List[Tuple[str, bytes]], simulation_id: str
         ):
-            update["simulation_id"] = simulation_id
-            await kafka.send(
-                topic=kafka_settings.topic, key=update["jid"], value=update
-            )
+            # the updates are already serialized (with the simulation id) by the simulation process
+            # the sends are pipelined, the producer groups them into batches
+            await batches_awaiting_ack.acquire()
+            futures = []
+            for jid, update in updates:
+                futures.append(
+                    await kafka.send(topic=kafka_settings.topic, key=jid, value=update)
+                )
+            task = asyncio.create_task(await_acks(futures))
+            self.agent_updates_ack_tasks.add(task)
+            task.add_done_callback(self.agent_updates_ack_tasks.discard)
+
+        return send_agent_updates_to_broker
 
-        return send_agent_update_to_broker
+    def create_set_instance_state(self, num_workers: int):
+        # the number of agents and the broken agents of every simulation process
+        # the simulation processes send only the changes of their broken agents
+        worker_statuses: Dict[int, Dict[str, Any]] = {}
 
-    def create_set_instance_state(self):
         async def set_instance_state(update: Dict[str, Any], simulation_id: str):
+            worker_status = worker_statuses.setdefault(
+                update["worker"], {"num_agents": 0, "broken_agents": set()}
+            )
+            worker_status["num_agents"] = update["num_agents"]
+            worker_status["broken_agents"].difference_update(
+                update["broken_agents_removed"]
+            )
+            worker_status["broken_agents"].update(update["broken_agents_added"])
+            status, num_agents, broken_agents = combine_worker_statuses(
+                worker_statuses, num_workers
+            )
             await self.update_active_state(
-                status=update["status"],
-                num_agents=update["num_agents"],
-                broken_agents=update["broken_agents"],
+                status=status,
+                num_agents=num_agents,
+                broken_agents=broken_agents,
             )
 
         return set_instance_state
@@ -186,15 +346,81 @@ class State:
             f"Unread items in {queue_name} queue after stopping: {queue.qsize()}"
         )
 
+    async def read_update_batch_from_queue_and_run(
+        self,
+        queue: AioQueue | AgentUpdateReader,
+        queue_name: str,
+        simulation_id: str,
+        func: Callable[[List[Any], str], Coroutine[Any, Any, None]],
+        max_batch_size: int,
+        max_wait_ms: int,
+    ) -> None:
+        queue_size_task = asyncio.create_task(
+            self.show_queue_size(queue, every_seconds=30, name=queue_name)
+        )
+
+        logger.info(f"Started reading {queue_name} for simulation {simulation_id}")
+        running = True
+        while running:
+            batch, running = await self.get_update_batch_from_queue(
+                queue, max_batch_size, max_wait_ms
+            )
+            if batch:
+                await func(batch, simulation_id)
+
+        queue_size_task.cancel()
+        logger.info(f"Stopped reading {queue_name} for simulation {simulation_id}")
+        logger.info(
+            f"Unread items in {queue_name} queue after stopping: {queue.qsize()}"
+        )
+
+    async def get_update_batch_from_queue(
+        self,
+        update_queue: AioQueue | AgentUpdateReader,
+        max_batch_size: int,
+        max_wait_ms: int,
+    ) -> Tuple[List[Any], bool]:
+        # waits for the first update, and then for up to max_wait_ms for the next ones
+        # returns the batch and False if the queue has been closed (with a poison pill)
+        update: Any | None = await update_queue.coro_get()
+        if update is None:
+            return [], False
+
+        batch = [update]
+        deadline = time.monotonic() + max_wait_ms / 1000
+        while len(batch) < max_batch_size:
+            try:
+                update = update_queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    update = await update_queue.coro_get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if update is None:
+                return batch, False
+            batch.append(update)
+
+        return batch, True
+
     async def show_queue_size(
-        self, queue: AioQueue, every_seconds: float, name: str
+        self, queue: AioQueue | AgentUpdateReader, every_seconds: float, name: str
     ) -> None:
         while True:
             logger.info(f"Unread items in {name} queue: {queue.qsize()}")
+            if isinstance(queue, AgentUpdateReader):
+                logger.info(
+                    f"High-water mark of {name} buffer: {queue.high_water_mark_MiB:.2f} MiB"
+                )
             await asyncio.sleep(every_seconds)
 
     async def await_empty_queue(
-        self, queue: AioQueue, wait_before_seconds: float, every_seconds: float
+        self,
+        queue: AioQueue | SharedMemoryRingBuffer,
+        wait_before_seconds: float,
+        every_seconds: float,
     ) -> None:
         await asyncio.sleep(wait_before_seconds)
         while True:
@@ -205,41 +431,79 @@ class State:
     async def kill_simulation_process(self) -> Coroutine[Any, Any, None]:
         logger.debug(f"Killing simulation, state: {await self.get_state()}")
         async with self.mutex:
-            if self.simulation_process is None:
+            if not self.simulation_processes:
                 raise SimulationException(self.status, "Simulation is not running.")
 
             self.status = Status.IDLE
-            self.simulation_process.kill()
+            for simulation_process in self.simulation_processes:
+                simulation_process.kill()
             await self._clean_state()
 
+    def start_worker_pool(self) -> None:
+        logger.info("Starting simulation workers")
+        self.worker_pool.start()
+
+    def shutdown_worker_pool(self) -> None:
+        logger.info("Stopping simulation workers")
+        self.worker_pool.shutdown()
+
     async def get_simulation_memory_usage(self) -> Coroutine[Any, Any, float]:
         logger.debug(
             f"Getting simulation memory usage, state: {await self.get_state()}"
         )
         async with self.mutex:
-            if (
-                self.simulation_process is not None
-                and self.simulation_process.is_alive()
-            ):
-                return (
-                    psutil.Process(self.simulation_process.pid).memory_info().rss
-                    / 1024**2
-                )
+            memory_usage = 0.0
+            for simulation_process in self.simulation_processes:
+                if simulation_process.is_alive():
+                    memory_usage += (
+                        psutil.Process(simulation_process.pid).memory_info().rss
+                        / 1024**2
+                    )
 
-            return 0.0
+            return memory_usage
 
     async def verify_simulation_process(self) -> Coroutine[Any, Any, None]:
         logger.debug(f"Verify simulation process, state: {await self.get_state()}")
         async with self.mutex:
-            if (
-                self.simulation_process is not None
-                and not self.simulation_process.is_alive()
+            if any(
+                not simulation_process.is_alive()
+                for simulation_process in self.simulation_processes
             ):
+                # the simulation cannot continue without the agents of the dead process
                 logger.warning("Simulation process is dead")
                 self.status = Status.DEAD
+                for simulation_process in self.simulation_processes:
+                    simulation_process.kill()
                 await self._clean_state()
 
 
+def get_num_shards(num_agents: int, num_workers: int) -> int:
+    return max(min(num_workers, num_agents), 1)
+
+
+def split_agent_data(
+    agent_data: List[Dict[str, Any]], num_workers: int
+) -> List[List[Dict[str, Any]]]:
+    num_shards = get_num_shards(len(agent_data), num_workers)
+    return [agent_data[shard::num_shards] for shard in range(num_shards)]
+
+
+def combine_worker_statuses(
+    worker_statuses: Dict[int, Dict[str, Any]], num_workers: int
+) -> Tuple[Status, int, List[str]]:
+    # the simulation is running once every simulation process has reported its status
+    status = Status.RUNNING if len(worker_statuses) == num_workers else Status.STARTING
+    num_agents = sum(
+        worker_status["num_agents"] for worker_status in worker_statuses.values()
+    )
+    broken_agents = [
+        agent
+        for worker_status in worker_statuses.values()
+        for agent in worker_status["broken_agents"]
+    ]
+    return status, num_agents, broken_agents
+
+
 def set_app_simulation_state(app: FastAPI, state: State) -> None:
     app.state.simulation_state = state
 
@@ -254,7 +518,9 @@ def get_app_simulation_state(app: FastAPI) -> State:
 def create_simulation_state_startup_handler(app: FastAPI) -> Callable[[], None]:
     def simulation_state_startup_handler() -> None:
         logger.info("Setting up simulation state")
-        set_app_simulation_state(app, State(app))
+        state = State(app)
+        state.start_worker_pool()
+        set_app_simulation_state(app, state)
         logger.info("Simulation state set up complete")
 
     return simulation_state_startup_handler
@@ -269,6 +535,7 @@ def create_simulation_state_shutdown_handler(
             await get_app_simulation_state(app).kill_simulation_process()
         except SimulationException as e:
             logger.info(str(e))
+        get_app_simulation_state(app).shutdown_worker_pool()
         logger.info("Simulation shutdown complete")
 
     return simulation_state_shutdown_handler
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from multiprocessing import Pipe, Process
+from typing import Any, Coroutine, Dict, List
+
+from aioprocessing import AioQueue
+
+from src.ring_buffer import SharedMemoryRingBuffer
+from src.simulation.main import worker_main
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_WORKER_POOL", "INFO"))
+
+
+class SimulationWorker:
+    """Simulation process started before the simulation it runs.
+
+    Its agent updates buffer and status queue are created with it and inherited by the process,
+    which waits for the code and then the chunks of agents to run (see worker_main).
+    """
+
+    def __init__(self, agent_updates_capacity: int | None):
+        self.agent_updates: SharedMemoryRingBuffer | None = None
+        if agent_updates_capacity is not None:
+            self.agent_updates = SharedMemoryRingBuffer(agent_updates_capacity)
+        self.simulation_status_updates = AioQueue()
+        commands, self.commands = Pipe(duplex=False)
+        self.process = Process(
+            target=worker_main,
+            name="simulation-worker",
+            args=(commands, self.agent_updates, self.simulation_status_updates),
+            daemon=True,
+        )
+        self.process.start()
+        commands.close()
+
+    async def send(self, command: Any) -> Coroutine[Any, Any, None]:
+        # the command is pickled, which can take a while for many agents
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.commands.send, command
+        )
+
+    async def start(
+        self, simulation_id: str, worker: int, agent_code_lines: List[str]
+    ) -> Coroutine[Any, Any, None]:
+        await self.send((simulation_id, worker, agent_code_lines))
+
+    async def send_agent_data(
+        self, agent_data: List[Dict[str, Any]]
+    ) -> Coroutine[Any, Any, None]:
+        await self.send(agent_data)
+
+    async def finish(self) -> Coroutine[Any, Any, None]:
+        await self.send(None)
+        self.commands.close()
+
+    def stop(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.commands.close()
+        if self.agent_updates is not None:
+            self.agent_updates.release()
+
+
+class SimulationWorkerPool:
+    """Keeps `size` simulation workers waiting for the next simulation.
+
+    Workers are not reused: the ones which ran a simulation are killed with it and replaced by fresh ones.
+    """
+
+    def __init__(self, size: int, agent_updates_capacity: int | None):
+        self.size = size
+        self.agent_updates_capacity = agent_updates_capacity
+        self.idle_workers: List[SimulationWorker] = []
+        self.running = False
+
+    def start(self) -> None:
+        self.running = True
+        self.fill()
+
+    def fill(self) -> None:
+        if not self.running:
+            return
+
+        for worker in self.idle_workers:
+            if not worker.process.is_alive():
+                logger.warning(f"Idle simulation worker {worker.process.pid} is dead")
+                worker.stop()
+        self.idle_workers = [
+            worker for worker in self.idle_workers if worker.process.is_alive()
+        ]
+        while len(self.idle_workers) < self.size:
+            self.idle_workers.append(SimulationWorker(self.agent_updates_capacity))
+        logger.info(f"Idle simulation workers: {len(self.idle_workers)}")
+
+    def acquire(self, num_workers: int) -> List[SimulationWorker]:
+        workers = []
+        while self.idle_workers and len(workers) < num_workers:
+            worker = self.idle_workers.pop()
+            if worker.process.is_alive():
+                workers.append(worker)
+            else:
+                worker.stop()
+        if len(workers) < num_workers:
+            logger.info(
+                f"Starting {num_workers - len(workers)} simulation workers without the pool"
+            )
+        while len(workers) < num_workers:
+            workers.append(SimulationWorker(self.agent_updates_capacity))
+        return workers
+
+    def shutdown(self) -> None:
+        self.running = False
+        for worker in self.idle_workers:
+            worker.stop()
+        self.idle_workers = []
@@ -8,12 +8,7 @@ from asgi_lifespan import LifespanManager
 from httpx import AsyncClient
 
 from src.app import get_app
-from src.settings import (
-    app_settings,
-    backup_settings,
-    simulation_load_balancer_settings,
-    simulation_settings,
-)
+from src.settings import app_settings, simulation_load_balancer_settings
 from src.state import State
 
 if TYPE_CHECKING:
@@ -21,8 +16,6 @@ if TYPE_CHECKING:
 
 
 simulation_load_balancer_settings.url = "http://fake-simulation-load-balancer"
-backup_settings.agent_backup_url = "http://fake-agent-backup"
-simulation_settings.status_url = "http://fake-instance-status"
 
 
 def check_called(function: Callable[[Any], Any]) -> Mock:
@@ -46,7 +39,7 @@ async def client(app: FastAPI) -> AsyncClient:
 
 @pytest.fixture
 def state() -> State:
-    return State()
+    return State(app=Mock())
 
 
 @pytest.fixture
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, Mock
+
+import httpx
+import pytest
+
+from src.exceptions import HttpClientNotSetException
+from src.http_client import (
+    create_shutdown_http_client_handler,
+    create_startup_http_client_handler,
+    get_app_http_client,
+    set_app_http_client,
+)
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_get_app_http_client_returns_http_client_from_app_state(app: FastAPI) -> None:
+    mocked_http_client = Mock(spec=httpx.AsyncClient)
+    set_app_http_client(app, mocked_http_client)
+
+    returned_http_client = get_app_http_client(app)
+
+    assert returned_http_client == mocked_http_client
+
+
+def test_get_app_http_client_raises_exception_if_http_client_is_not_set(
+    app: FastAPI,
+) -> None:
+    with pytest.raises(HttpClientNotSetException):
+        get_app_http_client(app)
+
+
+async def test_http_client_startup_handler_sets_http_client_reused_between_calls(
+    app: FastAPI,
+) -> None:
+    http_client_startup_handler = create_startup_http_client_handler(app)
+
+    await http_client_startup_handler()
+
+    assert get_app_http_client(app) is get_app_http_client(app)
+    await get_app_http_client(app).aclose()
+
+
+async def test_http_client_shutdown_handler_closes_http_client(
+    app: FastAPI,
+) -> None:
+    mocked_http_client = AsyncMock(spec=httpx.AsyncClient)
+    set_app_http_client(app, mocked_http_client)
+    http_client_shutdown_handler = create_shutdown_http_client_handler(app)
+
+    await http_client_shutdown_handler()
+
+    mocked_http_client.aclose.assert_awaited_once()
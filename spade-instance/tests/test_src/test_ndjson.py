@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import AsyncIterator, List
+
+import pytest
+
+from src.ndjson import iterate_agent_data_chunks, iterate_lines
+
+pytestmark = pytest.mark.asyncio
+
+
+async def iterate(items: List[bytes]) -> AsyncIterator[bytes]:
+    for item in items:
+        yield item
+
+
+async def test_iterate_lines_joins_lines_split_between_chunks() -> None:
+    chunks = [b'{"a": 1}\n{"b"', b": 2}\n\n", b'{"c": 3}']
+
+    lines = [line async for line in iterate_lines(iterate(chunks))]
+
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+async def test_iterate_agent_data_chunks_returns_chunks_of_given_size() -> None:
+    lines = [b'{"type": "a", "jid": "%d"}' % i for i in range(5)]
+
+    chunks = [
+        chunk async for chunk in iterate_agent_data_chunks(iterate(lines), chunk_size=2)
+    ]
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[2] == [{"type": "a", "jid": "4"}]
+
+
+async def test_iterate_agent_data_chunks_raises_exception_for_invalid_agent_data() -> None:
+    with pytest.raises(ValueError):
+        async for _ in iterate_agent_data_chunks(iterate([b"[1, 2]"]), chunk_size=2):
+            pass
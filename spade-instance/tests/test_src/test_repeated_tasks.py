@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 from contextlib import nullcontext as does_not_raise
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict
 from unittest.mock import AsyncMock, Mock
 
 import pytest
 
+from src.http_client import create_http_client, set_app_http_client
 from src.repeated_tasks import (
+    InstanceStateDeltaEncoder,
     create_instance_state_handler,
     create_simulation_process_health_check_handler,
     get_instance_information,
@@ -32,6 +34,9 @@ async def test_get_instance_information_returns_instance_details(app: FastAPI) -
     assert "broken_agents" in details
     assert "api_memory_usage_MiB" in details
     assert "simulation_memory_usage_MiB" in details
+    assert "cpu_count" in details
+    assert "available_memory_MiB" in details
+    assert "agents_per_second" in details
 
 
 async def test_instance_state_handler_is_wrapped_with_repeat_every_decorator(
@@ -49,6 +54,7 @@ async def test_instance_state_handler_after_exception_is_raised_while_sending_st
 ) -> None:
     httpx_mock.add_exception(Exception())
     set_app_simulation_state(app, State())
+    set_app_http_client(app, create_http_client())
 
     instance_state_handler = create_instance_state_handler(app).__wrapped__
 
@@ -82,3 +88,55 @@ async def test_simulation_process_health_check_handler_calls_simulation_process_
     await simulation_process_health_check_handler()
 
     assert mocked_state.verify_simulation_process.called
+
+
+def send(encoder: InstanceStateDeltaEncoder, state: Dict[str, Any]) -> bool:
+    is_delta, payload = encoder.encode(state)
+    encoder.acknowledge(state, payload, is_delta)
+    return is_delta
+
+
+def test_instance_state_delta_encoder_encodes_full_state_before_first_acknowledgement() -> None:
+    encoder = InstanceStateDeltaEncoder(snapshot_period=6)
+
+    is_delta, payload = encoder.encode({"num_agents": 1, "broken_agents": ["a@s"]})
+
+    assert not is_delta
+    assert payload == {"num_agents": 1, "broken_agents": ["a@s"], "version": 1}
+
+
+def test_instance_state_delta_encoder_encodes_broken_agents_changes_since_acknowledged_state() -> None:
+    encoder = InstanceStateDeltaEncoder(snapshot_period=6)
+    send(encoder, {"num_agents": 2, "broken_agents": ["a@s"]})
+
+    is_delta, payload = encoder.encode({"num_agents": 2, "broken_agents": ["b@s"]})
+
+    assert is_delta
+    assert payload == {
+        "num_agents": 2,
+        "base_version": 1,
+        "version": 2,
+        "broken_agents_added": ["b@s"],
+        "broken_agents_removed": ["a@s"],
+    }
+
+
+def test_instance_state_delta_encoder_encodes_full_state_after_snapshot_period() -> None:
+    encoder = InstanceStateDeltaEncoder(snapshot_period=2)
+    state = {"num_agents": 0, "broken_agents": []}
+
+    sent_deltas = [send(encoder, state) for _ in range(5)]
+
+    assert sent_deltas == [False, True, True, False, True]
+
+
+def test_instance_state_delta_encoder_encodes_full_state_after_reset() -> None:
+    encoder = InstanceStateDeltaEncoder(snapshot_period=6)
+    state = {"num_agents": 0, "broken_agents": []}
+    send(encoder, state)
+
+    encoder.reset()
+    is_delta, payload = encoder.encode(state)
+
+    assert not is_delta
+    assert payload["version"] == 2
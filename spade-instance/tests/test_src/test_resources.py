@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Dict
+from unittest.mock import Mock
+
+import pytest
+
+import src.resources
+from src.resources import (
+    get_available_memory_MiB,
+    get_cgroup_cpu_limit,
+    get_cpu_count,
+    read_cgroup_file,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def write_cgroup_files(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, files: Dict[str, str]
+) -> None:
+    monkeypatch.setattr(src.resources, "CGROUP_ROOT", str(tmp_path))
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(tmp_path / path), exist_ok=True)
+        (tmp_path / path).write_text(content)
+
+
+def test_read_cgroup_file_returns_first_existing_file(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    write_cgroup_files(monkeypatch, tmp_path, {"memory/memory.limit_in_bytes": "1\n"})
+
+    assert read_cgroup_file("memory.max", "memory/memory.limit_in_bytes") == "1"
+    assert read_cgroup_file("memory.max") is None
+
+
+@pytest.mark.parametrize(
+    "files, limit",
+    [
+        ({"cpu.max": "max 100000"}, None),
+        ({"cpu.max": "150000 100000"}, 1.5),
+        (
+            {"cpu/cpu.cfs_quota_us": "200000", "cpu/cpu.cfs_period_us": "100000"},
+            2.0,
+        ),
+        ({"cpu/cpu.cfs_quota_us": "-1", "cpu/cpu.cfs_period_us": "100000"}, None),
+        ({}, None),
+    ],
+)
+def test_get_cgroup_cpu_limit_returns_cpu_quota(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    files: Dict[str, str],
+    limit: float | None,
+) -> None:
+    write_cgroup_files(monkeypatch, tmp_path, files)
+
+    assert get_cgroup_cpu_limit() == limit
+
+
+def test_get_cpu_count_is_limited_by_cpu_quota(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    write_cgroup_files(monkeypatch, tmp_path, {"cpu.max": "200000 100000"})
+    monkeypatch.setattr(os, "sched_getaffinity", Mock(return_value={0, 1, 2, 3}))
+
+    assert get_cpu_count() == 2
+
+
+def test_get_available_memory_is_limited_by_memory_limit(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    write_cgroup_files(
+        monkeypatch,
+        tmp_path,
+        {"memory.max": str(512 * 1024**2), "memory.current": str(128 * 1024**2)},
+    )
+    monkeypatch.setattr(
+        src.resources.psutil,
+        "virtual_memory",
+        Mock(return_value=Mock(available=4096 * 1024**2)),
+    )
+
+    assert get_available_memory_MiB() == 384
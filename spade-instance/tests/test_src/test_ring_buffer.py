@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import queue
+from typing import TYPE_CHECKING
+
+import orjson
+import pytest
+
+from src.ring_buffer import AgentUpdateReader, AgentUpdateWriter, SharedMemoryRingBuffer
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def ring_buffer() -> Iterator[SharedMemoryRingBuffer]:
+    ring_buffer = SharedMemoryRingBuffer(capacity=64)
+    yield ring_buffer
+    ring_buffer.release()
+
+
+def test_ring_buffer_returns_records_in_order_across_the_end_of_the_buffer(
+    ring_buffer: SharedMemoryRingBuffer,
+) -> None:
+    for i in range(10):
+        record = (f"agent_{i}".encode(), b"x" * (i + 10))
+        assert ring_buffer.try_put(*record)
+        assert ring_buffer.try_get() == record
+
+    assert ring_buffer.try_get() is None
+    assert ring_buffer.empty()
+
+
+def test_ring_buffer_rejects_records_until_there_is_free_space(
+    ring_buffer: SharedMemoryRingBuffer,
+) -> None:
+    assert ring_buffer.try_put(b"agent_0", b"x" * 15)
+    assert ring_buffer.try_put(b"agent_1", b"x" * 15)
+    assert not ring_buffer.try_put(b"agent_2", b"x" * 15)
+    assert ring_buffer.qsize() == 2
+    assert ring_buffer.high_water_mark == 2 * (8 + 7 + 15)
+
+    ring_buffer.try_get()
+
+    assert ring_buffer.try_put(b"agent_2", b"x" * 15)
+
+
+def test_ring_buffer_raises_exception_for_record_larger_than_buffer(
+    ring_buffer: SharedMemoryRingBuffer,
+) -> None:
+    with pytest.raises(ValueError):
+        ring_buffer.try_put(b"agent_0", b"x" * 64)
+
+
+async def test_agent_update_reader_returns_serialized_updates_with_simulation_id(
+    ring_buffer: SharedMemoryRingBuffer,
+) -> None:
+    writer = AgentUpdateWriter(ring_buffer, simulation_id="sim", poll_ms=1)
+    reader = AgentUpdateReader(ring_buffer, poll_ms=1)
+
+    await writer.coro_put({"jid": "a@s"})
+
+    jid, value = await reader.coro_get()
+    assert jid == "a@s"
+    assert orjson.loads(value) == {"jid": "a@s", "simulation_id": "sim"}
+
+
+async def test_agent_update_reader_returns_none_after_buffer_is_closed_and_empty(
+    ring_buffer: SharedMemoryRingBuffer,
+) -> None:
+    reader = AgentUpdateReader(ring_buffer, poll_ms=1)
+    with pytest.raises(queue.Empty):
+        await reader.coro_get(timeout=0.01)
+
+    ring_buffer.try_put(b"a@s", b"{}")
+    ring_buffer.close()
+
+    assert await reader.coro_get() == ("a@s", b"{}")
+    assert await reader.coro_get() is None
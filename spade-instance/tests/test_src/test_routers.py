@@ -9,6 +9,7 @@ from starlette import status
 
 from src.dependencies import kafka, state
 from src.exceptions import SimulationException
+from src.settings import simulation_settings
 from src.state import State
 from src.status import Status
 
@@ -72,6 +73,49 @@ async def test_create_simulation_after_trying_to_create_simulation_if_other_one_
     assert "detail" in response.json()
 
 
+async def test_create_simulation_from_stream_passes_agents_in_chunks_to_state(
+    app: FastAPI, client: AsyncClient
+) -> None:
+    received = {}
+
+    async def stream_simulation_process(
+        simulation_id, agent_code_lines, num_agents, agent_data_chunks
+    ):
+        received["header"] = (simulation_id, agent_code_lines, num_agents)
+        received["agent_data"] = [chunk async for chunk in agent_data_chunks]
+
+    state_mock = Mock(spec=State)
+    state_mock.stream_simulation_process = stream_simulation_process
+    app.dependency_overrides[state] = lambda: state_mock
+    simulation_settings.agent_data_chunk_size = 2
+
+    data = (
+        b'{"simulation_id": "sim", "agent_code_lines": ["code"], "num_agents": 3}\n'
+        b'{"type": "a", "jid": "1"}\n{"type": "a", "jid": "2"}\n{"type": "a", "jid": "3"}\n'
+    )
+
+    response = await client.post(
+        "/simulation/stream",
+        content=data,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    simulation_settings.agent_data_chunk_size = 1000
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert received["header"] == ("sim", ["code"], 3)
+    assert [len(chunk) for chunk in received["agent_data"]] == [2, 1]
+
+
+async def test_create_simulation_from_stream_with_invalid_header_response_has_400_status_code(
+    app: FastAPI, client: AsyncClient
+) -> None:
+    app.dependency_overrides[state] = lambda: Mock(spec=State)
+
+    response = await client.post("/simulation/stream", content=b'{"type": "a"}\n')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 async def test_delete_simulation_after_deleting_simulation_response_has_200_status_code(
     app: FastAPI, client: AsyncClient
 ) -> None:
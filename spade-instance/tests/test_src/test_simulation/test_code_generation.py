@@ -1,8 +1,23 @@
 from __future__ import annotations
 
+import importlib.util
+import os
+from typing import TYPE_CHECKING
+from unittest.mock import Mock
+
 import pytest
 
-from src.simulation.code_generation import generate_agents, remove_imports
+from src.settings import simulation_settings
+from src.simulation.code_generation import (
+    compile_agent_code,
+    generate_agents,
+    get_agent_code_hash,
+    load_agent_module,
+    remove_imports,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 pytestmark = pytest.mark.asyncio
 
@@ -34,7 +49,86 @@ def test_generate_agents_returns_list_of_generated_agents() -> None:
     ]
     agent_data = [{"type": "first"}, {"type": "second"}]
 
-    agents = generate_agents(agent_code_lines, agent_data)
+    agents = generate_agents(agent_code_lines, agent_data, Mock())
 
     assert agents[0].__class__.__name__ == "first"
     assert agents[1].__class__.__name__ == "second"
+
+
+@pytest.fixture
+def agent_code_cache_dir(tmp_path: Path) -> Path:
+    cache_dir = simulation_settings.agent_code_cache_dir
+    simulation_settings.agent_code_cache_dir = str(tmp_path)
+    yield tmp_path
+    simulation_settings.agent_code_cache_dir = cache_dir
+
+
+def test_compile_agent_code_stores_compiled_code_in_cache(
+    agent_code_cache_dir: Path,
+) -> None:
+    agent_code_lines = ["import spade", "x = 1"]
+    code_hash = get_agent_code_hash(agent_code_lines)
+
+    compile_agent_code(agent_code_lines, code_hash)
+
+    cached = (agent_code_cache_dir / f"{code_hash}.marshal").read_bytes()
+    assert cached.startswith(importlib.util.MAGIC_NUMBER)
+
+
+def test_compile_agent_code_returns_cached_code_without_compiling(
+    agent_code_cache_dir: Path,
+) -> None:
+    agent_code_lines = ["x = 1"]
+    code_hash = get_agent_code_hash(agent_code_lines)
+    compile_agent_code(agent_code_lines, code_hash)
+
+    # the source is not compiled again, so a syntax error goes unnoticed
+    code = compile_agent_code(["x = ("], code_hash)
+
+    namespace = {}
+    exec(code, namespace)
+    assert namespace["x"] == 1
+
+
+def test_compile_agent_code_recompiles_code_with_invalid_cache_entry(
+    agent_code_cache_dir: Path,
+) -> None:
+    agent_code_lines = ["x = 2"]
+    code_hash = get_agent_code_hash(agent_code_lines)
+    (agent_code_cache_dir / f"{code_hash}.marshal").write_bytes(b"invalid")
+
+    code = compile_agent_code(agent_code_lines, code_hash)
+
+    namespace = {}
+    exec(code, namespace)
+    assert namespace["x"] == 2
+
+
+def test_compile_agent_code_evicts_oldest_cache_entries(
+    agent_code_cache_dir: Path,
+) -> None:
+    max_entries = simulation_settings.agent_code_cache_max_entries
+    simulation_settings.agent_code_cache_max_entries = 2
+    hashes = []
+    for i in range(3):
+        agent_code_lines = [f"x = {i}"]
+        hashes.append(get_agent_code_hash(agent_code_lines))
+        compile_agent_code(agent_code_lines, hashes[-1])
+        os.utime(agent_code_cache_dir / f"{hashes[-1]}.marshal", (i, i))
+    simulation_settings.agent_code_cache_max_entries = max_entries
+
+    assert sorted(os.listdir(agent_code_cache_dir)) == sorted(
+        f"{code_hash}.marshal" for code_hash in hashes[1:]
+    )
+
+
+def test_load_agent_module_returns_module_with_agent_classes_and_imported_modules(
+    agent_code_cache_dir: Path,
+) -> None:
+    agent_code_lines = ["import spade", "class third:", "    module = spade"]
+
+    module = load_agent_module(agent_code_lines)
+
+    assert module.third.__module__ == module.__name__
+    assert module.third.module.__name__ == "spade"
+    assert load_agent_module(agent_code_lines) is module
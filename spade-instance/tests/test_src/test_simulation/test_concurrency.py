@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from src.simulation.concurrency import AdaptiveConcurrencyLimiter, get_retry_delay
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_get_retry_delay_grows_exponentially_up_to_max_delay() -> None:
+    for attempt in range(10):
+        assert 0 <= get_retry_delay(attempt, 1, 60) <= min(2**attempt, 60)
+
+
+async def test_adaptive_concurrency_limiter_doubles_limit_after_round_of_fast_operations() -> None:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=2, min_limit=1, max_limit=100, target_latency_ms=1000
+    )
+
+    for _ in range(2):
+        await limiter.acquire()
+    for _ in range(2):
+        await limiter.release(0.01, success=True)
+
+    assert int(limiter.limit) == 4
+
+
+async def test_adaptive_concurrency_limiter_halves_limit_once_per_burst_of_errors() -> None:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=8, min_limit=1, max_limit=100, target_latency_ms=1000
+    )
+
+    for _ in range(3):
+        await limiter.acquire()
+    for _ in range(3):
+        await limiter.release(0.01, success=False)
+
+    assert int(limiter.limit) == 4
+    assert limiter.num_errors == 3
+    assert not limiter.slow_start
+
+
+async def test_adaptive_concurrency_limiter_does_not_exceed_limit() -> None:
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=2, min_limit=1, max_limit=2, target_latency_ms=1000
+    )
+    max_in_flight = 0
+
+    async def run() -> None:
+        nonlocal max_in_flight
+        await limiter.acquire()
+        max_in_flight = max(max_in_flight, limiter.in_flight)
+        await asyncio.sleep(0.001)
+        await limiter.release(0.001, success=True)
+
+    await asyncio.gather(*[run() for _ in range(10)])
+
+    assert max_in_flight == 2
+    assert limiter.in_flight == 0
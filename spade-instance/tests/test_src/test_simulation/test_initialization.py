@@ -3,12 +3,16 @@ from __future__ import annotations
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
-from spade.agent import Agent
+from spade.agent import Agent, AuthenticationFailure
 from spade.behaviour import OneShotBehaviour
 
+from src.simulation.concurrency import AdaptiveConcurrencyLimiter
 from src.simulation.initialization import (
+    ConnectionMode,
+    async_connect,
     connect_agents,
     connect_with_retry,
+    pre_register_agents,
     setup_agent,
     setup_agents,
 )
@@ -25,7 +29,11 @@ async def test_connect_with_retry_retries_after_exception(
     agent = Mock(spec=Agent)
     agent.jid = "test@test.com"
 
-    await connect_with_retry(agent, 0.001)
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=1, min_limit=1, max_limit=1, target_latency_ms=1000
+    )
+
+    await connect_with_retry(agent, limiter, 0.001, 0.001, ConnectionMode.REGISTER)
 
     assert async_connect_mock.call_count == 2
 
@@ -43,6 +51,50 @@ async def test_connect_agents(connect_with_retry: AsyncMock) -> None:
     assert connect_with_retry.call_count == 2
 
 
+@patch("src.simulation.initialization.async_register")
+@patch("src.simulation.initialization.async_login")
+async def test_async_connect_in_login_first_mode_does_not_register_existing_account(
+    async_login_mock: AsyncMock, async_register_mock: AsyncMock
+) -> None:
+    agent = Mock(spec=Agent)
+
+    await async_connect(agent, ConnectionMode.LOGIN_FIRST)
+
+    assert async_login_mock.call_count == 1
+    assert not async_register_mock.called
+
+
+@patch("src.simulation.initialization.async_register")
+@patch("src.simulation.initialization.async_login")
+async def test_async_connect_in_login_first_mode_registers_after_authentication_failure(
+    async_login_mock: AsyncMock, async_register_mock: AsyncMock
+) -> None:
+    async_login_mock.side_effect = [AuthenticationFailure, None]
+    agent = Mock(spec=Agent)
+    agent.jid = "test@test.com"
+
+    await async_connect(agent, ConnectionMode.LOGIN_FIRST)
+
+    assert async_login_mock.call_count == 2
+    assert async_register_mock.call_count == 1
+
+
+@patch("src.simulation.initialization.async_register_batch")
+async def test_pre_register_agents_registers_agents_of_each_domain_in_batches(
+    async_register_batch_mock: AsyncMock,
+) -> None:
+    agents = []
+    for jid in ["a@s1", "b@s1", "c@s1", "d@s2"]:
+        agent = Mock(spec=Agent)
+        agent.jid = Mock(domain=jid.split("@")[1])
+        agents.append(agent)
+
+    await pre_register_agents(agents, batch_size=2, max_concurrency=2)
+
+    batches = [call.args[0] for call in async_register_batch_mock.call_args_list]
+    assert batches == [agents[:2], agents[2:3], agents[3:]]
+
+
 async def test_setup_agent_returns_list_of_agent_behaviours() -> None:
     agent = Mock(spec=Agent)
     agent.jid = "test@server.com"
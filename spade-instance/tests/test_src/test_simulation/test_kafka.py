@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import orjson
+import pytest
+
+from src.simulation.kafka import KafkaAgentUpdateWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_kafka_agent_update_writer_sends_serialized_update_with_simulation_id() -> None:
+    kafka = AsyncMock()
+    kafka.send.return_value = asyncio.Future()
+    writer = KafkaAgentUpdateWriter(kafka, simulation_id="sim")
+
+    await writer.coro_put({"jid": "a@s"})
+
+    kwargs = kafka.send.call_args.kwargs
+    assert kwargs["key"] == "a@s"
+    assert orjson.loads(kwargs["value"]) == {"jid": "a@s", "simulation_id": "sim"}
+
+
+async def test_kafka_agent_update_writer_counts_failed_sends() -> None:
+    kafka = AsyncMock()
+    future = asyncio.Future()
+    kafka.send.return_value = future
+    writer = KafkaAgentUpdateWriter(kafka, simulation_id="sim")
+
+    await writer.coro_put({"jid": "a@s"})
+    future.set_exception(Exception("broker is down"))
+    await asyncio.sleep(0)
+
+    assert writer.num_failed == 1
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
-from unittest.mock import AsyncMock, Mock, patch
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 from spade.agent import Agent
 
-from src.simulation.status import get_broken_agents, get_instance_status, send_status
+from src.simulation.status import (
+    BrokenAgentTracker,
+    get_broken_agents,
+    get_instance_status,
+    send_status,
+)
 from src.status import Status
 
 pytestmark = pytest.mark.asyncio
@@ -106,22 +111,85 @@ def test_get_broken_agents_returns_list_of_jids() -> None:
     assert broken_agents == ["agent@test.com"]
 
 
+def get_healthy_agent(jid: str) -> Mock:
+    agent = Mock(spec=Agent)
+    agent.jid = jid
+    agent.is_alive = Mock()
+    agent.is_alive.return_value = True
+    agent.client = Mock()
+    agent.client.suspended = False
+    agent.client.running = True
+    agent.client.established = True
+    agent.client.stream = Mock()
+    agent.client.stream.running = True
+    return agent
+
+
+def test_broken_agent_tracker_tracks_disconnected_agents_until_stream_is_established() -> None:
+    agent = get_healthy_agent("agent@test.com")
+    tracker = BrokenAgentTracker()
+    tracker.track_agents([agent], {"agent@test.com": []})
+
+    on_stream_destroyed = agent.client.on_stream_destroyed.connect.call_args.args[0]
+    on_stream_destroyed()
+
+    assert tracker.broken_agents == {"agent@test.com"}
+
+    on_stream_established = agent.client.on_stream_established.connect.call_args.args[0]
+    on_stream_established()
+
+    assert tracker.broken_agents == set()
+
+
+def test_broken_agent_tracker_tracks_agents_with_killed_behaviours() -> None:
+    agent = get_healthy_agent("agent@test.com")
+    behaviour = Mock()
+    behaviour._exit_code = 0
+
+    def kill(exit_code=None):
+        behaviour._exit_code = exit_code
+
+    behaviour.kill = kill
+    tracker = BrokenAgentTracker()
+    tracker.track_agents([agent], {"agent@test.com": [behaviour]})
+
+    assert tracker.broken_agents == set()
+
+    behaviour.kill(exit_code=Exception())
+
+    assert tracker.broken_agents == {"agent@test.com"}
+
+
+def test_broken_agent_tracker_returns_changes_since_last_delta() -> None:
+    tracker = BrokenAgentTracker()
+    tracker.set_disconnected("agent_1@test.com", True)
+    tracker.set_disconnected("agent_2@test.com", True)
+
+    assert sorted(tracker.get_delta()[0]) == ["agent_1@test.com", "agent_2@test.com"]
+
+    tracker.set_disconnected("agent_1@test.com", False)
+
+    assert tracker.get_delta() == ([], ["agent_1@test.com"])
+    assert tracker.get_delta() == ([], [])
+
+
 def test_get_instance_status_contains_details() -> None:
     num_agents = 2
-    broken_agents = ["agent@test.com"]
+    broken_agents_added = ["agent@test.com"]
+    broken_agents_removed = ["agent_2@test.com"]
 
-    status = get_instance_status(num_agents, broken_agents)
+    status = get_instance_status(num_agents, broken_agents_added, broken_agents_removed)
 
-    assert status["status"] == Status.RUNNING.name
+    assert status["status"] == Status.RUNNING
     assert status["num_agents"] == num_agents
-    assert status["broken_agents"] == broken_agents
+    assert status["broken_agents_added"] == broken_agents_added
+    assert status["broken_agents_removed"] == broken_agents_removed
 
 
-@patch("httpx.AsyncClient.post")
-async def test_send_status_sends_post_request(mocked_post: AsyncMock) -> None:
-    agents = []
-    agent_num_behaviours = {}
+async def test_send_status_puts_status_into_queue() -> None:
+    simulation_status_updates = Mock()
+    simulation_status_updates.coro_put = AsyncMock()
 
-    await send_status(agents, agent_num_behaviours)
+    await send_status(0, BrokenAgentTracker(), simulation_status_updates)
 
-    assert mocked_post.called
+    assert simulation_status_updates.coro_put.called
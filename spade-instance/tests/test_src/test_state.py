@@ -1,26 +1,32 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from contextlib import nullcontext as does_not_raise
 from multiprocessing import Process
 from typing import TYPE_CHECKING
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+from aioprocessing import AioQueue
 
 from src.exceptions import (
     SimulationException,
     SimulationIdNotSetException,
     SimulationStateNotSetException,
 )
+from src.settings import simulation_settings
 from src.state import (
     State,
+    combine_worker_statuses,
     create_simulation_state_shutdown_handler,
     create_simulation_state_startup_handler,
     get_app_simulation_state,
     set_app_simulation_state,
+    split_agent_data,
 )
 from src.status import Status
+from src.worker_pool import SimulationWorker
 
 if TYPE_CHECKING:
     from fastapi import FastAPI
@@ -29,20 +35,35 @@ if TYPE_CHECKING:
 pytestmark = pytest.mark.asyncio
 
 
-def test_clean_state_resets_state_to_initial_simulation_values(state: State) -> None:
-    state.simulation_process = Mock()
+async def test_clean_state_resets_state_to_initial_simulation_values(
+    state: State,
+) -> None:
+    state.simulation_processes = [Mock()]
     state.simulation_id = "123"
     state.num_agents = 1
     state.broken_agents = ["agent_1", "agent_2"]
 
-    state._clean_state()
+    await state._clean_state()
 
-    assert state.simulation_process is None
+    assert state.simulation_processes == []
     assert state.simulation_id is None
     assert state.num_agents == 0
     assert state.broken_agents == []
 
 
+async def test_clean_state_waits_for_agent_update_acks(state: State) -> None:
+    ack = asyncio.get_running_loop().create_future()
+    state.app.state.kafka = Mock(send=AsyncMock(return_value=ack))
+    send_agent_updates_to_broker = state.create_send_agent_updates_to_broker()
+
+    await send_agent_updates_to_broker([("agent_1", b"update")], "123")
+    asyncio.get_running_loop().call_later(0.01, ack.set_result, None)
+    await state._clean_state()
+
+    assert ack.done()
+    assert state.agent_updates_ack_tasks == set()
+
+
 async def test_update_active_state_updates_running_simulation_values(
     state: State,
 ) -> None:
@@ -59,6 +80,23 @@ async def test_update_active_state_updates_running_simulation_values(
     assert state.broken_agents == ["agent_3"]
 
 
+async def test_update_active_state_measures_agents_per_second_once_simulation_is_running(
+    state: State,
+) -> None:
+    state.status = Status.STARTING
+    state.simulation_started_at = time.monotonic() - 2
+
+    await state.update_active_state(Status.STARTING, 50, [])
+    assert state.agents_per_second is None
+
+    await state.update_active_state(Status.RUNNING, 100, [])
+    assert state.agents_per_second == pytest.approx(50, rel=0.1)
+
+    await state.update_active_state(Status.RUNNING, 10, [])
+    assert state.agents_per_second == pytest.approx(50, rel=0.1)
+    assert await state.get_agents_per_second() == state.agents_per_second
+
+
 async def test_update_active_state_does_not_allow_to_update_idle_simulation(
     state: State,
 ) -> None:
@@ -125,21 +163,79 @@ async def test_start_simulation_process_allows_to_start_simulation_if_there_is_n
     simulation_id = "123"
     agent_code_lines = []
     agent_data = []
+    simulation_worker = create_simulation_worker_mock()
+    state.worker_pool = Mock(acquire=Mock(return_value=[simulation_worker]))
 
-    with patch("src.state.Process"):
-        await state.start_simulation_process(
-            simulation_id, agent_code_lines, agent_data
-        )
+    await state.start_simulation_process(simulation_id, agent_code_lines, agent_data)
 
     assert state.status == Status.STARTING
     assert state.simulation_id == simulation_id
-    assert state.simulation_process is not None
+    assert state.simulation_processes == [simulation_worker.process]
+    simulation_worker.start.assert_awaited_once_with(simulation_id, 0, agent_code_lines)
+    simulation_worker.finish.assert_awaited_once()
+
+
+def create_simulation_worker_mock() -> Mock:
+    simulation_worker = Mock(spec=SimulationWorker)
+    simulation_worker.process = Mock(spec=Process)
+    simulation_worker.agent_updates = None
+    simulation_worker.simulation_status_updates = Mock()
+    simulation_worker.simulation_status_updates.coro_get = AsyncMock(return_value=None)
+    simulation_worker.start = AsyncMock()
+    simulation_worker.send_agent_data = AsyncMock()
+    simulation_worker.finish = AsyncMock()
+    return simulation_worker
+
+
+async def test_stream_simulation_process_deals_agents_from_chunks_like_split_agent_data(
+    state: State,
+) -> None:
+    simulation_workers = [create_simulation_worker_mock() for _ in range(2)]
+    state.worker_pool = Mock(acquire=Mock(return_value=simulation_workers))
+    agent_data = [{"type": "a", "jid": str(i)} for i in range(5)]
+
+    async def agent_data_chunks():
+        yield agent_data[:3]
+        yield agent_data[3:]
+
+    with patch.object(simulation_settings, "num_workers", 2):
+        await state.stream_simulation_process("sim", [], 5, agent_data_chunks())
+
+    for simulation_worker, shard in zip(
+        simulation_workers, split_agent_data(agent_data, 2)
+    ):
+        sent = [
+            agent
+            for call in simulation_worker.send_agent_data.call_args_list
+            for agent in call.args[0]
+        ]
+        assert sent == shard
+        assert simulation_worker.finish.called
+    assert state.status == Status.STARTING
+
+
+async def test_stream_simulation_process_kills_simulation_after_invalid_agent_data(
+    state: State,
+) -> None:
+    state.worker_pool = Mock(
+        acquire=Mock(return_value=[create_simulation_worker_mock()])
+    )
+    state.kill_simulation_process = AsyncMock()
+
+    async def agent_data_chunks():
+        raise ValueError("invalid")
+        yield
+
+    with pytest.raises(SimulationException):
+        await state.stream_simulation_process("sim", [], 1, agent_data_chunks())
+
+    assert state.kill_simulation_process.called
 
 
 async def test_kill_simulation_process_raises_simulation_exception_if_simulation_process_is_not_set(
     state: State,
 ) -> None:
-    state.simulation_process = None
+    state.simulation_processes = []
 
     with pytest.raises(SimulationException):
         await state.kill_simulation_process()
@@ -147,7 +243,7 @@ async def test_kill_simulation_process_raises_simulation_exception_if_simulation
 
 async def test_kill_simulation_process_sets_status_to_idle(state: State) -> None:
     state.status = Status.RUNNING
-    state.simulation_process = Mock(spec=Process)
+    state.simulation_processes = [Mock(spec=Process)]
 
     await state.kill_simulation_process()
 
@@ -156,19 +252,19 @@ async def test_kill_simulation_process_sets_status_to_idle(state: State) -> None
 
 async def test_kill_simulation_process_kills_simulation_process(state: State) -> None:
     state.status = Status.RUNNING
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.kill = Mock()
-    state._clean_state = Mock()
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].kill = Mock()
+    state._clean_state = AsyncMock()
 
     await state.kill_simulation_process()
 
-    assert state.simulation_process.kill.called
+    assert state.simulation_processes[0].kill.called
 
 
 async def test_kill_simulation_process_cleans_state(state: State) -> None:
     state.status = Status.RUNNING
-    state.simulation_process = Mock(spec=Process)
-    state._clean_state = Mock()
+    state.simulation_processes = [Mock(spec=Process)]
+    state._clean_state = AsyncMock()
 
     await state.kill_simulation_process()
 
@@ -178,7 +274,7 @@ async def test_kill_simulation_process_cleans_state(state: State) -> None:
 async def test_get_simulation_memory_usage_returns_0_if_simulation_process_is_not_set(
     state: State,
 ) -> None:
-    state.simulation_process = None
+    state.simulation_processes = []
 
     memory_usage = await state.get_simulation_memory_usage()
 
@@ -188,8 +284,8 @@ async def test_get_simulation_memory_usage_returns_0_if_simulation_process_is_no
 async def test_get_simulation_memory_usage_returns_0_if_simulation_process_is_not_alive(
     state: State,
 ) -> None:
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.is_alive.return_value = False
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = False
 
     memory_usage = await state.get_simulation_memory_usage()
 
@@ -197,21 +293,35 @@ async def test_get_simulation_memory_usage_returns_0_if_simulation_process_is_no
 
 
 async def test_get_simulation_memory_usage_returns_usage_in_MiB(state: State) -> None:
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.is_alive.return_value = True
-    state.simulation_process.pid = 1
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = True
+    state.simulation_processes[0].pid = 1
 
-    with patch("psutil.Process.memory_info", return_value=Mock(rss=1024 ** 2)):
+    with patch("psutil.Process.memory_info", return_value=Mock(rss=1024**2)):
         memory_usage = await state.get_simulation_memory_usage()
 
     assert memory_usage == 1.0
 
 
+async def test_get_simulation_memory_usage_returns_sum_of_all_simulation_processes(
+    state: State,
+) -> None:
+    state.simulation_processes = [Mock(spec=Process), Mock(spec=Process)]
+    for simulation_process in state.simulation_processes:
+        simulation_process.is_alive.return_value = True
+        simulation_process.pid = 1
+
+    with patch("psutil.Process.memory_info", return_value=Mock(rss=1024**2)):
+        memory_usage = await state.get_simulation_memory_usage()
+
+    assert memory_usage == 2.0
+
+
 async def test_verify_simulation_process_does_not_change_status_if_process_is_not_set(
     state: State,
 ) -> None:
     state.status = Status.IDLE
-    state.simulation_process = None
+    state.simulation_processes = []
 
     await state.verify_simulation_process()
 
@@ -223,8 +333,8 @@ async def test_verify_simulation_process_does_not_change_status_if_process_is_al
     status: Status, state: State
 ) -> None:
     state.status = status
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.is_alive.return_value = True
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = True
 
     await state.verify_simulation_process()
 
@@ -235,8 +345,8 @@ async def test_verify_simulation_process_sets_status_to_dead_if_process_is_not_a
     state: State,
 ) -> None:
     state.status = Status.RUNNING
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.is_alive.return_value = False
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = False
 
     await state.verify_simulation_process()
 
@@ -247,15 +357,98 @@ async def test_verify_simulation_process_cleans_state_if_process_is_not_alive(
     state: State,
 ) -> None:
     state.status = Status.RUNNING
-    state.simulation_process = Mock(spec=Process)
-    state.simulation_process.is_alive.return_value = False
-    state._clean_state = Mock()
+    state.simulation_processes = [Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = False
+    state._clean_state = AsyncMock()
 
     await state.verify_simulation_process()
 
     assert state._clean_state.called
 
 
+async def test_verify_simulation_process_kills_all_simulation_processes_if_one_is_not_alive(
+    state: State,
+) -> None:
+    state.status = Status.RUNNING
+    state.simulation_processes = [Mock(spec=Process), Mock(spec=Process)]
+    state.simulation_processes[0].is_alive.return_value = True
+    state.simulation_processes[1].is_alive.return_value = False
+    state._clean_state = AsyncMock()
+
+    await state.verify_simulation_process()
+
+    assert state.status == Status.DEAD
+    assert state.simulation_processes[0].kill.called
+
+
+async def test_set_instance_state_applies_broken_agent_changes_of_every_worker(
+    state: State,
+) -> None:
+    state.update_active_state = AsyncMock()
+    set_instance_state = state.create_set_instance_state(num_workers=2)
+
+    await set_instance_state(
+        {
+            "worker": 0,
+            "num_agents": 2,
+            "broken_agents_added": ["agent_0", "agent_1"],
+            "broken_agents_removed": [],
+        },
+        "123",
+    )
+    await set_instance_state(
+        {
+            "worker": 0,
+            "num_agents": 2,
+            "broken_agents_added": [],
+            "broken_agents_removed": ["agent_0"],
+        },
+        "123",
+    )
+
+    state.update_active_state.assert_called_with(
+        status=Status.STARTING, num_agents=2, broken_agents=["agent_1"]
+    )
+
+
+def test_split_agent_data_splits_agents_between_workers() -> None:
+    agent_data = [{"jid": f"agent_{i}"} for i in range(5)]
+
+    shards = split_agent_data(agent_data, num_workers=2)
+
+    assert shards == [
+        [{"jid": "agent_0"}, {"jid": "agent_2"}, {"jid": "agent_4"}],
+        [{"jid": "agent_1"}, {"jid": "agent_3"}],
+    ]
+
+
+def test_split_agent_data_does_not_create_empty_shards() -> None:
+    assert split_agent_data([{"jid": "agent_0"}], num_workers=4) == [
+        [{"jid": "agent_0"}]
+    ]
+    assert split_agent_data([], num_workers=4) == [[]]
+
+
+def test_combine_worker_statuses_is_starting_until_every_worker_reports() -> None:
+    worker_statuses = {
+        0: {"worker": 0, "num_agents": 2, "broken_agents": ["agent_0"]},
+    }
+
+    assert combine_worker_statuses(worker_statuses, num_workers=2) == (
+        Status.STARTING,
+        2,
+        ["agent_0"],
+    )
+
+    worker_statuses[1] = {"worker": 1, "num_agents": 3, "broken_agents": ["agent_1"]}
+
+    assert combine_worker_statuses(worker_statuses, num_workers=2) == (
+        Status.RUNNING,
+        5,
+        ["agent_0", "agent_1"],
+    )
+
+
 def test_set_app_simulation_state_sets_simulation_state_inside_app_state(
     app: FastAPI, state: State
 ) -> None:
@@ -309,3 +502,35 @@ async def test_simulation_shutdown_handler_after_simulation_exception_is_raised_
 
     with does_not_raise():
         await simulation_state_shutdown_handler()
+
+
+async def test_get_update_batch_from_queue_returns_available_updates_up_to_max_batch_size(
+    state: State,
+) -> None:
+    queue = AioQueue()
+    for i in range(3):
+        queue.put({"jid": f"agent_{i}"})
+    await asyncio.sleep(0.1)
+
+    batch, running = await state.get_update_batch_from_queue(
+        queue, max_batch_size=2, max_wait_ms=0
+    )
+
+    assert batch == [{"jid": "agent_0"}, {"jid": "agent_1"}]
+    assert running
+
+
+async def test_get_update_batch_from_queue_stops_after_poison_pill(
+    state: State,
+) -> None:
+    queue = AioQueue()
+    queue.put({"jid": "agent_0"})
+    queue.put(None)
+    await asyncio.sleep(0.1)
+
+    batch, running = await state.get_update_batch_from_queue(
+        queue, max_batch_size=10, max_wait_ms=1000
+    )
+
+    assert batch == [{"jid": "agent_0"}]
+    assert not running
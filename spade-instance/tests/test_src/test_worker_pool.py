@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from multiprocessing import Pipe
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.simulation.main import receive_agent_data, worker_main
+from src.worker_pool import SimulationWorkerPool
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def worker_pool() -> SimulationWorkerPool:
+    with patch("src.worker_pool.Process"):
+        worker_pool = SimulationWorkerPool(size=2, agent_updates_capacity=64)
+        yield worker_pool
+        worker_pool.shutdown()
+
+
+def test_worker_pool_does_not_start_workers_before_it_is_started(
+    worker_pool: SimulationWorkerPool,
+) -> None:
+    worker_pool.fill()
+
+    assert worker_pool.idle_workers == []
+
+
+def test_worker_pool_starts_idle_workers_up_to_its_size(
+    worker_pool: SimulationWorkerPool,
+) -> None:
+    worker_pool.start()
+
+    assert len(worker_pool.idle_workers) == 2
+    assert all(worker.process.start.called for worker in worker_pool.idle_workers)
+
+
+def test_worker_pool_acquires_idle_workers_and_starts_missing_ones(
+    worker_pool: SimulationWorkerPool,
+) -> None:
+    worker_pool.start()
+    idle_workers = list(worker_pool.idle_workers)
+
+    workers = worker_pool.acquire(3)
+
+    assert len(workers) == 3
+    assert all(worker in workers for worker in idle_workers)
+    assert worker_pool.idle_workers == []
+    for worker in workers:
+        worker.stop()
+
+
+def test_worker_pool_replaces_dead_idle_workers_when_filled(
+    worker_pool: SimulationWorkerPool,
+) -> None:
+    worker_pool.start()
+    dead_worker = worker_pool.idle_workers[0]
+    dead_worker.process.is_alive.return_value = False
+
+    worker_pool.fill()
+
+    assert dead_worker not in worker_pool.idle_workers
+    assert len(worker_pool.idle_workers) == 2
+    assert dead_worker.process.kill.called
+
+
+async def test_worker_starts_simulation_with_received_command() -> None:
+    commands, sent_commands = Pipe(duplex=False)
+    sent_commands.send(("sim", 1, ["code"]))
+    agent_updates = Mock()
+    simulation_status_updates = Mock()
+
+    with patch("src.simulation.main.uvloop"), patch(
+        "src.simulation.main.asyncio.run"
+    ), patch("src.simulation.main.run_simulation", new=Mock()) as run_simulation:
+        worker_main(commands, agent_updates, simulation_status_updates)
+
+    simulation_id, worker, agent_code_lines, _, *queues = run_simulation.call_args[0]
+    assert (simulation_id, worker, agent_code_lines) == ("sim", 1, ["code"])
+    assert queues == [agent_updates, simulation_status_updates]
+
+
+async def test_receive_agent_data_returns_chunks_until_end_of_agent_data() -> None:
+    commands, sent_commands = Pipe(duplex=False)
+    sent_commands.send([{"type": "a"}])
+    sent_commands.send([{"type": "b"}])
+    sent_commands.send(None)
+
+    chunks = [chunk async for chunk in receive_agent_data(commands)]
+
+    assert chunks == [[{"type": "a"}], [{"type": "b"}]]
+
+
+def test_worker_exits_without_command_after_pool_is_closed() -> None:
+    commands, sent_commands = Pipe(duplex=False)
+    sent_commands.close()
+
+    with patch("src.simulation.main.uvloop"), patch(
+        "src.simulation.main.run_simulation", new=Mock()
+    ) as run_simulation:
+        worker_main(commands, None, Mock())
+
+    assert not run_simulation.called
@@ -3,12 +3,18 @@ from __future__ import annotations
 from aasm.utils.exception import PanicException
 from fastapi import FastAPI
 
+from src.cache import create_shutdown_cache_handler, create_startup_cache_handler
 from src.exceptions import handle_panic_exception
 from src.routers import router
+from src.settings import configure_logging
 
 
 def get_app() -> FastAPI:
+    configure_logging()
+
     app = FastAPI()
     app.include_router(router)
     app.add_exception_handler(PanicException, handle_panic_exception)
+    app.add_event_handler("startup", create_startup_cache_handler(app))
+    app.add_event_handler("shutdown", create_shutdown_cache_handler(app))
     return app
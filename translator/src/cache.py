@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, List
+
+import aioredis
+from aasm import __version__
+
+from src.models import PythonSpadeCode
+from src.settings import cache_settings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aioredis import Redis
+    from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=os.environ.get("LOG_LEVEL_CACHE", "INFO"))
+
+
+def get_code_hash(code_lines: List[str]) -> str:
+    # the same code is translated differently by other versions of aasm
+    content = json.dumps([__version__, code_lines], separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Translations by the hash of their code, the most recently used ones kept in memory.
+
+    If redis is available, the translations are also shared by the translator replicas and survive restarts.
+    """
+
+    def __init__(
+        self, max_size: int, redis: Redis | None = None, redis_ttl: int = 0
+    ) -> None:
+        self.max_size = max_size
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self._translations: OrderedDict[str, PythonSpadeCode] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._translations)
+
+    def get_redis_key(self, code_hash: str) -> str:
+        return f"translation:{__version__}:{code_hash}"
+
+    async def get(self, code_hash: str) -> PythonSpadeCode | None:
+        translation = self._translations.get(code_hash)
+        if translation is not None:
+            self._translations.move_to_end(code_hash)
+            return translation
+        if self.redis is None:
+            return None
+        try:
+            data = await self.redis.get(self.get_redis_key(code_hash))
+        except aioredis.RedisError as e:
+            logger.warning(f"Failed to read translation {code_hash} from redis: {e}")
+            return None
+        if data is None:
+            return None
+        translation = PythonSpadeCode.parse_raw(data)
+        self._remember(code_hash, translation)
+        return translation
+
+    async def set(self, code_hash: str, translation: PythonSpadeCode) -> None:
+        self._remember(code_hash, translation)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                self.get_redis_key(code_hash),
+                translation.json(),
+                ex=self.redis_ttl or None,
+            )
+        except aioredis.RedisError as e:
+            logger.warning(f"Failed to write translation {code_hash} to redis: {e}")
+
+    def _remember(self, code_hash: str, translation: PythonSpadeCode) -> None:
+        self._translations[code_hash] = translation
+        self._translations.move_to_end(code_hash)
+        while len(self._translations) > self.max_size:
+            self._translations.popitem(last=False)
+
+
+def create_startup_cache_handler(
+    app: FastAPI,
+) -> Callable[[], Coroutine[Any, Any, None]]:
+    async def create_cache() -> None:
+        redis = None
+        if cache_settings.redis_url:
+            logger.info("Connecting to redis")
+            redis = aioredis.from_url(cache_settings.redis_url)
+        app.state.translation_cache = TranslationCache(
+            cache_settings.max_size, redis, cache_settings.redis_ttl
+        )
+
+    return create_cache
+
+
+def create_shutdown_cache_handler(
+    app: FastAPI,
+) -> Callable[[], Coroutine[Any, Any, None]]:
+    async def close_cache() -> None:
+        if app.state.translation_cache.redis is not None:
+            logger.info("Disconnecting from redis")
+            await app.state.translation_cache.redis.close()
+
+    return close_cache
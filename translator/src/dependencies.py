@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from starlette.requests import Request
+
+from src.cache import TranslationCache
+
+
+def create_get_translation_cache() -> Callable[[Request], TranslationCache]:
+    def get_translation_cache(request: Request) -> TranslationCache:
+        return request.app.state.translation_cache
+
+    return get_translation_cache
+
+
+translation_cache: Callable[
+    [Request], TranslationCache
+] = create_get_translation_cache()
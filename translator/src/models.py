@@ -12,3 +12,5 @@ class AgentsAssemblyCode(BaseModel):
 class PythonSpadeCode(BaseModel):
     agent_code_lines: List[str]
     graph_code_lines: List[str]
+    # can be sent instead of the code as long as the translation is cached
+    code_hash: str = None
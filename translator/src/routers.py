@@ -1,17 +1,46 @@
 from __future__ import annotations
 
-from aasm import __version__, get_spade_code
-from fastapi import APIRouter
+from aasm import get_spade_code
+from fastapi import APIRouter, Depends, HTTPException
+from starlette import status
 
+from src.cache import TranslationCache, get_code_hash
+from src.dependencies import translation_cache
 from src.models import AgentsAssemblyCode, PythonSpadeCode
 
 router = APIRouter()
 
 
 @router.post("/python/spade", response_model=PythonSpadeCode, status_code=200)
-async def translate_aasm(agent_assembly_code: AgentsAssemblyCode):
+async def translate_aasm(
+    agent_assembly_code: AgentsAssemblyCode,
+    translation_cache: TranslationCache = Depends(translation_cache),
+):
+    code_hash = get_code_hash(agent_assembly_code.code_lines)
+    translation = await translation_cache.get(code_hash)
+    if translation is not None:
+        return translation
+
     spade_code = get_spade_code(agent_assembly_code.code_lines)
-    return PythonSpadeCode(
+    translation = PythonSpadeCode(
         agent_code_lines=spade_code.agent_code_lines,
         graph_code_lines=spade_code.graph_code_lines,
+        code_hash=code_hash,
     )
+    await translation_cache.set(code_hash, translation)
+    return translation
+
+
+@router.get(
+    "/python/spade/{code_hash}", response_model=PythonSpadeCode, status_code=200
+)
+async def get_translation(
+    code_hash: str,
+    translation_cache: TranslationCache = Depends(translation_cache),
+):
+    translation = await translation_cache.get(code_hash)
+    if translation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="translation not cached"
+        )
+    return translation
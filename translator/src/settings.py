@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import logging
 import os
 
 from pydantic import BaseSettings
 
 
+def configure_logging() -> None:
+    logging.basicConfig(format="%(levelname)s:     [%(name)s] %(message)s")
+
+
 class AppSettings(BaseSettings):
     enable_reload: bool = bool(os.environ.get("RELOAD", False))
     port: int = int(os.environ.get("PORT", 8000))
 
 
+class CacheSettings(BaseSettings):
+    max_size: int = int(os.environ.get("TRANSLATION_CACHE_SIZE", 128))
+    # the cache is kept only in memory if not set
+    redis_url: str = os.environ.get("TRANSLATION_CACHE_REDIS_URL", "")
+    redis_ttl: int = int(os.environ.get("TRANSLATION_CACHE_REDIS_TTL", 86400))
+
+
 app_settings = AppSettings()
+cache_settings = CacheSettings()
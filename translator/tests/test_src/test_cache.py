@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, Mock
+
+import aioredis
+import pytest
+
+from src.cache import TranslationCache, get_code_hash
+from src.models import PythonSpadeCode
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_translation(agent_code_lines=None) -> PythonSpadeCode:
+    return PythonSpadeCode(
+        agent_code_lines=agent_code_lines or [], graph_code_lines=[], code_hash="hash"
+    )
+
+
+def test_get_code_hash_depends_on_every_code_line() -> None:
+    assert get_code_hash(["agent a", "eagent"]) == get_code_hash(["agent a", "eagent"])
+    assert get_code_hash(["agent a", "eagent"]) != get_code_hash(["agent a eagent"])
+
+
+async def test_after_exceeding_max_size_least_recently_used_translation_is_evicted() -> None:
+    cache = TranslationCache(max_size=2)
+    await cache.set("a", create_translation())
+    await cache.set("b", create_translation())
+    await cache.get("a")
+
+    await cache.set("c", create_translation())
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert len(cache) == 2
+
+
+async def test_translation_missing_in_memory_is_read_from_redis() -> None:
+    translation = create_translation(["class test"])
+    redis = Mock()
+    redis.get = AsyncMock(return_value=translation.json().encode("utf-8"))
+    cache = TranslationCache(max_size=2, redis=redis)
+
+    assert await cache.get("a") == translation
+    assert await cache.get("a") == translation
+    redis.get.assert_awaited_once_with(cache.get_redis_key("a"))
+
+
+async def test_set_stores_translation_in_redis_with_ttl() -> None:
+    redis = Mock()
+    redis.set = AsyncMock()
+    cache = TranslationCache(max_size=2, redis=redis, redis_ttl=60)
+    translation = create_translation()
+
+    await cache.set("a", translation)
+
+    redis.set.assert_awaited_once_with(
+        cache.get_redis_key("a"), translation.json(), ex=60
+    )
+
+
+async def test_redis_errors_are_treated_as_cache_misses() -> None:
+    redis = Mock()
+    redis.get = AsyncMock(side_effect=aioredis.ConnectionError())
+    redis.set = AsyncMock(side_effect=aioredis.ConnectionError())
+    cache = TranslationCache(max_size=0, redis=redis)
+
+    await cache.set("a", create_translation())
+
+    assert await cache.get("a") is None
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 from typing import TYPE_CHECKING
+from unittest.mock import Mock
 
 import pytest
 from starlette import status
 
+from src import routers
+from src.cache import get_code_hash
+
 if TYPE_CHECKING:
     from httpx import AsyncClient
 
@@ -60,3 +64,47 @@ async def test_after_sending_aasm_code_response_has_200_status_code(
     response = await client.post("/python/spade", json=code)
 
     assert response.status_code == status.HTTP_200_OK
+
+
+async def test_after_sending_aasm_code_response_has_code_hash(
+    client: AsyncClient,
+) -> None:
+    code = {"code_lines": ["agent test", "eagent"]}
+
+    response = await client.post("/python/spade", json=code)
+
+    assert response.json()["code_hash"] == get_code_hash(code["code_lines"])
+
+
+async def test_after_sending_same_aasm_code_twice_code_is_translated_once(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    code = {"code_lines": ["agent test", "eagent"]}
+    get_spade_code = Mock(wraps=routers.get_spade_code)
+    monkeypatch.setattr(routers, "get_spade_code", get_spade_code)
+
+    first_response = await client.post("/python/spade", json=code)
+    second_response = await client.post("/python/spade", json=code)
+
+    assert first_response.json() == second_response.json()
+    get_spade_code.assert_called_once()
+
+
+async def test_after_sending_hash_of_translated_code_response_has_translation(
+    client: AsyncClient,
+) -> None:
+    code = {"code_lines": ["agent test", "eagent"]}
+    translation = (await client.post("/python/spade", json=code)).json()
+
+    response = await client.get(f"/python/spade/{translation['code_hash']}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == translation
+
+
+async def test_after_sending_unknown_hash_response_has_404_status_code(
+    client: AsyncClient,
+) -> None:
+    response = await client.get("/python/spade/unknown")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND